@@ -0,0 +1,202 @@
+# benchmarks/bench_encoding.py
+#!/usr/bin/env python
+
+"""
+This Python module compares the output encodings of SICRITfix on synthetic
+experiments: size of the written mzML file against the time to write it.
+
+@contents  :  Output encoding benchmarks (size vs write time).
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  bench_encoding.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - numpy
+    - pyopenms
+    - sicritfix
+
+@functions :
+    - run_encoding_benchmarks
+    - format_encoding_report
+    - main
+
+@notes :
+    Usage (from sicritfix-project/):
+
+        PYTHONPATH=src python benchmarks/bench_encoding.py --scans 2000 --peaks 400
+        PYTHONPATH=src python benchmarks/bench_encoding.py --encodings float64_zlib numpress
+
+    Each encoding of `ENCODINGS` writes the same experiment `--repeat` times
+    with `store_spectra` (the write path of `process_file`) and its best
+    time is kept. The size is given relative to the default OpenMS encoding,
+    and the largest m/z and intensity errors after reading the file back
+    show what the lossy encodings (32-bit, MS-Numpress) cost.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from workloads import make_experiment
+
+from sicritfix.io.io import load_file, store_spectra
+
+
+# Encoding name -> output encoding (see `sicritfix.io.io.peak_file_options`)
+ENCODINGS = {
+    "default": {},
+    "float64_zlib": {"mz_precision": 64, "intensity_precision": 64, "zlib": True},
+    "float32_zlib": {"mz_precision": 32, "intensity_precision": 32, "zlib": True},
+    "numpress": {"numpress_mz": "linear", "numpress_intensity": "slof"},
+    "numpress_zlib": {"numpress_mz": "linear", "numpress_intensity": "slof", "zlib": True},
+    "numpress_pic": {"numpress_mz": "linear", "numpress_intensity": "pic"},
+}
+
+
+def _max_errors(input_map, path):
+    """Largest absolute m/z and relative intensity errors of the file read back."""
+    mz_error = intensity_error = 0.0
+    for original, written in zip(input_map, load_file(path)):
+        mzs, intensities = original.get_peaks()
+        written_mzs, written_intensities = written.get_peaks()
+        if len(mzs) == 0:
+            continue
+        mz_error = max(mz_error, float(np.max(np.abs(written_mzs - mzs))))
+        intensity_error = max(intensity_error, float(np.max(np.abs(written_intensities - intensities) / np.maximum(intensities, 1.0))))
+
+    return mz_error, intensity_error
+
+def run_encoding_benchmarks(scans, peaks, encodings=None, repeat=3, verbose=True):
+    """
+    Writes synthetic experiments with every encoding and measures them.
+
+    Parameters
+    ----------
+    scans, peaks : list of int
+        Values of the workload grid (number of scans and peaks per scan).
+
+    encodings : list of str, optional
+        Names of the encodings to compare (see `ENCODINGS`). All by default.
+
+    repeat : int, optional (default=3)
+        Writes per encoding and workload; the best time is kept.
+
+    verbose : bool, optional (default=True)
+        Print each result as it is measured.
+
+    Returns
+    -------
+    results : list of dict
+        One record per encoding and workload with its file size (bytes),
+        size relative to the default encoding, best write time (s), write
+        throughput (MB of output per second) and largest errors.
+    """
+    encodings = encodings or list(ENCODINGS)
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_scans, peaks_per_scan in itertools.product(scans, peaks):
+            input_map = make_experiment(n_scans, peaks_per_scan, 0.05)
+            workload = f"synthetic_{n_scans}x{peaks_per_scan}"
+            default_path = os.path.join(work_dir, "default.mzML")
+            store_spectra(default_path, iter(input_map), n_spectra=n_scans)
+            default_size = os.path.getsize(default_path)
+
+            for name in encodings:
+                path = os.path.join(work_dir, name + ".mzML")
+                times = []
+                for _ in range(repeat):
+                    start_time = time.perf_counter()
+                    store_spectra(path, iter(input_map), n_spectra=n_scans, encoding=ENCODINGS[name])
+                    times.append(time.perf_counter() - start_time)
+
+                best_time = min(times)
+                size = os.path.getsize(path)
+                mz_error, intensity_error = _max_errors(input_map, path)
+                record = {
+                    "encoding": name,
+                    "workload": workload,
+                    "n_scans": n_scans,
+                    "peaks_per_scan": peaks_per_scan,
+                    "size": size,
+                    "relative_size": size / default_size,
+                    "time": best_time,
+                    "mb_per_second": size / 1e6 / best_time if best_time > 0 else float("inf"),
+                    "max_mz_error": mz_error,
+                    "max_intensity_error": intensity_error,
+                }
+                results.append(record)
+                if verbose:
+                    print(f"  {workload:<24} {name:<16} {size / 1e6:9.2f} MB {best_time:9.4f} s", file=sys.stderr)
+
+    return results
+
+def format_encoding_report(results):
+    """
+    Formats encoding benchmark results as a text table.
+
+    Parameters
+    ----------
+    results : list of dict
+        Output of `run_encoding_benchmarks`.
+
+    Returns
+    -------
+    report : str
+        One row per encoding and workload.
+    """
+    lines = [
+        f"{'Workload':<24}  {'Encoding':<16}  {'Size (MB)':>9}  {'vs default':>10}  "
+        f"{'Write (s)':>9}  {'MB/s':>8}  {'m/z err':>8}  {'int. err':>8}"
+    ]
+    for record in results:
+        lines.append(
+            f"{record['workload']:<24}  {record['encoding']:<16}  {record['size'] / 1e6:>9.2f}  "
+            f"{record['relative_size']:>9.2f}x  {record['time']:>9.4f}  {record['mb_per_second']:>8.1f}  "
+            f"{record['max_mz_error']:>8.1e}  {record['max_intensity_error']:>8.1e}"
+        )
+
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the size and write time of the SICRITfix output encodings.")
+    parser.add_argument("--scans", type=int, nargs="+", default=[2000], help="Numbers of scans (default: 2000)")
+    parser.add_argument("--peaks", type=int, nargs="+", default=[400], help="Peaks per scan (default: 400)")
+    parser.add_argument("--encodings", nargs="+", choices=list(ENCODINGS), help="Encodings to compare (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Writes per encoding; the best is kept (default: 3)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run_encoding_benchmarks(args.scans, args.peaks, args.encodings, args.repeat)
+    print(format_encoding_report(results))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+# benchmarks/bench_stages.py
+#!/usr/bin/env python
+
+"""
+This Python module times each stage of the SICRITfix pipeline on synthetic
+experiments of increasing size.
+
+@contents  :  Stage-level benchmarks with throughput and scaling reports.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  bench_stages.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - numpy
+    - pyopenms
+    - sicritfix
+
+@functions :
+    - prepare_workload
+    - run_benchmarks
+    - scaling_exponents
+    - format_report
+    - main
+
+@notes :
+    Usage (from sicritfix-project/):
+
+        PYTHONPATH=src python benchmarks/bench_stages.py --scans 500 2000 --peaks 100 400
+        PYTHONPATH=src python benchmarks/bench_stages.py --output new.json --compare old.json
+
+    Each stage is run `--repeat` times on every workload (scans x peaks per
+    scan x oscillating fraction) and its best time is kept. Throughput is
+    given in peaks per second of the whole experiment. The scaling exponent
+    of a stage is the slope of log(time) against log(peaks): 1 is linear.
+    With --compare, the ratio to a previous JSON report is shown, so a
+    release can be checked for regressions before it reaches the batches.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyopenms as oms
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from workloads import REFERENCE_MZ, make_experiment
+
+from sicritfix.io.io import load_file, store_spectra
+from sicritfix.processing.corrector import correct_oscillations
+from sicritfix.processing.processor import (
+    detect_oscillating_mzs, correct_spectra, iter_corrected_spectra, process_file
+)
+from sicritfix.utils.frequency_analyzer import obtain_freq_from_signal
+from sicritfix.utils.intensity_analyzer import build_xic, build_xics, get_amplitude, get_amplitudes
+from sicritfix.utils.peak_table import PeakTable
+
+
+def _stage_get_amplitude(w):
+    for xic in w["xics"]:
+        get_amplitude(None, xic, w["rts"], w["local_freqs_ref"], w["sampling_interval"])
+
+def _stage_correct_oscillations(w):
+    for target_mz in w["oscillating_mzs"]:
+        correct_oscillations(w["peak_table"], phase_ref=w["phase_ref"], local_freqs_ref=w["local_freqs_ref"], target_mz=target_mz)
+
+def _stage_store(w):
+    spectra = iter_corrected_spectra(w["input_map"], w["oscillating_mzs"], w["residual_signals"])
+    store_spectra(w["output_path"], spectra, n_spectra=w["input_map"].getNrSpectra())
+
+# Stage name -> function of the prepared workload
+STAGES = {
+    "load_file": lambda w: load_file(w["input_path"]),
+    "peak_table": lambda w: PeakTable.from_experiment(w["input_map"]),
+    "build_xic": lambda w: build_xic(w["peak_table"], target_mz=REFERENCE_MZ),
+    "obtain_freq_from_signal": lambda w: obtain_freq_from_signal(w["peak_table"]),
+    "detect_oscillating_mzs": lambda w: detect_oscillating_mzs(w["peak_table"]),
+    "build_xics": lambda w: build_xics(w["peak_table"], target_mzs=w["oscillating_mzs"]),
+    "get_amplitude": _stage_get_amplitude,
+    "get_amplitudes": lambda w: get_amplitudes(w["xics"], w["local_freqs_ref"], w["sampling_interval"]),
+    "correct_oscillations": _stage_correct_oscillations,
+    "correct_spectra": lambda w: correct_spectra(w["input_map"], w["oscillating_mzs"], w["rts"], w["residual_signals"]),
+    "store": _stage_store,
+    "process_file": lambda w: process_file(w["input_path"], w["output_path"]),
+}
+
+
+def prepare_workload(n_scans, peaks_per_scan, oscillating_fraction, work_dir, seed=0):
+    """
+    Writes a synthetic experiment to disk and computes the inputs of every stage.
+
+    Parameters
+    ----------
+    n_scans : int
+        Number of spectra.
+
+    peaks_per_scan : int
+        Number of peaks of each spectrum.
+
+    oscillating_fraction : float
+        Fraction of the m/z values that oscillate.
+
+    work_dir : str
+        Directory of the input and output mzML files.
+
+    seed : int, optional (default=0)
+        Seed of the random generator.
+
+    Returns
+    -------
+    workload : dict
+        Inputs of the stages (see `STAGES`).
+    """
+    name = f"synthetic_{n_scans}x{peaks_per_scan}_{oscillating_fraction}"
+    input_path = os.path.join(work_dir, name + ".mzML")
+    input_map = make_experiment(n_scans, peaks_per_scan, oscillating_fraction, seed=seed)
+    oms.MzMLFile().store(input_path, input_map)
+
+    peak_table = PeakTable.from_experiment(input_map)
+    local_freqs_ref, phase_ref = obtain_freq_from_signal(peak_table)
+    _, oscillating_mzs, _ = detect_oscillating_mzs(peak_table)
+    xics = build_xics(peak_table, target_mzs=oscillating_mzs)
+    residual_signals = {}
+    for target_mz, xic in zip(oscillating_mzs, xics):
+        _, _, residual_signals[target_mz] = correct_oscillations(
+            peak_table, phase_ref=phase_ref, local_freqs_ref=local_freqs_ref, target_mz=target_mz, xic=xic
+        )
+
+    return {
+        "name": name,
+        "n_scans": n_scans,
+        "peaks_per_scan": peaks_per_scan,
+        "oscillating_fraction": oscillating_fraction,
+        "n_peaks": peak_table.n_peaks,
+        "input_path": input_path,
+        "output_path": os.path.join(work_dir, name + "_corrected.mzML"),
+        "input_map": input_map,
+        "peak_table": peak_table,
+        "rts": peak_table.rt,
+        "sampling_interval": np.mean(np.diff(peak_table.rt)),
+        "local_freqs_ref": local_freqs_ref,
+        "phase_ref": phase_ref,
+        "oscillating_mzs": oscillating_mzs,
+        "xics": xics,
+        "residual_signals": residual_signals,
+    }
+
+def run_benchmarks(scans, peaks, oscillating_fractions, stages=None, repeat=3, verbose=True):
+    """
+    Times every stage on every combination of workload parameters.
+
+    Parameters
+    ----------
+    scans, peaks, oscillating_fractions : list
+        Values of the workload grid (number of scans, peaks per scan and
+        oscillating fraction).
+
+    stages : list of str, optional
+        Names of the stages to run (see `STAGES`). All by default.
+
+    repeat : int, optional (default=3)
+        Runs per stage and workload; the best time is kept.
+
+    verbose : bool, optional (default=True)
+        Print each result as it is measured.
+
+    Returns
+    -------
+    results : list of dict
+        One record per stage and workload with its parameters, best time (s)
+        and throughput (peaks/s).
+    """
+    stages = stages or list(STAGES)
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_scans, peaks_per_scan, fraction in itertools.product(scans, peaks, oscillating_fractions):
+            workload = prepare_workload(n_scans, peaks_per_scan, fraction, work_dir)
+            for stage in stages:
+                times = []
+                for _ in range(repeat):
+                    start_time = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        STAGES[stage](workload)
+                    times.append(time.perf_counter() - start_time)
+
+                best_time = min(times)
+                record = {
+                    "stage": stage,
+                    "workload": workload["name"],
+                    "n_scans": n_scans,
+                    "peaks_per_scan": peaks_per_scan,
+                    "oscillating_fraction": fraction,
+                    "n_peaks": workload["n_peaks"],
+                    "n_oscillating": len(workload["oscillating_mzs"]),
+                    "time": best_time,
+                    "peaks_per_second": workload["n_peaks"] / best_time if best_time > 0 else float("inf"),
+                }
+                results.append(record)
+                if verbose:
+                    print(f"  {workload['name']:<32} {stage:<24} {best_time:9.4f} s", file=sys.stderr)
+
+    return results
+
+def scaling_exponents(results):
+    """
+    Fits the scaling exponent of each stage (slope of log time against log peaks).
+
+    Parameters
+    ----------
+    results : list of dict
+        Output of `run_benchmarks`.
+
+    Returns
+    -------
+    exponents : dict
+        Stage name -> exponent, for the stages measured on at least two sizes.
+    """
+    exponents = {}
+    for stage in dict.fromkeys(record["stage"] for record in results):
+        records = [record for record in results if record["stage"] == stage and record["time"] > 0]
+        n_peaks = np.array([record["n_peaks"] for record in records], dtype=float)
+        if len(np.unique(n_peaks)) < 2:
+            continue
+        times = np.array([record["time"] for record in records])
+        exponents[stage] = float(np.polyfit(np.log(n_peaks), np.log(times), 1)[0])
+
+    return exponents
+
+def format_report(results, baseline=None):
+    """
+    Formats benchmark results as a text table.
+
+    Parameters
+    ----------
+    results : list of dict
+        Output of `run_benchmarks`.
+
+    baseline : list of dict, optional
+        Results of a previous run. When given, the time ratio to it is shown
+        (above 1 is slower).
+
+    Returns
+    -------
+    report : str
+        One row per stage and workload, followed by the scaling exponents.
+    """
+    baseline_times = {(r["stage"], r["workload"]): r["time"] for r in baseline or []}
+
+    header = f"{'Workload':<32}  {'Stage':<24}  {'Time (s)':>9}  {'Peaks/s':>12}"
+    if baseline is not None:
+        header += f"  {'vs base':>8}"
+    lines = [header]
+    for record in results:
+        line = (f"{record['workload']:<32}  {record['stage']:<24}  "
+                f"{record['time']:>9.4f}  {record['peaks_per_second']:>12.3g}")
+        if baseline is not None:
+            base_time = baseline_times.get((record["stage"], record["workload"]))
+            line += f"  {record['time'] / base_time:>7.2f}x" if base_time else f"  {'-':>8}"
+        lines.append(line)
+
+    exponents = scaling_exponents(results)
+    if exponents:
+        lines.append("")
+        lines.append("Scaling exponent (time ~ peaks^k):")
+        for stage, exponent in exponents.items():
+            lines.append(f"  {stage:<24}  k = {exponent:.2f}")
+
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the SICRITfix pipeline on synthetic runs.")
+    parser.add_argument("--scans", type=int, nargs="+", default=[500, 2000], help="Numbers of scans (default: 500 2000)")
+    parser.add_argument("--peaks", type=int, nargs="+", default=[100, 400], help="Peaks per scan (default: 100 400)")
+    parser.add_argument(
+        "--oscillating", type=float, nargs="+", default=[0.05],
+        help="Fractions of oscillating m/z values (default: 0.05)"
+    )
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="Stages to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best is kept (default: 3)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scans, args.peaks, args.oscillating, args.stages, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print(format_report(results, baseline))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results, "scaling": scaling_exponents(results)}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/workloads.py
+#!/usr/bin/env python
+
+"""
+This Python module generates the synthetic MS experiments used by the benchmarks.
+
+@contents  :  Parametrized synthetic experiments with oscillating m/z values.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  workloads.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - numpy
+    - pyopenms
+
+@functions :
+    - make_experiment
+
+@notes :
+    Every scan holds the reference m/z (922.098), oscillating like the SICRIT
+    artifact, and the same `peaks_per_scan - 1` background m/z values with 5%
+    intensity noise. A fraction of the background oscillates with the
+    reference phase.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import numpy as np
+import pyopenms as oms
+
+REFERENCE_MZ = 922.098
+
+# Oscillation of the SICRIT artifact: slowly drifting frequency (Hz)
+_BASE_FREQ = 0.1
+_FREQ_DRIFT = 2e-5
+
+
+def make_experiment(n_scans, peaks_per_scan, oscillating_fraction=0.05, scan_interval=0.5, seed=0):
+    """
+    Builds a synthetic MS1 experiment.
+
+    Parameters
+    ----------
+    n_scans : int
+        Number of spectra.
+
+    peaks_per_scan : int
+        Number of peaks of each spectrum (including the reference m/z).
+
+    oscillating_fraction : float, optional (default=0.05)
+        Fraction of the m/z pool that oscillates with the reference.
+
+    scan_interval : float, optional (default=0.5)
+        Time (in seconds) between consecutive scans.
+
+    seed : int, optional (default=0)
+        Seed of the random generator.
+
+    Returns
+    -------
+    experiment : oms.MSExperiment
+        The synthetic experiment, with sorted peaks in every spectrum.
+    """
+    rng = np.random.default_rng(seed)
+    rts = np.arange(n_scans) * scan_interval
+    phase = 2 * np.pi * (_BASE_FREQ * rts + _FREQ_DRIFT * rts ** 2)
+
+    # Pool of m/z values present in every scan, away from the reference
+    pool_mzs = np.round(rng.uniform(150, 900, max(0, peaks_per_scan - 1)), 3)
+    pool_base = rng.uniform(1e3, 1e5, len(pool_mzs))
+    pool_amplitude = np.where(rng.random(len(pool_mzs)) < oscillating_fraction, 0.4 * pool_base, 0.0)
+
+    experiment = oms.MSExperiment()
+    for rt, scan_phase in zip(rts, phase):
+        intensities = pool_base + pool_amplitude * np.sin(scan_phase)
+        intensities *= rng.uniform(0.95, 1.05, len(pool_mzs))
+
+        mzs = np.append(pool_mzs, REFERENCE_MZ)
+        intensities = np.append(intensities, 1e4 + 5e3 * np.sin(scan_phase))
+        order = np.argsort(mzs)
+
+        spectrum = oms.MSSpectrum()
+        spectrum.setRT(float(rt))
+        spectrum.setMSLevel(1)
+        spectrum.set_peaks((mzs[order], intensities[order]))
+        experiment.addSpectrum(spectrum)
+
+    return experiment
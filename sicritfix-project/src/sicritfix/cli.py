@@ -2,11 +2,214 @@
 # src/sicritfix/main.py
 import argparse
 import os
+import sys
 from sicritfix.processing.processor import process_file
+from sicritfix.processing.realtime import correct_file_realtime
+from sicritfix.processing.batch import find_input_files, process_batch, format_batch_summary
+from sicritfix.utils.progress import ProgressBar
+from sicritfix.io.io import NUMPRESS_METHODS, ENCODING_KEYS, LOAD_FILTER_KEYS
 
-def main():
+def _reference_mz(value):
+    """argparse type of --mz_ref: an m/z value or "auto"."""
+    if value == "auto":
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an m/z value or 'auto', got {value!r}")
+
+def _add_encoding_arguments(parser):
+    """Options of the binary encoding of the output files."""
+    parser.add_argument(
+        "--numpress_mz", choices=NUMPRESS_METHODS,
+        help="MS-Numpress codec of the output m/z arrays (usually 'linear')"
+    )
+    parser.add_argument(
+        "--numpress_intensity", choices=NUMPRESS_METHODS,
+        help="MS-Numpress codec of the output intensity arrays (usually 'slof' or 'pic')"
+    )
+    parser.add_argument(
+        "--mz_precision", type=int, choices=[32, 64],
+        help="Bits per m/z value in the output (default: OpenMS default)"
+    )
+    parser.add_argument(
+        "--intensity_precision", type=int, choices=[32, 64],
+        help="Bits per intensity value in the output (default: OpenMS default)"
+    )
+    parser.add_argument(
+        "--zlib", action="store_const", const=True, default=None, help="Compress the output binary arrays with zlib"
+    )
+    parser.add_argument(
+        "--no_zlib", dest="zlib", action="store_const", const=False,
+        help="Write the output binary arrays uncompressed (default: OpenMS default)"
+    )
+    parser.add_argument(
+        "--no_index", dest="write_index", action="store_false", default=None,
+        help="Write a plain mzML file, without the index of the spectra offsets"
+    )
+
+def _encoding(args):
+    """Output encoding (see `peak_file_options`) of the parsed options, None if none was given."""
+    encoding = {key: getattr(args, key) for key in ENCODING_KEYS if getattr(args, key) is not None}
+    
+    return encoding or None
+
+def _add_load_filter_arguments(parser):
+    """Options of the region of each run that is analyzed."""
+    parser.add_argument(
+        "--ms_levels", type=int, nargs="+", metavar="MS_LEVEL",
+        help="Only analyze the spectra of these MS levels; the others are written unchanged"
+    )
+    parser.add_argument(
+        "--rt_range", type=float, nargs=2, metavar=("MIN", "MAX"),
+        help="Only analyze the spectra in this retention time range (seconds); the others are written unchanged"
+    )
+    parser.add_argument(
+        "--mz_range", type=float, nargs=2, metavar=("MIN", "MAX"),
+        help="Only analyze the peaks in this m/z range (it must include the reference m/z)"
+    )
+    parser.add_argument(
+        "--skip_chromatograms", action="store_true", default=None,
+        help="Do not load the chromatograms for the analysis (they are still written to the output)"
+    )
+    parser.add_argument(
+        "--skip_metadata", action="store_true", default=None,
+        help="Only load the peaks, retention time, MS level and polarity of each spectrum for the analysis "
+             "(the output keeps the full spectra)"
+    )
+
+def _load_filters(args):
+    """Load filters (see `load_options`) of the parsed options, None if none was given."""
+    filters = {key: getattr(args, key) for key in LOAD_FILTER_KEYS if getattr(args, key) is not None}
+    
+    return filters or None
+
+# Options of process_file that the real-time corrector has no equivalent for
+REALTIME_UNSUPPORTED = [
+    "plot", "streaming", "memory_budget", "jobs", "cache_dir", "cache_size", "msconvert", "detector",
+    "amplitude_model", "n_references", "calibration", "save_calibration", "profile", "progress",
+    "ms_levels", "rt_range", "mz_range", "skip_chromatograms", "skip_metadata",
+]
+
+def _check_realtime_arguments(parser, args):
+    """Rejects the options given with --realtime that `correct_file_realtime` does not support."""
+    unsupported = [name for name in REALTIME_UNSUPPORTED if getattr(args, name) != parser.get_default(name)]
+    if unsupported:
+        parser.error("not supported with --realtime: " + ", ".join("--" + name for name in unsupported))
+    if args.mz_ref == "auto":
+        parser.error("--mz_ref auto is not supported with --realtime")
+
+def batch_main(argv):
     parser = argparse.ArgumentParser(
-        description="Correct oscillations in an mzML/mzXML file and output the corrected mzML."
+        prog="sicritfix batch",
+        description="Correct oscillations in many mzML/mzXML files in parallel."
+    )
+
+    parser.add_argument("input", help="Directory or glob pattern (quoted) of mzML/mzXML files")
+
+    parser.add_argument(
+        "--outdir", required=True, help="Directory where '<name>_corrected.mzML' files are written"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="Number of files processed in parallel (default: 1)"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="Maximum time in seconds allowed per file"
+    )
+    parser.add_argument(
+        "--overwrite", action="store_true", help="Overwrite output files that already exist"
+    )
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="Process each file in two streaming passes without loading it whole (for very large files)"
+    )
+    parser.add_argument(
+        "--memory_budget", type=float, default=256,
+        help="Memory (in MB) used for each chunk of candidate XICs during detection (default: 256)"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the output of each file"
+    )
+    parser.add_argument(
+        "--power_threshold", type=float, default=0.15,
+        help="Minimum relative spectral power for an m/z to be considered oscillating (default: 0.15)"
+    )
+    parser.add_argument(
+        "--cache_dir", default=None,
+        help="Directory of an on-disk cache of parsed runs and analysis results, reused by later runs"
+    )
+    parser.add_argument(
+        "--cache_size", type=float, default=10240,
+        help="Size cap (in MB) of the cache; least recently used runs are evicted (default: 10240)"
+    )
+    parser.add_argument(
+        "--msconvert", action="store_true",
+        help="Convert mzXML input with ProteoWizard's msconvert instead of reading it natively"
+    )
+    parser.add_argument(
+        "--detector", choices=["fft", "band"], default="fft",
+        help="Oscillation detector: full spectrum ('fft') or only the band of the reference frequency ('band')"
+    )
+    parser.add_argument(
+        "--amplitude_model", choices=["percentile", "lockin"], default="percentile",
+        help="Oscillation fit: local interquartile ranges ('percentile') or least squares on the reference phase ('lockin')"
+    )
+    parser.add_argument(
+        "--mz_ref", type=_reference_mz, default=922.098,
+        help="Reference m/z of the oscillation, or 'auto' to pick the best references from the detection scores (default: 922.098)"
+    )
+    parser.add_argument(
+        "--n_references", type=int, default=3,
+        help="Maximum number of references averaged with --mz_ref auto (default: 3)"
+    )
+    parser.add_argument(
+        "--calibration", metavar="CALIBRATION_JSON",
+        help="Phase calibration of the method: only the phase offset is fitted, with full estimation as fallback"
+    )
+    _add_encoding_arguments(parser)
+    _add_load_filter_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    input_paths = find_input_files(args.input)
+    if not input_paths:
+        print(f" No mzML/mzXML files found: {args.input}")
+        return
+
+    print(f" Processing {len(input_paths)} files with {args.jobs} jobs")
+    results = process_batch(
+        input_paths,
+        args.outdir,
+        jobs=args.jobs,
+        timeout=args.timeout,
+        overwrite=args.overwrite,
+        quiet=not args.verbose,
+        verbose=args.verbose,
+        memory_budget_mb=args.memory_budget,
+        streaming=args.streaming,
+        power_threshold=args.power_threshold,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size,
+        msconvert=args.msconvert,
+        detector=args.detector,
+        amplitude_model=args.amplitude_model,
+        mz_ref=args.mz_ref,
+        n_references=args.n_references,
+        calibration=args.calibration,
+        encoding=_encoding(args),
+        load_filters=_load_filters(args),
+    )
+    print(format_batch_summary(results))
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["batch"]:
+        return batch_main(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description="Correct oscillations in an mzML/mzXML file and output the corrected mzML. "
+                    "Use 'sicritfix batch --help' to process many files."
     )
 
     parser.add_argument("input", help="Path to input mzML file")
@@ -34,8 +237,77 @@ def main():
     parser.add_argument(
         "--verbose", action="store_true", help="Enable verbose output"
     )
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="Process the file in two streaming passes without loading it whole (for very large files)"
+    )
+    parser.add_argument(
+        "--memory_budget", type=float, default=256,
+        help="Memory (in MB) used for each chunk of candidate XICs during detection (default: 256)"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="Number of processes used for detection and correction (default: 1)"
+    )
+    parser.add_argument(
+        "--power_threshold", type=float, default=None,
+        help="Minimum relative spectral power for an m/z to be considered oscillating (default: 0.15, 0.5 with --realtime)"
+    )
+    parser.add_argument(
+        "--cache_dir", default=None,
+        help="Directory of an on-disk cache of parsed runs and analysis results, reused by later runs"
+    )
+    parser.add_argument(
+        "--cache_size", type=float, default=10240,
+        help="Size cap (in MB) of the cache; least recently used runs are evicted (default: 10240)"
+    )
+    parser.add_argument(
+        "--msconvert", action="store_true",
+        help="Convert mzXML input with ProteoWizard's msconvert instead of reading it natively"
+    )
+    parser.add_argument(
+        "--detector", choices=["fft", "band"], default="fft",
+        help="Oscillation detector: full spectrum ('fft') or only the band of the reference frequency ('band')"
+    )
+    parser.add_argument(
+        "--amplitude_model", choices=["percentile", "lockin"], default="percentile",
+        help="Oscillation fit: local interquartile ranges ('percentile') or least squares on the reference phase ('lockin')"
+    )
+    parser.add_argument(
+        "--mz_ref", type=_reference_mz, default=922.098,
+        help="Reference m/z of the oscillation, or 'auto' to pick the best references from the detection scores (default: 922.098)"
+    )
+    parser.add_argument(
+        "--n_references", type=int, default=3,
+        help="Maximum number of references averaged with --mz_ref auto (default: 3)"
+    )
+    parser.add_argument(
+        "--calibration", metavar="CALIBRATION_JSON",
+        help="Phase calibration of the method: only the phase offset is fitted, with full estimation as fallback"
+    )
+    parser.add_argument(
+        "--save_calibration", metavar="CALIBRATION_JSON",
+        help="Save the phase calibration of this run, to be reused with --calibration"
+    )
+    parser.add_argument(
+        "--profile", metavar="REPORT_JSON",
+        help="Write a JSON report with the time, memory and work counters of each stage of the run"
+    )
+    parser.add_argument(
+        "--progress", action="store_true",
+        help="Show a progress bar of each stage, with its ETA, on stderr"
+    )
+    parser.add_argument(
+        "--realtime", action="store_true",
+        help="Correct the file in one pass with the real-time corrector (online phase tracking, as during an acquisition). "
+             "Only --mz_ref, --power_threshold and the output encoding options apply"
+    )
+    _add_encoding_arguments(parser)
+    _add_load_filter_arguments(parser)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.realtime:
+        _check_realtime_arguments(parser, args)
 
     if not os.path.exists(args.input):
         print(f" Input file not found: {args.input}")
@@ -75,14 +347,40 @@ def main():
     else:
         mz_window=0.01
     
+    if args.realtime:
+        options = {"mz_ref": args.mz_ref}
+        if args.power_threshold is not None:
+            options["power_threshold"] = args.power_threshold
+        corrector = correct_file_realtime(args.input, output_path, encoding=_encoding(args), **options)
+        if corrector.locked:
+            print(f" Real-time correction done ({corrector.n_peaks_rewritten} peaks rewritten). Corrected file saved to: {output_path}")
+        else:
+            print(f" Reference oscillation not found. Original file saved to: {output_path}")
+        return
+
     # Run the processing function
     file_corrected=process_file(
         file_path=args.input,
         save_as=output_path,
         plot=args.plot,
         verbose=args.verbose,
-        mz_window=args.mz_window,
-        rt_window=args.rt_window,
+        memory_budget_mb=args.memory_budget,
+        streaming=args.streaming,
+        jobs=args.jobs,
+        power_threshold=0.15 if args.power_threshold is None else args.power_threshold,
+        cache_dir=args.cache_dir,
+        cache_size_mb=args.cache_size,
+        msconvert=args.msconvert,
+        detector=args.detector,
+        amplitude_model=args.amplitude_model,
+        mz_ref=args.mz_ref,
+        n_references=args.n_references,
+        calibration=args.calibration,
+        save_calibration=args.save_calibration,
+        profile=args.profile,
+        progress=ProgressBar() if args.progress else None,
+        encoding=_encoding(args),
+        load_filters=_load_filters(args),
     )
     
     if file_corrected:
@@ -0,0 +1,261 @@
+# io/cache.py
+
+#!/usr/bin/env python
+
+"""
+This Python module provides an on-disk cache of parsed runs and intermediate
+results, so that re-processing a file with other options skips the parse and
+the analysis steps whose parameters did not change.
+
+@contents  :  Content-hash keyed cache with size cap and LRU eviction.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  cache.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - numpy
+    - sicritfix.utils.peak_table
+
+@classes :
+    - RunCache
+
+@functions :
+    - file_hash
+    - params_hash
+
+@notes :
+    Layout: ``<cache_dir>/<file hash>/peaks/*.npy`` holds the PeakTable arrays
+    (loaded memory-mapped) and ``<cache_dir>/<file hash>/<name>-<params hash>.npz``
+    the results of each analysis step. Entries are written to a temporary
+    name and renamed, so concurrent runs never see partial entries. Whole
+    runs are evicted, least recently used first, when the cache exceeds its cap.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+from sicritfix.utils.peak_table import PeakTable
+
+# Bumped whenever the content of the cached files changes
+# (4: reference phase fitted against the time elapsed since the first scan)
+CACHE_VERSION = 4
+
+_PEAK_TABLE_ARRAYS = ("mz", "intensity", "offsets", "rt", "cumulative_intensity", "ms_level", "polarity")
+
+
+def file_hash(file_path, block_size=1 << 20):
+    """
+    Computes the content hash of a file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file.
+
+    block_size : int, optional (default=1 MB)
+        Size of the blocks read at a time.
+
+    Returns
+    -------
+    str
+        Hexadecimal BLAKE2b digest of the file content.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def params_hash(params):
+    """
+    Computes a short hash of a dictionary of parameters.
+
+    Parameters
+    ----------
+    params : dict
+        JSON-serializable parameters.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest, identical for equal parameters in any order.
+    """
+    encoded = json.dumps({"version": CACHE_VERSION, **params}, sort_keys=True, default=float)
+
+    return hashlib.blake2b(encoded.encode(), digest_size=8).hexdigest()
+
+class RunCache:
+    """
+    On-disk cache of PeakTables and analysis results, keyed by file content.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cache. Created if needed.
+
+    max_size_mb : float, optional (default=10240)
+        Size cap of the cache. When exceeded after a write, the least recently
+        used runs are removed.
+    """
+
+    def __init__(self, cache_dir, max_size_mb=10240):
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def run_key(self, file_path):
+        """
+        Returns the cache key of an input file (the hash of its content).
+        """
+        return file_hash(file_path)
+
+    def load_peak_table(self, run_key):
+        """
+        Returns the cached PeakTable of a run, memory-mapped, or None.
+        """
+        peaks_dir = os.path.join(self._run_dir(run_key), "peaks")
+        if not os.path.isdir(peaks_dir):
+            return None
+
+        try:
+            arrays = {
+                name: np.load(os.path.join(peaks_dir, name + ".npy"), mmap_mode="r")
+                for name in _PEAK_TABLE_ARRAYS
+            }
+        except (OSError, ValueError):
+            return None
+        self._touch(run_key)
+
+        return PeakTable.from_buffers(**arrays)
+
+    def store_peak_table(self, run_key, peak_table):
+        """
+        Saves the arrays of a PeakTable as .npy files.
+        """
+        run_dir = self._run_dir(run_key)
+        os.makedirs(run_dir, exist_ok=True)
+
+        tmp_dir = os.path.join(run_dir, f".peaks-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        for name in _PEAK_TABLE_ARRAYS:
+            np.save(os.path.join(tmp_dir, name + ".npy"), getattr(peak_table, name))
+        try:
+            os.rename(tmp_dir, os.path.join(run_dir, "peaks"))
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True) # stored meanwhile by another run
+
+        self._touch(run_key)
+        self.evict()
+
+    def load_result(self, run_key, name, params):
+        """
+        Returns the cached arrays of an analysis step, or None.
+
+        Parameters
+        ----------
+        run_key : str
+            Key of the run (see `run_key`).
+
+        name : str
+            Name of the analysis step (e.g. "reference", "detection").
+
+        params : dict
+            Parameters the result depends on.
+
+        Returns
+        -------
+        dict of np.ndarray or None
+        """
+        path = self._result_path(run_key, name, params)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path) as data:
+                result = {key: data[key] for key in data.files}
+        except (OSError, ValueError):
+            return None
+        self._touch(run_key)
+
+        return result
+
+    def store_result(self, run_key, name, params, **arrays):
+        """
+        Saves the arrays of an analysis step.
+        """
+        path = self._result_path(run_key, name, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = path + f".{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+        self._touch(run_key)
+        self.evict()
+
+    def size_mb(self):
+        """
+        Returns the total size of the cache in MB.
+        """
+        return sum(size for _, _, size in self._runs()) / 1024 ** 2
+
+    def evict(self):
+        """
+        Removes the least recently used runs until the cache fits its size cap.
+        """
+        runs = sorted(self._runs(), key=lambda run: run[1])
+        total = sum(size for _, _, size in runs)
+        max_bytes = self.max_size_mb * 1024 ** 2
+
+        while runs and total > max_bytes:
+            run_dir, _, size = runs.pop(0)
+            shutil.rmtree(run_dir, ignore_errors=True)
+            total -= size
+
+    def _run_dir(self, run_key):
+        return os.path.join(self.cache_dir, run_key)
+
+    def _result_path(self, run_key, name, params):
+        return os.path.join(self._run_dir(run_key), f"{name}-{params_hash(params)}.npz")
+
+    def _touch(self, run_key):
+        try:
+            os.utime(self._run_dir(run_key))
+        except OSError:
+            pass
+
+    def _runs(self):
+        """Yields (run directory, last use time, size in bytes) of every cached run."""
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            size = 0
+            for root, _, files in os.walk(entry.path):
+                for file_name in files:
+                    try:
+                        size += os.path.getsize(os.path.join(root, file_name))
+                    except OSError:
+                        pass
+            yield entry.path, entry.stat().st_mtime, size
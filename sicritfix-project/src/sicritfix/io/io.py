@@ -23,11 +23,19 @@ specifically mzML and mzXML formats, using OpenMS and ProteoWizard tools.
 
 @dependencies :
     - pyopenms
-    - ProteoWizard (msconvert) must be installed and accessible in system PATH
+    - ProteoWizard (msconvert), only for the optional msconvert conversion of mzXML files
 
 @raises :
     - RuntimeError if file conversion or loading fails
 
+@notes :
+    `load_peak_table` and `stream_file` process spectra one at a time through
+    pyopenms consumers, so they never hold a full MSExperiment in memory.
+    The binary encoding of the written files (MS-Numpress, 32/64-bit floats,
+    zlib, index) is set by an encoding dict (see `peak_file_options`), and
+    what is decoded when reading (MS levels, RT and m/z ranges, chromatograms,
+    metadata) by a load filters dict (see `load_options`).
+
 @copyright :
     Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
     All rights reserved. Reproduction in whole or in part is prohibited
@@ -39,48 +47,579 @@ __copyright__ = "GPL License version 3"
 
 
 import os
+import queue
+import shutil
 import subprocess
-import time
+import tempfile
+import threading
+import numpy as np
 import pyopenms as oms
+from sicritfix.io.cache import file_hash
+from sicritfix.utils.peak_table import PeakTable, spectrum_stream
+
+# Directory where mzXML files converted with msconvert are cached
+DEFAULT_SCRATCH_DIR = os.path.join(tempfile.gettempdir(), "sicritfix-msconvert")
+
+# MS-Numpress codecs of the output binary arrays
+NUMPRESS_METHODS = ("linear", "pic", "slof")
+
+# Keys of an output encoding (see `peak_file_options`)
+ENCODING_KEYS = ("numpress_mz", "numpress_intensity", "mz_precision", "intensity_precision", "zlib", "write_index")
+
+def peak_file_options(encoding=None):
+    """
+    Builds the pyopenms PeakFileOptions of an output encoding.
+
+    Args:
+        encoding (dict, optional): Binary encoding of the written mzML file. Keys 
+            (all optional, missing or None keeps the OpenMS default):
+
+            - "numpress_mz", "numpress_intensity": MS-Numpress codec of the m/z 
+              and intensity arrays, one of `NUMPRESS_METHODS` ("linear" is the 
+              usual one for m/z, "slof" or "pic" for intensities).
+            - "mz_precision", "intensity_precision": 32 or 64 (bits per value).
+            - "zlib" (bool): zlib compression of the binary arrays.
+            - "write_index" (bool): write the indexed mzML offsets.
+
+    Returns:
+        oms.PeakFileOptions: The options to set on an MzMLFile or a writing consumer.
+
+    Raises:
+        ValueError: If a key or a value of `encoding` is not supported.
+    """
+    encoding = encoding or {}
+    unknown = set(encoding) - set(ENCODING_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown encoding options: {', '.join(sorted(unknown))}")
+    
+    options = oms.PeakFileOptions()
+    for key, set_numpress in [("numpress_mz", options.setNumpressConfigurationMassTime), ("numpress_intensity", options.setNumpressConfigurationIntensity)]:
+        method = encoding.get(key)
+        if method is None:
+            continue
+        if method not in NUMPRESS_METHODS:
+            raise ValueError(f"{key} must be one of {', '.join(NUMPRESS_METHODS)}, got {method!r}")
+        config = oms.NumpressConfig()
+        config.setCompression(method)
+        config.estimate_fixed_point = True
+        set_numpress(config)
+    
+    for key, set_32_bit in [("mz_precision", options.setMz32Bit), ("intensity_precision", options.setIntensity32Bit)]:
+        precision = encoding.get(key)
+        if precision is None:
+            continue
+        if precision not in (32, 64):
+            raise ValueError(f"{key} must be 32 or 64, got {precision!r}")
+        set_32_bit(precision == 32)
+    
+    if encoding.get("zlib") is not None:
+        options.setCompression(bool(encoding["zlib"]))
+    if encoding.get("write_index") is not None:
+        options.setWriteIndex(bool(encoding["write_index"]))
+    
+    return options
+
+def store_file(save_as, input_map, encoding=None):
+    """
+    Stores an MSExperiment as an mzML file.
+
+    Args:
+        save_as (str): Path of the mzML file to write.
+        input_map (oms.MSExperiment): The experiment to store.
+        encoding (dict, optional): Binary encoding of the file (see `peak_file_options`).
+
+    Returns:
+        None
+    """
+    mzml_file = oms.MzMLFile()
+    if encoding:
+        mzml_file.setOptions(peak_file_options(encoding))
+    mzml_file.store(save_as, input_map)
+
+# Keys of the load filters (see `load_options`)
+LOAD_FILTER_KEYS = ("ms_levels", "rt_range", "mz_range", "skip_chromatograms", "skip_metadata")
 
-def load_file(file_path):
+def load_file(file_path, msconvert=False, filters=None):
     
     """
     Loads a mass spectrometry file in mzML or mzXML format.
 
-    If the provided file is in mzXML format, it is automatically converted to mzML
-    before being loaded. The mzML file is then loaded using OpenMS's MSExperiment class.
+    Both formats are read directly with OpenMS into an MSExperiment. With 
+    `msconvert`, mzXML files are converted to mzML with ProteoWizard first 
+    (see `get_input_path`).
 
     Args:
         file_path (str): Path to the mzML or mzXML file.
+        msconvert (bool, optional): Convert mzXML files with msconvert instead of 
+            reading them natively. Defaults to False.
+        filters (dict, optional): Load filters (see `load_options`). Spectra and 
+            peaks outside of them are not decoded, so the experiment only holds 
+            the region of interest, without the experimental settings of the run. 
+            Everything is loaded by default.
 
     Returns:
         oms.MSExperiment: An object representing the loaded mass spectrometry experiment,
         ready for further processing.
 
     Raises:
-        RuntimeError: If the converted mzML file is not found after conversion.
+        RuntimeError: If the conversion with msconvert fails.
+        ValueError: If `filters` is not valid.
     """
     
+    input_path = get_input_path(file_path, msconvert)
+    if filters:
+        consumer = ExperimentConsumer(filters.get("skip_chromatograms", False), filters.get("skip_metadata", False))
+        _filtered_handler(input_path, filters).transform(input_path, consumer)
+        return consumer.experiment
+    
     input_map = oms.MSExperiment()
+    get_file_handler(input_path).load(input_path, input_map)
+    
+    return input_map
+
+def load_options(filters=None):
+    """
+    Builds the pyopenms PeakFileOptions of load filters.
+
+    Args:
+        filters (dict, optional): What to decode from a file. Keys (all optional):
+
+            - "ms_levels" (list of int): Only load the spectra of these MS levels.
+            - "rt_range" (tuple of float): Only load the spectra with a retention 
+              time (in seconds) in ``[min, max]``.
+            - "mz_range" (tuple of float): Only load the peaks with an m/z in 
+              ``[min, max]``.
+            - "skip_chromatograms" (bool), "skip_metadata" (bool): Drop the 
+              chromatograms, or the metadata of each spectrum (see 
+              `ExperimentConsumer`). They are applied by the consumers of the 
+              file, not by these options.
+
+    Returns:
+        oms.PeakFileOptions: The options to set on an MzMLFile or MzXMLFile 
+        before ``load`` or ``transform``.
+
+    Raises:
+        ValueError: If a key or a range of `filters` is not valid.
+    """
+    filters = filters or {}
+    unknown = set(filters) - set(LOAD_FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown load filters: {', '.join(sorted(unknown))}")
+    
+    options = oms.PeakFileOptions()
+    if filters.get("ms_levels"):
+        options.setMSLevels([int(ms_level) for ms_level in filters["ms_levels"]])
+    for key, set_range in [("rt_range", options.setRTRange), ("mz_range", options.setMZRange)]:
+        if filters.get(key) is None:
+            continue
+        low, high = filters[key]
+        if not low <= high:
+            raise ValueError(f"{key} must be (min, max) with min <= max, got {filters[key]!r}")
+        set_range(_closed_range(low, high))
+    
+    return options
+
+def _closed_range(low, high):
+    """
+    DRange1 holding ``[low, high]``, for the pyopenms versions with DPosition1 
+    (up to 3.4) and those with ``setMinX``/``setMaxX`` (3.6). The upper bound 
+    is widened by one ulp, as it is exclusive in the later ones.
+    """
+    high = float(np.nextafter(float(high), np.inf))
+    if hasattr(oms, "DPosition1"):
+        return oms.DRange1(oms.DPosition1(float(low)), oms.DPosition1(high))
+    value_range = oms.DRange1()
+    value_range.setMinX(float(low))
+    value_range.setMaxX(high)
+    
+    return value_range
+
+def _filtered_handler(file_path, filters):
+    """File handler of `file_path` with the options of the load filters set."""
+    handler = get_file_handler(file_path)
+    handler.setOptions(load_options(filters))
     
+    return handler
+
+def get_file_handler(file_path):
+    """
+    Returns the OpenMS file handler for the format of `file_path`.
+
+    Args:
+        file_path (str): Path to an mzML or mzXML file.
+
+    Returns:
+        oms.MzXMLFile for .mzXML files, oms.MzMLFile otherwise. Both provide 
+        ``load``, ``store`` and ``transform``.
+    """
+    if os.path.splitext(file_path)[1].lower() == ".mzxml":
+        return oms.MzXMLFile()
+    
+    return oms.MzMLFile()
+
+def get_input_path(file_path, msconvert=False, scratch_dir=None):
+    """
+    Returns the path of the file to read for `file_path`.
+
+    Files are returned unchanged unless `msconvert` is set and the file is an 
+    mzXML file: it is then converted to mzML with ProteoWizard's msconvert 
+    (with peak picking). Conversions are cached in `scratch_dir` under the hash 
+    of the input content, so a file is converted once and concurrent runs on 
+    the same input folder never collide.
+
+    Args:
+        file_path (str): Path to the mzML or mzXML file.
+        msconvert (bool, optional): Convert mzXML files with msconvert. Defaults to False.
+        scratch_dir (str, optional): Directory of the converted files. Defaults to 
+            `DEFAULT_SCRATCH_DIR`.
+
+    Returns:
+        str: Path to the file to read.
+
+    Raises:
+        RuntimeError: If the conversion with msconvert fails.
+    """
     file_extension = os.path.splitext(file_path)[1].lower()
 
-    if file_extension == ".mzxml":
-        mzml_file_path = convert_mzxml_2_mzml(file_path)
-        print("Converting to mzML...")
-        time.sleep(3)
-        if not os.path.exists(mzml_file_path):
-            raise RuntimeError("Error: file not found")
-        else:
-            print("Loading mzML file...")
-            oms.MzMLFile().load(mzml_file_path, input_map)
-    else:
-        oms.MzMLFile().load(file_path, input_map)
+    if not msconvert or file_extension != ".mzxml":
+        return file_path
     
-    return input_map
+    scratch_dir = scratch_dir or DEFAULT_SCRATCH_DIR
+    os.makedirs(scratch_dir, exist_ok=True)
+    mzml_file_path = os.path.join(scratch_dir, file_hash(file_path) + ".mzML")
+    if os.path.exists(mzml_file_path):
+        return mzml_file_path
+    
+    # Convert in a private folder and move the result into place atomically
+    print("Converting to mzML...")
+    conversion_dir = tempfile.mkdtemp(dir=scratch_dir)
+    try:
+        converted_path = convert_mzxml_2_mzml(file_path, output_folder=conversion_dir)
+        os.replace(converted_path, mzml_file_path)
+    finally:
+        shutil.rmtree(conversion_dir, ignore_errors=True)
+    
+    return mzml_file_path
+
+class ExperimentConsumer:
+    """
+    pyopenms consumer that collects the spectra it receives in an MSExperiment.
+
+    Used with ``transform`` by `load_file` when load filters are given, so 
+    that chromatograms and metadata can be dropped as they are read. The 
+    experimental settings of the run are not kept (MSExperiment has no setter 
+    for them in pyopenms).
+
+    Args:
+        skip_chromatograms (bool, optional): Drop the chromatograms. Defaults to False.
+        skip_metadata (bool, optional): Keep only the peaks, retention time, MS 
+            level, polarity and native ID of each spectrum. Defaults to False.
+    """
+
+    def __init__(self, skip_chromatograms=False, skip_metadata=False):
+        self.skip_chromatograms = skip_chromatograms
+        self.skip_metadata = skip_metadata
+        self.experiment = oms.MSExperiment()
+
+    def setExpectedSize(self, n_spectra, n_chromatograms):
+        pass
+
+    def setExperimentalSettings(self, settings):
+        pass
+
+    def consumeSpectrum(self, spectrum):
+        if self.skip_metadata:
+            stripped = oms.MSSpectrum()
+            stripped.set_peaks(spectrum.get_peaks())
+            stripped.setRT(spectrum.getRT())
+            stripped.setMSLevel(spectrum.getMSLevel())
+            stripped.setNativeID(spectrum.getNativeID())
+            settings = oms.InstrumentSettings()
+            settings.setPolarity(spectrum.getInstrumentSettings().getPolarity())
+            stripped.setInstrumentSettings(settings)
+            spectrum = stripped
+        self.experiment.addSpectrum(spectrum)
+
+    def consumeChromatogram(self, chromatogram):
+        if not self.skip_chromatograms:
+            self.experiment.addChromatogram(chromatogram)
+
+class PeakTableConsumer:
+    """
+    pyopenms spectrum consumer that only keeps the peaks, retention time, MS 
+    level and polarity of each spectrum.
+
+    Used with ``MzMLFile().transform`` to collect the data needed for detection 
+    without building an MSExperiment. Metadata and chromatograms are dropped.
+
+    Args:
+        keep_native_ids (bool, optional): Also keep the native ID of each 
+            spectrum, in `native_ids`. Defaults to False.
+    """
+
+    def __init__(self, keep_native_ids=False):
+        self.mz_array = []
+        self.intensity_array = []
+        self.rts = []
+        self.ms_levels = []
+        self.polarities = []
+        self.native_ids = [] if keep_native_ids else None
+
+    def setExpectedSize(self, n_spectra, n_chromatograms):
+        pass
+
+    def setExperimentalSettings(self, settings):
+        pass
+
+    def consumeSpectrum(self, spectrum):
+        mzs, intensities = spectrum.get_peaks()
+        self.mz_array.append(mzs)
+        self.intensity_array.append(intensities)
+        self.rts.append(spectrum.getRT())
+        ms_level, polarity = spectrum_stream(spectrum)
+        self.ms_levels.append(ms_level)
+        self.polarities.append(polarity)
+        if self.native_ids is not None:
+            self.native_ids.append(spectrum.getNativeID())
+
+    def consumeChromatogram(self, chromatogram):
+        pass
+
+    def to_peak_table(self):
+        """
+        Builds the PeakTable of the consumed spectra and releases the per-scan lists.
+
+        Returns:
+            PeakTable: The peaks of every consumed spectrum, in file order.
+        """
+        peak_table = PeakTable.from_arrays(self.rts, self.mz_array, self.intensity_array, self.ms_levels, self.polarities)
+        self.mz_array, self.intensity_array, self.rts, self.ms_levels, self.polarities = [], [], [], [], []
+        
+        return peak_table
+
+class ForwardingConsumer:
+    """
+    pyopenms consumer that passes every spectrum and chromatogram to another consumer 
+    (typically a ``PlainMSDataWritingConsumer``), optionally transforming spectra.
+
+    Subclasses override `process_spectrum` to modify a spectrum before it is forwarded, 
+    and `flush` to forward what they still hold once the input is exhausted.
+    """
+
+    def __init__(self, consumer):
+        self.consumer = consumer
+
+    def setExpectedSize(self, n_spectra, n_chromatograms):
+        self.consumer.setExpectedSize(n_spectra, n_chromatograms)
+
+    def setExperimentalSettings(self, settings):
+        self.consumer.setExperimentalSettings(settings)
+
+    def consumeSpectrum(self, spectrum):
+        self.consumer.consumeSpectrum(self.process_spectrum(spectrum))
+
+    def consumeChromatogram(self, chromatogram):
+        self.consumer.consumeChromatogram(chromatogram)
+
+    def process_spectrum(self, spectrum):
+        return spectrum
+
+    def flush(self):
+        pass
+
+class BackgroundSpectrumWriter:
+    """
+    Writes spectra to an mzML file from a background thread.
+
+    Exposes the pyopenms consumer interface, so it can be passed anywhere a 
+    ``PlainMSDataWritingConsumer`` is expected. Calls are put in a bounded queue 
+    and executed in order by a writer thread, which encodes and compresses the 
+    spectra while the caller keeps producing them. When the queue is full, 
+    the producer blocks until the writer catches up (backpressure).
+
+    Spectra without a native ID are given ``spectrum=<index>``, as 
+    ``MzMLFile().store`` does, so the output is identical to storing the same 
+    spectra as an MSExperiment.
+
+    Args:
+        save_as (str): Path of the mzML file to write.
+        max_queue_size (int, optional): Maximum number of pending calls. Defaults to 64.
+        copy_spectra (bool, optional): Copy each spectrum before queueing it. Only 
+            disable it when the spectra are not modified after being passed (e.g. 
+            spectra of an MSExperiment that is not changed until the writer is 
+            closed). Defaults to True.
+        encoding (dict, optional): Binary encoding of the file (see 
+            `peak_file_options`). Defaults to the OpenMS encoding.
+
+    Raises:
+        RuntimeError: From any call after the writer thread failed, and from `close`.
+    """
+
+    def __init__(self, save_as, max_queue_size=64, copy_spectra=True, encoding=None):
+        self.save_as = save_as
+        self.copy_spectra = copy_spectra
+        self._consumer = oms.PlainMSDataWritingConsumer(save_as)
+        if encoding:
+            self._consumer.setOptions(peak_file_options(encoding))
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._error = None
+        self._n_spectra = 0
+        self._thread = threading.Thread(target=self._run, name="mzml-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def setExpectedSize(self, n_spectra, n_chromatograms):
+        self._submit("setExpectedSize", n_spectra, n_chromatograms)
+
+    def setExperimentalSettings(self, settings):
+        self._submit("setExperimentalSettings", type(settings)(settings))
+
+    def consumeSpectrum(self, spectrum):
+        # Copied, the caller may reuse or modify its spectrum once this returns
+        if self.copy_spectra:
+            spectrum = oms.MSSpectrum(spectrum)
+        if not spectrum.getNativeID():
+            spectrum.setNativeID(f"spectrum={self._n_spectra}")
+        self._n_spectra += 1
+        self._submit("consumeSpectrum", spectrum)
+
+    def consumeChromatogram(self, chromatogram):
+        self._submit("consumeChromatogram", oms.MSChromatogram(chromatogram))
+
+    def close(self):
+        """
+        Waits for all pending spectra to be written and finalizes the mzML file.
+
+        Raises:
+            RuntimeError: If writing any of the spectra failed.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        # The output is only completed when the writing consumer is destroyed
+        self._consumer = None
+        
+        if self._error is not None:
+            raise RuntimeError(f"Error while writing {self.save_as}") from self._error
+
+    def _submit(self, method, *args):
+        if self._error is not None:
+            raise RuntimeError(f"Error while writing {self.save_as}") from self._error
+        self._queue.put((method, args))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue # keep draining so the producer never blocks
+            method, args = item
+            try:
+                getattr(self._consumer, method)(*args)
+            except Exception as e:
+                self._error = e
+
+def load_peak_table(file_path, msconvert=False, filters=None, native_ids=False):
+    """
+    Streams a mass spectrometry file and collects its peaks into a PeakTable.
+
+    Unlike `load_file`, no MSExperiment is built: spectra are decoded one at a time 
+    and only their m/z, intensity and retention time are kept.
+
+    Args:
+        file_path (str): Path to the mzML or mzXML file.
+        msconvert (bool, optional): Convert mzXML files with msconvert (see 
+            `get_input_path`). Defaults to False.
+        filters (dict, optional): Load filters (see `load_options`). Only the 
+            spectra and peaks inside them are decoded and kept.
+        native_ids (bool, optional): Also return the native ID of each scan of 
+            the table, to find its spectrum in the file when some spectra were 
+            filtered out. Defaults to False.
+
+    Returns:
+        PeakTable: The peaks of every (selected) spectrum, in file order.
+        list of str: The native IDs of the scans, only with `native_ids`.
+    """
+    consumer = PeakTableConsumer(keep_native_ids=native_ids)
+    input_path = get_input_path(file_path, msconvert)
+    _filtered_handler(input_path, filters).transform(input_path, consumer)
+    scan_ids = consumer.native_ids
+    peak_table = consumer.to_peak_table()
     
-def convert_mzxml_2_mzml(file_path):
+    return (peak_table, scan_ids) if native_ids else peak_table
+
+def stream_file(file_path, save_as, consumer_factory=ForwardingConsumer, msconvert=False, encoding=None):
+    """
+    Streams a mass spectrometry file into an mzML file, one spectrum at a time.
+
+    Spectra are written by a `BackgroundSpectrumWriter`, so reading and 
+    processing the next spectra overlaps with writing the previous ones.
+
+    Args:
+        file_path (str): Path to the input mzML or mzXML file.
+        save_as (str): Path of the mzML file to write.
+        consumer_factory (callable, optional): Called with the writing consumer, returns 
+            the consumer that receives the spectra read from `file_path`. Defaults to 
+            `ForwardingConsumer`, which copies the file unchanged.
+        msconvert (bool, optional): Convert mzXML files with msconvert (see 
+            `get_input_path`). Defaults to False.
+        encoding (dict, optional): Binary encoding of the written file (see 
+            `peak_file_options`).
+
+    Returns:
+        None
+    """
+    input_path = get_input_path(file_path, msconvert)
+    with BackgroundSpectrumWriter(save_as, encoding=encoding) as writer:
+        consumer = consumer_factory(writer)
+        get_file_handler(input_path).transform(input_path, consumer)
+        consumer.flush()
+
+def store_spectra(save_as, spectra, n_spectra=0, copy=True, encoding=None, settings=None, chromatograms=()):
+    """
+    Writes spectra to an mzML file as they are produced.
+
+    Unlike ``MzMLFile().store``, the spectra do not need to be collected in an 
+    MSExperiment first: each one is handed to a `BackgroundSpectrumWriter` as 
+    soon as it is available. With the experimental settings and chromatograms 
+    of an MSExperiment, the output is identical to storing the same spectra 
+    in that MSExperiment.
+
+    Args:
+        save_as (str): Path of the mzML file to write.
+        spectra (iterable of MSSpectrum): Spectra to write, in order.
+        n_spectra (int, optional): Number of spectra, written in the mzML header.
+        copy (bool, optional): Copy each spectrum before it is queued (see 
+            `BackgroundSpectrumWriter`). Defaults to True.
+        encoding (dict, optional): Binary encoding of the file (see 
+            `peak_file_options`).
+        settings (ExperimentalSettings, optional): Experimental settings of the 
+            file (instrument, source files, samples...), e.g. 
+            ``input_map.getExperimentalSettings()``. None are written by default.
+        chromatograms (list of MSChromatogram, optional): Chromatograms written 
+            after the spectra, e.g. ``input_map.getChromatograms()``.
+
+    Returns:
+        None
+    """
+    with BackgroundSpectrumWriter(save_as, copy_spectra=copy, encoding=encoding) as writer:
+        writer.setExpectedSize(n_spectra, len(chromatograms))
+        if settings is not None:
+            writer.setExperimentalSettings(settings)
+        for spectrum in spectra:
+            writer.consumeSpectrum(spectrum)
+        for chromatogram in chromatograms:
+            writer.consumeChromatogram(chromatogram)
+    
+def convert_mzxml_2_mzml(file_path, output_folder=None):
     """
     Converts a .mzXML file to .mzML format using ProteoWizard's msconvert tool.
 
@@ -89,6 +628,9 @@ def convert_mzxml_2_mzml(file_path):
     file_path : str
         Path to the input .mzXML file.
 
+    output_folder : str, optional
+        Folder of the converted file. Defaults to the folder of the input file.
+
     Returns
     -------
     str
@@ -99,9 +641,10 @@ def convert_mzxml_2_mzml(file_path):
     RuntimeError
         If msconvert fails or the expected output file is not generated.
     """
-    output_folder = os.path.dirname(file_path)
+    if output_folder is None:
+        output_folder = os.path.dirname(file_path)
     mzml_file_path = os.path.join(
-        output_folder, os.path.basename(file_path).replace(".mzXML", ".mzML")
+        output_folder, os.path.splitext(os.path.basename(file_path))[0] + ".mzML"
     )
 
     try:
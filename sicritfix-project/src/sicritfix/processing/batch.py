@@ -0,0 +1,294 @@
+# processing/batch.py
+#!/usr/bin/env python
+
+"""
+This Python module runs the SICRITfix correction pipeline over many MS data files
+with a pool of long-lived worker processes.
+
+@contents  :  Batch processing of directories or glob patterns of MS runs.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  batch.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - multiprocessing
+    - sicritfix.processing.processor
+
+@functions :
+    - find_input_files
+    - process_batch
+    - format_batch_summary
+
+@notes :
+    Workers are started once and process many files, so the interpreter and
+    pyopenms start-up cost is paid once per worker instead of once per file.
+    A file that fails only affects its own result; a file that exceeds the
+    timeout (or crashes its worker) gets its worker replaced.
+
+    Each output is written under a temporary name (see `_partial_path`) and
+    renamed once complete, so a failed, killed or timed out file never
+    leaves a truncated output behind.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import glob
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import deque, namedtuple
+
+from sicritfix.processing.processor import process_file
+
+MS_FILE_EXTENSIONS = (".mzml", ".mzxml")
+
+# Outcome of one file of a batch. status is one of "corrected" (oscillations
+# detected and corrected), "unchanged" (no oscillations, original data saved),
+# "skipped", "conflict" (another input has the same output file), "failed" or
+# "timeout".
+BatchResult = namedtuple("BatchResult", ["input_path", "output_path", "status", "elapsed", "error"])
+
+
+def find_input_files(pattern):
+    """
+    Lists the MS data files of a directory or matching a glob pattern.
+
+    Parameters
+    ----------
+    pattern : str
+        Directory (all its .mzML/.mzXML files are used) or glob pattern.
+
+    Returns
+    -------
+    input_paths : list of str
+        Sorted paths of the .mzML/.mzXML files found.
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern)
+
+    input_paths = [
+        path for path in paths
+        if os.path.isfile(path) and os.path.splitext(path)[1].lower() in MS_FILE_EXTENSIONS
+    ]
+
+    return sorted(input_paths)
+
+def _output_path(input_path, outdir):
+    base = os.path.splitext(os.path.basename(input_path))[0]
+
+    return os.path.join(outdir, base + "_corrected.mzML")
+
+def _partial_path(output_path):
+    """Temporary name of an output while it is written (it keeps the .mzML extension OpenMS requires)."""
+    directory, name = os.path.split(output_path)
+
+    return os.path.join(directory, "." + os.path.splitext(name)[0] + ".partial.mzML")
+
+def _remove_partial(output_path):
+    """Deletes the temporary output of an unfinished file, if any."""
+    try:
+        os.remove(_partial_path(output_path))
+    except FileNotFoundError:
+        pass
+
+def _worker(task_queue, result_queue, options, quiet):
+    """Worker process loop: processes files until it receives None."""
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+        index, input_path, output_path = task
+
+        start_time = time.time()
+        try:
+            file_corrected = process_file(input_path, _partial_path(output_path), **options)
+            os.replace(_partial_path(output_path), output_path)
+            status = "corrected" if file_corrected else "unchanged"
+            error = None
+        except Exception as e:
+            _remove_partial(output_path)
+            status = "failed"
+            error = f"{type(e).__name__}: {e}"
+        result_queue.put((index, status, time.time() - start_time, error))
+
+class _WorkerSlot:
+    """A worker process with its own task queue and the task it is running."""
+
+    def __init__(self, context, result_queue, options, quiet):
+        self.task_queue = context.Queue()
+        self.process = context.Process(
+            target=_worker, args=(self.task_queue, result_queue, options, quiet), daemon=True
+        )
+        self.process.start()
+        self.task = None
+        self.start_time = None
+
+    def submit(self, task):
+        self.task = task
+        self.start_time = time.time()
+        self.task_queue.put(task)
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.terminate()
+        else:
+            self.task_queue.put(None)
+        self.process.join()
+
+def process_batch(input_paths, outdir, jobs=1, timeout=None, overwrite=False, quiet=True, **options):
+    """
+    Corrects many MS data files in parallel with a pool of worker processes.
+
+    Parameters
+    ----------
+    input_paths : list of str
+        Paths of the .mzML/.mzXML files to correct (see `find_input_files`).
+
+    outdir : str
+        Directory where ``<name>_corrected.mzML`` is written for each input. 
+        Inputs with the same name (e.g. ``run.mzML`` and ``run.mzXML``, or 
+        files of different directories) would write the same output: none of 
+        them is processed and they are reported as "conflict".
+
+    jobs : int, optional (default=1)
+        Number of worker processes.
+
+    timeout : float, optional
+        Maximum time (in seconds) allowed per file. The worker processing a file
+        that exceeds it is killed and replaced. No limit by default.
+
+    overwrite : bool, optional (default=False)
+        Overwrite existing output files. Otherwise those inputs are skipped.
+
+    quiet : bool, optional (default=True)
+        Silence the console output of the workers.
+
+    **options
+        Keyword arguments passed to `process_file` for every file.
+
+    Returns
+    -------
+    results : list of BatchResult
+        One result per input file, in the order of `input_paths`.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    results = [None] * len(input_paths)
+    pending = deque()
+
+    # Inputs of each output file, to find those that would overwrite each other
+    inputs_by_output = {}
+    for index, input_path in enumerate(input_paths):
+        inputs_by_output.setdefault(os.path.normcase(_output_path(input_path, outdir)), []).append(index)
+
+    for index, input_path in enumerate(input_paths):
+        output_path = _output_path(input_path, outdir)
+        others = [input_paths[other] for other in inputs_by_output[os.path.normcase(output_path)] if other != index]
+        if others:
+            results[index] = BatchResult(input_path, output_path, "conflict", 0.0, "same output file as " + ", ".join(others))
+        elif os.path.exists(output_path) and not overwrite:
+            results[index] = BatchResult(input_path, output_path, "skipped", 0.0, "output file exists")
+        else:
+            pending.append((index, input_path, output_path))
+
+    if not pending:
+        return results
+
+    context = multiprocessing.get_context()
+    result_queue = context.Queue()
+    slots = [_WorkerSlot(context, result_queue, options, quiet) for _ in range(min(jobs, len(pending)))]
+
+    def finish(slot, status, elapsed, error):
+        index, input_path, output_path = slot.task
+        results[index] = BatchResult(input_path, output_path, status, elapsed, error)
+        if status in ("failed", "timeout"):
+            _remove_partial(output_path)
+        slot.task = None
+
+    try:
+        while pending or any(slot.task is not None for slot in slots):
+            for slot in slots:
+                if slot.task is None and pending:
+                    slot.submit(pending.popleft())
+
+            try:
+                index, status, elapsed, error = result_queue.get(timeout=0.1)
+                for slot in slots:
+                    if slot.task is not None and slot.task[0] == index:
+                        finish(slot, status, elapsed, error)
+            except queue.Empty:
+                pass
+
+            # Replace the workers that exceeded the timeout or died
+            now = time.time()
+            for i, slot in enumerate(slots):
+                if slot.task is None:
+                    continue
+                elapsed = now - slot.start_time
+                if timeout is not None and elapsed > timeout:
+                    slot.stop(kill=True)
+                    finish(slot, "timeout", elapsed, f"exceeded {timeout} s")
+                elif not slot.process.is_alive():
+                    finish(slot, "failed", elapsed, f"worker exited with code {slot.process.exitcode}")
+                else:
+                    continue
+                slots[i] = _WorkerSlot(context, result_queue, options, quiet)
+    finally:
+        for slot in slots:
+            slot.stop(kill=slot.task is not None or not slot.process.is_alive())
+            if slot.task is not None:
+                _remove_partial(slot.task[2])
+
+    return results
+
+def format_batch_summary(results):
+    """
+    Formats the results of `process_batch` as a text table.
+
+    Parameters
+    ----------
+    results : list of BatchResult
+        Results of a batch.
+
+    Returns
+    -------
+    summary : str
+        One row per file with its outcome and processing time, and a final
+        line with the count of each outcome and the total time.
+    """
+    names = [os.path.basename(result.input_path) for result in results]
+    width = max([len("File")] + [len(name) for name in names])
+
+    lines = [f"{'File':<{width}}  {'Outcome':<10}  {'Time (s)':>9}  Details"]
+    for name, result in zip(names, results):
+        details = result.error or ""
+        lines.append(f"{name:<{width}}  {result.status:<10}  {result.elapsed:>9.2f}  {details}")
+
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    totals = ", ".join(f"{count} {status}" for status, count in counts.items())
+    total_time = sum(result.elapsed for result in results)
+    lines.append(f"{len(results)} files: {totals}. Total processing time: {total_time:.2f} s")
+
+    return "\n".join(lines)
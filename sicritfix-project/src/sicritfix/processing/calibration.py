@@ -0,0 +1,202 @@
+# processing/calibration.py
+#!/usr/bin/env python
+
+"""
+This Python module saves the oscillation fitted on one run as a calibration
+and reuses it for the next runs of the same source and method.
+
+@contents  :  Phase-calibration profiles persisted across runs.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  calibration.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - numpy
+    - sicritfix.processing.corrector
+    - sicritfix.utils.frequency_analyzer
+    - sicritfix.utils.intensity_analyzer
+
+@classes :
+    - PhaseCalibration
+
+@functions :
+    - calibrated_reference
+
+@notes :
+    A calibration is a small JSON file with the polynomial frequency profile
+    of the reference oscillation (see `fit_frequency_polynomial`), the
+    reference m/z it was measured on and the amplitude of each corrected m/z
+    (amplitude priors). For a new run, the phase is integrated from the
+    polynomial and only its offset is fitted on the reference XIC, by least
+    squares (see `fit_oscillations`), which replaces the windowed FFTs and the
+    polynomial regression of `obtain_freq_from_signal`. The fraction of the
+    variance of the reference XIC explained by the calibrated oscillation
+    tells whether the calibration still holds.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import json
+
+import numpy as np
+
+from sicritfix.processing.corrector import fit_oscillations
+from sicritfix.utils.frequency_analyzer import (
+    fit_frequency_polynomial, local_window_times, phase_from_frequency_polynomial
+)
+from sicritfix.utils.intensity_analyzer import build_xic
+from sicritfix.utils.peak_table import as_peak_table
+
+# Version of the calibration file format
+# (2: frequency coefficients against the time elapsed since the first scan)
+CALIBRATION_VERSION = 2
+
+
+class PhaseCalibration:
+    """
+    Frequency profile of the reference oscillation and amplitude priors of a method.
+
+    Parameters
+    ----------
+    freq_coefficients : array-like
+        Coefficients of the polynomial frequency profile (see `fit_frequency_polynomial`).
+
+    reference_mzs : array-like of float
+        Reference m/z values the profile was measured on, best first.
+
+    amplitude_priors : dict, optional
+        Oscillation amplitude of each corrected m/z of the calibration run.
+
+    window_size : int, optional (default=70)
+        Window (in scans) of the local frequencies derived from the profile.
+    """
+
+    def __init__(self, freq_coefficients, reference_mzs, amplitude_priors=None, window_size=70):
+        self.freq_coefficients = np.asarray(freq_coefficients, dtype=float)
+        self.reference_mzs = np.asarray(reference_mzs, dtype=float)
+        self.amplitude_priors = {round(float(mz), 3): float(amplitude) for mz, amplitude in (amplitude_priors or {}).items()}
+        self.window_size = window_size
+
+    @classmethod
+    def from_reference(cls, rts, local_freqs_ref, reference_mzs, amplitude_priors=None, window_size=70):
+        """
+        Builds a calibration from the local frequencies estimated on a run
+        (see `obtain_freq_from_signal`).
+        """
+        rt_freqs = local_window_times(rts, window_size)
+        coefficients = fit_frequency_polynomial(rts, rt_freqs, local_freqs_ref)
+
+        return cls(coefficients, reference_mzs, amplitude_priors, window_size)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a calibration file.
+
+        Raises
+        ------
+        ValueError
+            If the file was written by another version of the format.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != CALIBRATION_VERSION:
+            raise ValueError(f"Unsupported calibration version {data.get('version')} in {path}")
+
+        return cls(
+            data["freq_coefficients"], data["reference_mzs"],
+            {float(mz): amplitude for mz, amplitude in data["amplitude_priors"].items()}, data["window_size"]
+        )
+
+    def save(self, path):
+        """Writes the calibration to `path` as JSON."""
+        data = {
+            "version": CALIBRATION_VERSION,
+            "freq_coefficients": self.freq_coefficients.tolist(),
+            "reference_mzs": self.reference_mzs.tolist(),
+            "window_size": self.window_size,
+            "amplitude_priors": {f"{mz:.3f}": amplitude for mz, amplitude in sorted(self.amplitude_priors.items())},
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def phase(self, rts):
+        """Phase (in radians, from 0 at the first scan) of the profile along `rts`."""
+        return phase_from_frequency_polynomial(rts, self.freq_coefficients)
+
+    def local_freqs(self, rts):
+        """Frequency (in Hz) of the profile at the windows of `local_frequencies_with_fft`."""
+        rts = np.asarray(rts, dtype=float)
+
+        return np.poly1d(self.freq_coefficients)(local_window_times(rts, self.window_size) - rts[0])
+
+    def amplitude_prior(self, mz):
+        """Amplitude prior of an m/z (rounded to 3 decimals), or NaN if unknown."""
+        return self.amplitude_priors.get(round(float(mz), 3), np.nan)
+
+def calibrated_reference(rt_array, calibration, mz_array=None, intensity_array=None, min_fit=0.3):
+    """
+    Computes the reference phase of a run from a calibration, fitting only its offset.
+
+    Parameters
+    ----------
+    rt_array : np.ndarray or PeakTable
+        Retention time values for each scan, or the peak table of the run.
+
+    calibration : PhaseCalibration
+        Calibration of the method.
+
+    mz_array, intensity_array : list of np.ndarray, optional
+        m/z and intensity arrays of each scan. Not needed with a PeakTable.
+
+    min_fit : float, optional (default=0.3)
+        Minimum fraction of the variance of the reference XIC that the
+        calibrated oscillation must explain.
+
+    Returns
+    -------
+    local_freqs_ref : np.ndarray
+        Local frequencies (in Hz) of the calibrated profile.
+
+    phase_ref : np.ndarray
+        Calibrated phase (in radians), shifted by the fitted offset.
+
+    fit : float
+        Fraction of the variance of the reference XIC explained.
+
+    Raises
+    ------
+    ValueError
+        If the run has no signal at the reference m/z, or the fit is below `min_fit`.
+    """
+    peak_table = as_peak_table(mz_array, intensity_array, rt_array)
+    rts = peak_table.rt
+    if len(rts) <= calibration.window_size:
+        raise ValueError(f"At least {calibration.window_size + 1} scans are needed to apply the calibration")
+
+    xic = build_xic(peak_table, target_mz=calibration.reference_mzs[0])
+    variance = np.var(xic)
+    if not variance > 0:
+        raise ValueError(f"No signal at the reference m/z {calibration.reference_mzs[0]}")
+
+    phase = calibration.phase(rts)
+    _, phase_offsets, modulated = fit_oscillations(xic, phase)
+    fit = 1 - np.var(xic - modulated[0]) / variance
+    if fit < min_fit:
+        raise ValueError(f"Calibration explains {fit:.0%} of the reference signal (minimum {min_fit:.0%})")
+
+    return calibration.local_freqs(rts), phase + phase_offsets[0], float(fit)
@@ -21,10 +21,16 @@ by modeling sinusoidal artifacts and subtracting them from the original signal.
 @dependencies :
     - numpy
     - sicritfix.utils.intensity_analyzer
+    - sicritfix.utils.peak_table
 
 @functions :
     - generate_modulated_signal
+    - lockin_basis
+    - fit_oscillations
     - correct_oscillations
+    - build_residual_lookup
+    - correct_peaks
+    - scans_with_targets
 
 @notes :
     The core logic assumes the oscillatory component is a single-frequency sinusoid
@@ -42,6 +48,7 @@ __copyright__ = "GPL License version 3"
 
 import numpy as np
 from sicritfix.utils.intensity_analyzer import build_xic, get_amplitude
+from sicritfix.utils.peak_table import as_peak_table
 
 
 def generate_modulated_signal(amplitude, phase):
@@ -68,7 +75,74 @@ def generate_modulated_signal(amplitude, phase):
     
     return modulated_signal
     
-def correct_oscillations(rt_array, mz_array, intensity_array, phase_ref, local_freqs_ref, target_mz, window_size=70):
+def lockin_basis(phase_ref):
+    """
+    Builds the least-squares basis of the reference oscillation.
+
+    Parameters
+    ----------
+    phase_ref : np.ndarray
+        Reference phase (in radians) at each scan.
+
+    Returns
+    -------
+    basis : np.ndarray
+        Array of shape (3, n_scans) with the rows sin(phase_ref), cos(phase_ref) 
+        and a constant baseline.
+
+    basis_pinv : np.ndarray
+        Pseudo-inverse of `basis`, of shape (n_scans, 3).
+    """
+    phase_ref = np.asarray(phase_ref, dtype=float)
+    basis = np.vstack([np.sin(phase_ref), np.cos(phase_ref), np.ones_like(phase_ref)])
+    basis_pinv = np.linalg.pinv(basis)
+    
+    return basis, basis_pinv
+
+def fit_oscillations(xics, phase_ref, basis=None):
+    """
+    Fits the reference oscillation to every XIC of a stack by least squares.
+
+    Each XIC is modeled as ``a * sin(phase_ref) + b * cos(phase_ref) + c``, i.e. 
+    a sinusoid locked to the reference phase with its own amplitude and phase 
+    offset, plus a baseline. The coefficients of all XICs come from one matrix 
+    product with the pseudo-inverse of the basis, and the modulated signals 
+    from a second one.
+
+    Parameters
+    ----------
+    xics : np.ndarray
+        2D array of shape (n_xics, n_scans), one XIC per row.
+
+    phase_ref : np.ndarray
+        Reference phase (in radians) at each scan.
+
+    basis : tuple of np.ndarray, optional
+        Precomputed output of `lockin_basis`.
+
+    Returns
+    -------
+    amplitudes : np.ndarray
+        Amplitude of the fitted oscillation of each XIC.
+
+    phase_offsets : np.ndarray
+        Phase offset (in radians) of each fitted oscillation with respect to `phase_ref`.
+
+    modulated_signals : np.ndarray
+        Fitted oscillations, ``amplitude * sin(phase_ref + phase_offset)``, of 
+        shape (n_xics, n_scans). The baseline is not included.
+    """
+    xics = np.atleast_2d(np.asarray(xics, dtype=float))
+    basis, basis_pinv = basis if basis is not None else lockin_basis(phase_ref)
+    
+    coefficients = xics @ basis_pinv
+    modulated_signals = coefficients[:, :2] @ basis[:2]
+    amplitudes = np.hypot(coefficients[:, 0], coefficients[:, 1])
+    phase_offsets = np.arctan2(coefficients[:, 1], coefficients[:, 0])
+    
+    return amplitudes, phase_offsets, modulated_signals
+
+def correct_oscillations(rt_array, mz_array=None, intensity_array=None, phase_ref=None, local_freqs_ref=None, target_mz=None, window_size=70, xic=None, amplitude=None):
     """
     Corrects oscillations in an extracted ion chromatogram (XIC) by subtracting a
     modulated sinusoidal signal based on local frequency and amplitude estimates.
@@ -79,14 +153,16 @@ def correct_oscillations(rt_array, mz_array, intensity_array, phase_ref, local_f
     
        Parameters
        ----------
-       rt_array : np.ndarray
-           Retention time values corresponding to each scan.
+       rt_array : np.ndarray or PeakTable
+           Retention time values corresponding to each scan, or the peak 
+           table of the run.
     
-       mz_array : np.ndarray
-           Array of m/z values for all scans.
+       mz_array : np.ndarray, optional
+           Array of m/z values for all scans. Not needed with a PeakTable.
     
-       intensity_array : np.ndarray
-           Array of intensity values corresponding to each m/z and retention time.
+       intensity_array : np.ndarray, optional
+           Array of intensity values corresponding to each m/z and retention 
+           time. Not needed with a PeakTable.
     
        phase_ref : np.ndarray
            Reference phase array (in radians) for the sinusoidal oscillation.
@@ -101,6 +177,14 @@ def correct_oscillations(rt_array, mz_array, intensity_array, phase_ref, local_f
            The size of the window (in scans) used for extracting the XIC 
            around the target m/z.
     
+       xic : np.ndarray, optional
+           Precomputed XIC of `target_mz` (e.g. a row of `build_xics`). When 
+           given, the XIC is not extracted again.
+    
+       amplitude : float, optional
+           Precomputed oscillation amplitude of `target_mz` (e.g. an element of 
+           `get_amplitudes`). When given, it is not estimated again.
+    
        Returns
        -------
        xic : np.ndarray
@@ -113,8 +197,12 @@ def correct_oscillations(rt_array, mz_array, intensity_array, phase_ref, local_f
            The corrected signal obtained by subtracting the modulated signal 
            from the original XIC.
    """
+    peak_table = as_peak_table(mz_array, intensity_array, rt_array)
+    rt_array = peak_table.rt
+    
     #1. Extract XIC from original signal (intensities for each RT at target_mz)
-    xic=build_xic(mz_array, intensity_array, rt_array, target_mz)
+    if xic is None:
+        xic=build_xic(peak_table, target_mz=target_mz)
     
 
     #2. Frequency with polynomial regression
@@ -122,7 +210,8 @@ def correct_oscillations(rt_array, mz_array, intensity_array, phase_ref, local_f
     
     
     # 3. Amplitude at each m/z
-    amplitude=get_amplitude(target_mz, xic, rt_array, local_freqs_ref, sampling_interval)
+    if amplitude is None:
+        amplitude=get_amplitude(target_mz, xic, rt_array, local_freqs_ref, sampling_interval)
     
     
     # 4. Creation of the modulated signal
@@ -134,4 +223,135 @@ def correct_oscillations(rt_array, mz_array, intensity_array, phase_ref, local_f
     
     return xic, modulated_signal, residual_signal
     
-    
\ No newline at end of file
+    
+
+def build_residual_lookup(oscillating_mzs, residual_signals):
+    """
+    Stacks the residual signals into a matrix indexed by sorted target m/z.
+
+    Parameters
+    ----------
+    oscillating_mzs : list of float
+        m/z values identified as oscillatory.
+
+    residual_signals : dict
+        Dictionary mapping each oscillating m/z value (rounded to 3 decimals) 
+        to its corrected intensity values, indexed by scan.
+
+    Returns
+    -------
+    target_mzs : np.ndarray
+        Sorted, unique oscillating m/z values (rounded to 3 decimals).
+
+    residual_matrix : np.ndarray
+        2D array of shape (n_targets, n_scans); row ``k`` is the residual 
+        signal of ``target_mzs[k]``.
+    """
+    target_mzs = np.unique([round(float(mz), 3) for mz in oscillating_mzs])
+    if len(target_mzs) == 0:
+        return target_mzs, np.empty((0, 0))
+    
+    residual_matrix = np.vstack([residual_signals[mz] for mz in target_mzs])
+    
+    return target_mzs, residual_matrix
+
+def _match_targets(mzs, target_mzs, mz_bin_size):
+    """
+    Index of the target of each peak (the largest one within `mz_bin_size`) 
+    and mask of the peaks with a target. `target_mzs` must not be empty.
+    """
+    # Largest target not above the upper edge of each peak's tolerance window
+    target_idx = np.searchsorted(target_mzs, mzs + mz_bin_size, side="right") - 1
+    has_target = target_idx >= 0
+    target_idx = np.maximum(target_idx, 0)
+    is_match = has_target & (np.abs(mzs - target_mzs[target_idx]) <= mz_bin_size)
+    
+    return target_idx, is_match
+
+def correct_peaks(mzs, intensities, scan_index, target_mzs, residual_matrix, mz_bin_size=0.001):
+    """
+    Replaces the intensities of the peaks matching an oscillating m/z in one spectrum.
+
+    Every peak is looked up in the sorted targets with one ``np.searchsorted`` 
+    call, and all matching peaks are assigned their residual value at once. 
+    When several targets lie within `mz_bin_size` of a peak, the largest one 
+    is used, as the last one of the ascending target list would be. Peaks 
+    whose residual value is NaN (a target not corrected in this scan) are 
+    left unchanged.
+
+    Parameters
+    ----------
+    mzs : np.ndarray
+        m/z values of the spectrum.
+
+    intensities : np.ndarray
+        Intensities of the spectrum (not modified).
+
+    scan_index : int
+        Position of the spectrum in the run (column of `residual_matrix`).
+
+    target_mzs : np.ndarray
+        Sorted oscillating m/z values, as returned by `build_residual_lookup`.
+
+    residual_matrix : np.ndarray
+        Residual signals, as returned by `build_residual_lookup`.
+
+    mz_bin_size : float, optional (default=0.001)
+        Peaks with ``|m/z - target_mz| <= mz_bin_size`` are replaced.
+
+    Returns
+    -------
+    corrected_intensities : np.ndarray
+        Copy of `intensities` with the matching peaks replaced.
+
+    matched : np.ndarray
+        Indices of the peaks that were replaced.
+    """
+    mzs = np.asarray(mzs, dtype=np.float64)
+    corrected_intensities = np.array(intensities)
+    if len(target_mzs) == 0 or len(mzs) == 0:
+        return corrected_intensities, np.empty(0, dtype=np.int64)
+    
+    target_idx, is_match = _match_targets(mzs, target_mzs, mz_bin_size)
+    matched = np.flatnonzero(is_match)
+    residuals = residual_matrix[target_idx[matched], scan_index]
+    is_finite = np.isfinite(residuals)
+    if not is_finite.all():
+        matched, residuals = matched[is_finite], residuals[is_finite]
+    corrected_intensities[matched] = residuals
+    
+    return corrected_intensities, matched
+
+def scans_with_targets(peak_table, target_mzs, mz_bin_size=0.001):
+    """
+    Finds the scans with at least one peak matching an oscillating m/z.
+
+    All the peaks of the run are looked up at once, with the matching rule 
+    of `correct_peaks`, so the spectra that would not change can be skipped 
+    without reading their peaks.
+
+    Parameters
+    ----------
+    peak_table : PeakTable
+        Peaks of the run.
+
+    target_mzs : np.ndarray
+        Sorted oscillating m/z values, as returned by `build_residual_lookup`.
+
+    mz_bin_size : float, optional (default=0.001)
+        Peaks with ``|m/z - target_mz| <= mz_bin_size`` match.
+
+    Returns
+    -------
+    is_matched : np.ndarray
+        Boolean mask of the scans with a matching peak.
+    """
+    is_matched = np.zeros(peak_table.n_scans, dtype=bool)
+    if len(target_mzs) == 0 or peak_table.n_peaks == 0:
+        return is_matched
+    
+    _, is_match = _match_targets(peak_table.mz, target_mzs, mz_bin_size)
+    matched_peaks = np.flatnonzero(is_match)
+    is_matched[np.searchsorted(peak_table.offsets, matched_peaks, side="right") - 1] = True
+    
+    return is_matched
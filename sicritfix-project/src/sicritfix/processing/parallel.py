@@ -0,0 +1,248 @@
+# processing/parallel.py
+#!/usr/bin/env python
+
+"""
+This Python module provides the execution backends used to spread the work of
+one file (candidate screening and target correction) across processes.
+
+@contents  :  Serial and shared-memory multi-process executors over a PeakTable.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  parallel.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - numpy
+    - multiprocessing.shared_memory
+    - sicritfix.utils.peak_table
+
+@classes :
+    - SerialExecutor
+    - ParallelExecutor
+
+@functions :
+    - get_executor
+    - split_evenly
+
+@notes :
+    Both executors expose ``map(func, chunks, *args)``, which returns
+    ``[func(peak_table, chunk, *args) for chunk in chunks]`` in order, so the
+    results never depend on the number of processes, and ``imap``, which
+    yields the same results one at a time (e.g. to report progress). The parallel executor
+    copies the PeakTable arrays once into shared memory; workers attach to
+    them by name, so the peak data is never pickled. Workers are spawned with
+    BLAS/OpenMP thread pools limited to one thread to avoid oversubscription.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import multiprocessing
+import os
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+from sicritfix.utils.peak_table import PeakTable
+
+# Environment variables limiting the thread pools of numerical libraries
+THREAD_LIMIT_VARIABLES = (
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS",
+)
+
+_PEAK_TABLE_ARRAYS = ("mz", "intensity", "offsets", "rt", "cumulative_intensity")
+
+# Per worker process: the attached shared memory blocks and the table viewing them
+_worker_blocks = []
+_worker_peak_table = None
+
+
+class SerialExecutor:
+    """
+    Runs the work in the current process. Used when a single job is requested.
+
+    Parameters
+    ----------
+    peak_table : PeakTable
+        Peak table the mapped functions work on.
+    """
+
+    jobs = 1
+
+    def __init__(self, peak_table):
+        self.peak_table = peak_table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def map(self, func, chunks, *args):
+        """
+        Returns ``[func(peak_table, chunk, *args) for chunk in chunks]``.
+        """
+        return list(self.imap(func, chunks, *args))
+
+    def imap(self, func, chunks, *args):
+        """
+        Yields ``func(peak_table, chunk, *args)`` for each chunk, in order, as it is computed.
+        """
+        for chunk in chunks:
+            yield func(self.peak_table, chunk, *args)
+
+class ParallelExecutor:
+    """
+    Runs the work in a pool of processes sharing the peak data.
+
+    Parameters
+    ----------
+    peak_table : PeakTable
+        Peak table the mapped functions work on. Its arrays are copied once to
+        shared memory when the executor is entered.
+
+    jobs : int
+        Number of worker processes.
+
+    Notes
+    -----
+    Must be used as a context manager, which releases the processes and the
+    shared memory on exit. Mapped functions must be defined at module level.
+    """
+
+    def __init__(self, peak_table, jobs):
+        self.peak_table = peak_table
+        self.jobs = jobs
+        self._blocks = []
+        self._pool = None
+
+    def __enter__(self):
+        layout = {}
+        try:
+            for name in _PEAK_TABLE_ARRAYS:
+                array = getattr(self.peak_table, name)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                layout[name] = (block.name, array.shape, array.dtype.str)
+
+            # Spawned workers import numpy with the thread limits already set
+            with _limited_threads():
+                context = multiprocessing.get_context("spawn")
+                self._pool = context.Pool(self.jobs, initializer=_attach_peak_table, initargs=(layout,))
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def map(self, func, chunks, *args):
+        """
+        Returns ``[func(peak_table, chunk, *args) for chunk in chunks]``, with the
+        chunks processed by the worker processes.
+        """
+        tasks = [(func, chunk, args) for chunk in chunks]
+
+        return self._pool.map(_run_task, tasks, chunksize=1)
+
+    def imap(self, func, chunks, *args):
+        """
+        Yields ``func(peak_table, chunk, *args)`` for each chunk, in order, as 
+        soon as the worker processes have computed it.
+        """
+        tasks = [(func, chunk, args) for chunk in chunks]
+
+        return self._pool.imap(_run_task, tasks, chunksize=1)
+
+def get_executor(peak_table, jobs=1):
+    """
+    Returns the executor for the requested number of jobs.
+
+    Parameters
+    ----------
+    peak_table : PeakTable
+        Peak table the mapped functions work on.
+
+    jobs : int, optional (default=1)
+        Number of processes. 1 (or less) runs everything in the current process.
+
+    Returns
+    -------
+    SerialExecutor or ParallelExecutor
+        To be used as a context manager.
+    """
+    if jobs is None or jobs <= 1:
+        return SerialExecutor(peak_table)
+
+    return ParallelExecutor(peak_table, jobs)
+
+def split_evenly(items, n_chunks):
+    """
+    Splits a sequence into at most `n_chunks` contiguous chunks of similar size.
+    """
+    n_chunks = max(1, min(n_chunks, len(items)))
+    bounds = np.linspace(0, len(items), n_chunks + 1).astype(int)
+
+    return [items[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+@contextmanager
+def _limited_threads():
+    """Sets the thread limit variables to 1 in os.environ while the block runs."""
+    saved = {name: os.environ.get(name) for name in THREAD_LIMIT_VARIABLES}
+    for name in THREAD_LIMIT_VARIABLES:
+        os.environ[name] = "1"
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def _attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the block, in the resource tracker shared
+        # with the parent, which unregisters it when unlinking
+        return shared_memory.SharedMemory(name=name)
+
+def _attach_peak_table(layout):
+    """Worker initializer: builds the PeakTable on top of the shared memory."""
+    global _worker_peak_table
+    arrays = {}
+    for name, (block_name, shape, dtype) in layout.items():
+        block = _attach_shared_memory(block_name)
+        _worker_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    _worker_peak_table = PeakTable.from_buffers(**arrays)
+
+def _run_task(task):
+    func, chunk, args = task
+
+    return func(_worker_peak_table, chunk, *args)
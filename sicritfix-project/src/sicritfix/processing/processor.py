@@ -21,15 +21,29 @@ oscillatory artifacts in mass spectrometry (MS) data using frequency-domain anal
     - pyopenms
     - numpy
     - sicritfix.processing.corrector
+    - sicritfix.processing.calibration
     - sicritfix.utils.frequency_analyzer
+    - sicritfix.utils.peak_table
+    - sicritfix.processing.parallel
+    - sicritfix.io.cache
+    - sicritfix.utils.profiler
+    - sicritfix.utils.progress
 
 @functions :
+    - candidates_per_chunk
     - detect_oscillating_mzs
+    - iter_corrected_spectra
     - correct_spectra
+    - correct_spectra_streaming
     - process_file
 
 @notes :
     This is the central orchestrator of the SICRITfix correction logic.
+    The scans of a run are split into streams of the same MS level and
+    polarity (see `PeakTable.streams`). Each MS1 stream gets its own
+    reference phase, detection and correction, and the streams run
+    concurrently when several jobs are requested. Spectra of the other
+    streams (e.g. MS2 scans) are written unchanged.
 
 @copyright :
     Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
@@ -41,37 +55,141 @@ __copyright__ = "GPL License version 3"
 
 
 
-import pyopenms as oms
+import threading
 import time
 import numpy as np
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 
-from sicritfix.processing.corrector import correct_oscillations
-from sicritfix.io.io import load_file
-from sicritfix.utils.frequency_analyzer import obtain_freq_from_signal
-from sicritfix.utils.intensity_analyzer import build_xic
+from sicritfix.processing.corrector import correct_oscillations, fit_oscillations, lockin_basis, build_residual_lookup, correct_peaks, scans_with_targets
+from sicritfix.processing.parallel import SerialExecutor, ParallelExecutor, split_evenly
+from sicritfix.processing.calibration import PhaseCalibration, calibrated_reference
+from sicritfix.io.io import load_file, load_peak_table, stream_file, store_spectra, store_file, peak_file_options, load_options, get_input_path, ForwardingConsumer
+from sicritfix.io.cache import RunCache
+from sicritfix.utils.frequency_analyzer import obtain_freq_from_signal, screen_oscillations, screen_oscillations_in_band, reference_band, select_reference
+from sicritfix.utils.intensity_analyzer import build_xics, get_amplitudes
+from sicritfix.utils.peak_table import PeakTable, as_peak_table
+from sicritfix.utils.profiler import RunProfiler, NullProfiler
+from sicritfix.utils.progress import ProgressReporter, NullProgress
 from sicritfix.validation.validator import plot_original_and_corrected
 
+# Memory (in MB) allowed for each chunk of candidate XICs and their spectra
+DEFAULT_MEMORY_BUDGET_MB = 256
 
-def detect_oscillating_mzs(rt_array, mz_array, intensity_array, mz_bin_size=0.01, min_occurrences=10, power_threshold=0.15):
+# Bytes per scan of one candidate: XIC, centered XIC, complex rFFT and power
+_BYTES_PER_XIC_SAMPLE = 32
+
+# Chunks of targets per process in the correction, so that its progress can be reported
+_CORRECTION_CHUNKS_PER_JOB = 4
+
+# Default size cap (in MB) of the on-disk cache
+DEFAULT_CACHE_SIZE_MB = 10240
+
+# Parameters of the reference signal used by obtain_freq_from_signal (cache key)
+REFERENCE_PARAMS = {"mz_ref": 922.098, "window_size": 70}
+
+# m/z bin width and minimum number of scans of a candidate of the detection
+DETECTION_MZ_BIN_SIZE = 0.01
+DETECTION_MIN_OCCURRENCES = 10
+
+
+def candidates_per_chunk(n_scans, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Computes how many candidate XICs can be screened together within a memory budget.
+
+    Parameters
+    ----------
+    n_scans : int
+        Number of scans (length of each XIC).
+
+    memory_budget_mb : float, optional (default=256)
+        Memory (in MB) allowed for the XIC stack and its FFT buffers.
+
+    Returns
+    -------
+    chunk_size : int
+        Number of candidates per chunk (at least 1).
+    """
+    bytes_per_candidate = _BYTES_PER_XIC_SAMPLE * max(n_scans, 1)
+    chunk_size = int(memory_budget_mb * 1024 ** 2 // bytes_per_candidate)
+    
+    return max(chunk_size, 1)
+
+
+def _screen_candidates(peak_table, candidate_mzs, power_threshold, freq_band=None, n_references=0):
+    """
+    Executor task: flags which candidates of a chunk are oscillating. With 
+    `n_references`, also returns the scores, m/z and XICs of its best references.
+    """
+    xics = build_xics(peak_table, target_mzs=candidate_mzs)
+    if n_references:
+        is_oscillating, scores = screen_oscillations(xics, power_threshold, return_scores=True)
+        best = _best_references(scores, candidate_mzs, n_references)
+        return is_oscillating, (scores[best], candidate_mzs[best], xics[best])
+    if freq_band is not None:
+        sampling_interval = np.mean(np.diff(peak_table.rt))
+        return screen_oscillations_in_band(xics, sampling_interval, freq_band, power_threshold)
+    
+    return screen_oscillations(xics, power_threshold)
+
+def _best_references(scores, mzs, n_references, mz_tol=0.1):
+    """
+    Indices of the best scored candidates, best first, skipping those whose 
+    XIC window (+/- `mz_tol`) overlaps that of a better one.
+    """
+    best = []
+    for i in np.argsort(-scores, kind="stable"):
+        if scores[i] <= 0 or len(best) == n_references:
+            break
+        if all(abs(mzs[i] - mzs[j]) >= 2 * mz_tol for j in best):
+            best.append(i)
+    
+    return np.array(best, dtype=int)
+
+def _correct_targets(peak_table, target_mzs, phase_ref, local_freqs_ref, amplitude_model="percentile", amplitude_priors=None, basis=None):
+    """
+    Executor task: XIC, modulated and residual signals of a chunk of targets. 
+    Amplitudes that can not be estimated are taken from `amplitude_priors`, if known.
+    With the "lockin" model, `basis` is the `lockin_basis` of `phase_ref`, 
+    built once for all the chunks.
+    """
+    xics = build_xics(peak_table, target_mzs=target_mzs)
+    if amplitude_model == "lockin":
+        _, _, modulated_signals = fit_oscillations(xics, phase_ref, basis=basis)
+        return list(zip(xics, modulated_signals, xics - modulated_signals))
+    
+    sampling_interval = np.mean(np.diff(peak_table.rt))
+    amplitudes = get_amplitudes(xics, local_freqs_ref, sampling_interval)
+    if amplitude_priors:
+        for k in np.flatnonzero(~np.isfinite(amplitudes)):
+            amplitudes[k] = amplitude_priors.get(round(float(target_mzs[k]), 3), amplitudes[k])
+    
+    return [
+        correct_oscillations(peak_table, phase_ref=phase_ref, local_freqs_ref=local_freqs_ref, target_mz=target_mz, xic=xic, amplitude=amplitude)
+        for target_mz, xic, amplitude in zip(target_mzs, xics, amplitudes)
+    ]
+
+def detect_oscillating_mzs(rt_array, mz_array=None, intensity_array=None, mz_bin_size=DETECTION_MZ_BIN_SIZE, min_occurrences=DETECTION_MIN_OCCURRENCES, power_threshold=0.15, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, executor=None, freq_band=None, progress=None, n_references=0):
     
     """
     Detects m/z values exhibiting oscillatory behavior based on their XICs using FFT analysis.
-    This function scans through all m/z values across spectra, bins them to reduce variability, 
-    and selects those that occur frequently enough. For each candidate m/z, it computes the extracted 
+    This function bins all m/z values across spectra to reduce variability (see 
+    `PeakTable.mz_histogram`), and selects the bins observed in enough scans. For each candidate m/z, it computes the extracted 
     ion chromatogram (XIC), applies FFT to identify periodic patterns, and flags m/z values as oscillating 
     if their normalized power spectrum exceeds a defined threshold.
     
     Parameters
     ----------
-    rt_array : list of float
-        Retention time values (in seconds) for each scan.
+    rt_array : list of float or PeakTable
+        Retention time values (in seconds) for each scan, or the peak table 
+        of the run.
     
-    mz_array : list of np.ndarray
-        List of m/z arrays for each spectrum.
+    mz_array : list of np.ndarray, optional
+        List of m/z arrays for each spectrum. Not needed with a PeakTable.
     
-    intensity_array : list of np.ndarray
-        List of intensity arrays corresponding to each m/z array per scan.
+    intensity_array : list of np.ndarray, optional
+        List of intensity arrays corresponding to each m/z array per scan. 
+        Not needed with a PeakTable.
     
     mz_bin_size : float, optional (default=0.01)
         Size of the bin used to group close m/z values for counting and detection.
@@ -82,9 +200,31 @@ def detect_oscillating_mzs(rt_array, mz_array, intensity_array, mz_bin_size=0.01
     power_threshold : float, optional (default=0.15)
         Threshold on the normalized FFT power (excluding DC component) above which a signal is considered to exhibit oscillatory behavior.
     
+    memory_budget_mb : float, optional (default=256)
+        Memory (in MB) allowed for each chunk of candidate XICs and their FFTs.
+        With a parallel executor, each worker may use this budget.
+    
+    executor : SerialExecutor or ParallelExecutor, optional
+        Executor screening the chunks (see `sicritfix.processing.parallel`). 
+        By default everything runs in the current process.
+    
+    freq_band : tuple of float, optional
+        Band (in Hz) of the reference oscillation (see `reference_band`). When 
+        given, only the power inside the band is compared with `power_threshold` 
+        (see `screen_oscillations_in_band`). By default the whole spectrum is used.
+    
+    progress : ProgressReporter, optional
+        Reporter receiving the number of candidates screened after each chunk 
+        (stage "detection", see `sicritfix.utils.progress`).
+    
+    n_references : int, optional (default=0)
+        When positive, the candidates are also scored as reference signals 
+        from the same FFTs (see `screen_oscillations`) and the best 
+        `n_references` are returned. Not compatible with `freq_band`.
+    
       Returns
       -------
-      binned_mzs : list of float
+      binned_mzs : np.ndarray
           All binned m/z values observed across the input spectra.
     
       oscillating_mzs : list of float
@@ -92,60 +232,156 @@ def detect_oscillating_mzs(rt_array, mz_array, intensity_array, mz_bin_size=0.01
     
       time_detect_oscillating_mzs : float
           Total execution time (in seconds) for the detection process.
+    
+      references : dict
+          Only with `n_references`: "scores", "mzs" and "xics" (one row per 
+          reference) of the best scored candidates, best first.
       """
-    mz_counts=defaultdict(int)
+    if n_references and freq_band is not None:
+        raise ValueError("References can only be scored on the full spectrum (freq_band=None)")
     start_time=time.time()
+    peak_table = as_peak_table(mz_array, intensity_array, rt_array)
     
-    #1. Binning of all m/z values across all spectra
-    for mzs in mz_array:
-        binned_mzs=np.round(mzs/mz_bin_size)*mz_bin_size
-        for mz in binned_mzs:
-            mz_counts[mz]+=1
+    #1. Binning of all m/z values across all spectra (number of scans per bin)
+    binned_mzs, scan_counts = peak_table.mz_histogram(mz_bin_size)
             
     #2. Selection of the ones that appear in enough spectra
-    candidate_mzs=[]
-    for mz, count in mz_counts.items():
-        if count>=min_occurrences:
-            candidate_mzs.append(mz)
+    candidate_mzs = binned_mzs[scan_counts >= min_occurrences]
      
     #3. Detection of oscillating mzs
     oscillating_mzs=[]
     
 
-        #3.1 Analysis of XIC for each m/z
-    for mz in candidate_mzs:
-        xic=build_xic(mz_array, intensity_array, rt_array, target_mz=mz)
-        if(np.sum(xic) < 1e-5):
-            continue #this means signal is too weak
-        
-        #3.1.1 Remove baseline and compute FFT
-        xic_centered=xic-np.mean(xic)
-        fft_spectrum = np.fft.rfft(xic_centered)
-        power_spectrum=np.abs(fft_spectrum) ** 2
-        norm_power= power_spectrum /np.sum(power_spectrum)
-        
-        #3.1.2 Detection of xic with enough intensity power
-        if np.any(norm_power[1:] > power_threshold):
-           oscillating_mzs.append(round(mz, 3))#round to 3 decimals for simplification
+        #3.1 Analysis of the XICs of each chunk of candidates
+    if executor is None:
+        executor = SerialExecutor(peak_table)
+    chunk_size = candidates_per_chunk(peak_table.n_scans, memory_budget_mb)
+    if executor.jobs > 1:
+        chunk_size = min(chunk_size, -(-len(candidate_mzs) // executor.jobs))#every worker gets work
+    chunks = [candidate_mzs[i:i + chunk_size] for i in range(0, len(candidate_mzs), chunk_size)]
+    
+        #3.1.1 Remove baseline, compute FFT and detect xics with enough intensity power
+    progress = progress or NullProgress()
+    n_screened = 0
+    chunk_results = executor.imap(_screen_candidates, chunks, power_threshold, freq_band, n_references)
+    references = {"scores": np.zeros(0), "mzs": np.zeros(0), "xics": np.zeros((0, peak_table.n_scans))}
+    
+    for chunk_mzs, is_oscillating in zip(chunks, chunk_results):
+        if n_references:
+            is_oscillating, chunk_references = is_oscillating
+            #keep the best references seen so far
+            scores, mzs, xics = (np.concatenate((references[key], new)) for key, new in zip(("scores", "mzs", "xics"), chunk_references))
+            best = _best_references(scores, mzs, n_references)
+            references = {"scores": scores[best], "mzs": mzs[best], "xics": xics[best]}
+        for mz in chunk_mzs[is_oscillating]:
+            oscillating_mzs.append(round(float(mz), 3))#round to 3 decimals for simplification
+        n_screened += len(chunk_mzs)
+        progress.update("detection", n_screened, len(candidate_mzs))
            
     end_time=time.time()  
     time_detect_oscillating_mzs=end_time-start_time
+    if n_references:
+        return binned_mzs, oscillating_mzs, time_detect_oscillating_mzs, references
      
     return binned_mzs, oscillating_mzs, time_detect_oscillating_mzs
 
-def correct_spectra(input_map, oscillating_mzs, rts, residual_signals, mz_bin_size=0.001):
+def iter_corrected_spectra(input_map, oscillating_mzs, residual_signals, mz_bin_size=0.001, profiler=None, progress=None, scans=None, peak_table=None):
     """
-    Applies oscillation-corrected intensity values to an MSExperiment.
+    Yields the spectra of an MSExperiment with their peaks corrected, in order.
+
+    This is the per-spectrum step of `correct_spectra`. Only the peaks of the 
+    spectra matching an oscillating m/z are replaced, with ``set_peaks``; the 
+    other spectra and all metadata are left as they are. Iterating an 
+    MSExperiment yields copies of its spectra, so `input_map` itself is not 
+    modified. Consuming the spectra as they are yielded (e.g. with 
+    `store_spectra`) avoids holding all the copies and lets writing overlap 
+    with the correction.
+
+    Parameters
+    ----------
+    input_map : MSExperiment
+        The original mass spectrometry experiment containing raw spectra.
+
+    oscillating_mzs : list of float
+        List of m/z values identified as oscillatory and to be corrected.
+
+    residual_signals : dict
+        Dictionary mapping each oscillating m/z value to a NumPy array of
+        corrected intensity values, indexed by scan (i.e., spectrum position).
+
+    mz_bin_size : float, optional (default=0.001)
+        The tolerance used when matching m/z values in the spectrum to the 
+        oscillating m/z values.
+
+    profiler : RunProfiler, optional
+        Profiler whose "peaks_rewritten" and "spectra_rewritten" counters are increased.
+
+    progress : ProgressReporter, optional
+        Reporter receiving the number of spectra yielded (stage "write").
+
+    scans : np.ndarray, optional
+        Sorted positions in `input_map` of the spectra the residual signals 
+        are indexed by (e.g. the scans of the corrected streams, see 
+        `PeakTable.streams`). The other spectra are yielded unchanged. By 
+        default, the residual signals cover every spectrum.
+
+    peak_table : PeakTable, optional
+        Peaks of `input_map`. When given, the spectra with no matching peak 
+        are found at once (see `scans_with_targets`) and their peaks are not 
+        read at all.
+
+    Yields
+    ------
+    spectrum : MSSpectrum
+        Copy of a spectrum of `input_map` (as returned by iterating the 
+        experiment), with its peaks corrected and its metadata untouched.
+    """
+    profiler = profiler or NullProfiler()
+    progress = progress or NullProgress()
+    n_spectra = input_map.getNrSpectra()
+    target_mzs, residual_matrix = build_residual_lookup(oscillating_mzs, residual_signals)
+    columns = _scan_columns(n_spectra, scans)
+    if peak_table is not None:
+        columns = np.where(scans_with_targets(peak_table, target_mzs, mz_bin_size), columns, -1)
+    
+    for i, spectrum in enumerate(input_map):
+        if columns[i] >= 0:
+            mzs, intensities = spectrum.get_peaks()
+            corrected_intensities, matched = correct_peaks(mzs, intensities, columns[i], target_mzs, residual_matrix, mz_bin_size)
+            if len(matched):
+                spectrum.set_peaks((mzs, corrected_intensities))
+                profiler.count("peaks_rewritten", len(matched))
+                profiler.count("spectra_rewritten")
+    
+        yield spectrum
+        progress.update("write", i + 1, n_spectra)
+
+def correct_spectra(input_map, oscillating_mzs, rts, residual_signals, mz_bin_size=0.001, peak_table=None, profiler=None):
+    """
+    Applies oscillation-corrected intensity values to the spectra of an MSExperiment.
 
     For each spectrum in the input MSExperiment, this function replaces the 
     intensities of specified oscillating m/z values with the corresponding 
     residual (corrected) values. Matching is done based on m/z proximity within 
-    a specified bin size.
+    a specified bin size, with one lookup of the spectrum's peaks in the sorted 
+    oscillating m/z values (see `correct_peaks`).
+
+    Only the intensities of the matched peaks change. Every spectrum keeps 
+    its position, m/z values and metadata (RT, MS level, native ID, 
+    precursors...), and the chromatograms and experimental settings of the 
+    experiment are left untouched. 
+    
+    pyopenms has no per-spectrum setter, so the spectra (copies, see 
+    `iter_corrected_spectra`) are collected and swapped into the experiment 
+    with ``setSpectra``, which replaces the spectra only: a second copy of 
+    every spectrum is held meanwhile. Writing them with `store_spectra` 
+    instead avoids it, as `process_file` does.
 
     Parameters
     ----------
     input_map : MSExperiment
-        The original mass spectrometry experiment containing raw spectra.
+        The mass spectrometry experiment to correct, in place. Its spectra 
+        are replaced by their corrected copies.
 
     oscillating_mzs : list of float
         List of m/z values identified as oscillatory and to be corrected.
@@ -161,63 +397,166 @@ def correct_spectra(input_map, oscillating_mzs, rts, residual_signals, mz_bin_si
         The tolerance used when matching m/z values in the spectrum to the 
         oscillating m/z values.
 
+    peak_table : PeakTable, optional
+        Peaks of `input_map`. When given, the peaks of the spectra with no 
+        oscillating m/z are not read (see `iter_corrected_spectra`).
+
+    profiler : RunProfiler, optional
+        Profiler whose "peaks_rewritten" and "spectra_rewritten" counters are increased.
+
     Returns
     -------
     corrected_map : MSExperiment
-        A new MSExperiment object where the specified m/z values have been 
-        corrected with the provided residual intensities.
+        `input_map` itself, where the specified m/z values have been corrected 
+        with the provided residual intensities.
 
     time_correct_spectra : float
         Total execution time (in seconds) required to perform the correction.
     """
-    corrected_map = oms.MSExperiment()
-    #corrected_map.setSpectra(input_map.getSpectra())
-    
     start_time=time.time()
     
-    for i, spectrum in enumerate(input_map):
-        mzs, intensities = spectrum.get_peaks()
-        mzs = np.array(mzs)
-        intensities = np.array(intensities)
-
+    corrected_spectra = iter_corrected_spectra(input_map, oscillating_mzs, residual_signals, mz_bin_size, profiler=profiler, peak_table=peak_table)
+    input_map.setSpectra(list(corrected_spectra))
+    input_map.updateRanges()
+        
+    end_time=time.time()
+    time_correct_spectra=end_time-start_time
+    
+    return input_map, time_correct_spectra
         
-        corrected_intensities = intensities.copy()
 
-        for target_mz in oscillating_mzs:
-            target_mz=round(float(target_mz), 3)
-            corrected_intensity = residual_signals[target_mz][i]
+class _CorrectingConsumer(ForwardingConsumer):
+    """
+    Streaming consumer that corrects each spectrum before forwarding it to the writer.
+    Spectra are expected in file order; `columns` gives the column of the 
+    residual matrix of each one (-1 for the spectra forwarded unchanged).
+    """
 
-            # Find index of closest m/z (within tolerance)
-            mz_diff = np.abs(mzs - target_mz)
-            idx_matches = np.where(mz_diff <= mz_bin_size)[0]#indexes within the mz_tol
+    def __init__(self, consumer, target_mzs, residual_matrix, columns, mz_bin_size=0.001, profiler=None, progress=None, native_ids=None):
+        super().__init__(consumer)
+        self.target_mzs = target_mzs
+        self.residual_matrix = residual_matrix
+        self.columns = columns
+        self.mz_bin_size = mz_bin_size
+        self.profiler = profiler or NullProfiler()
+        self.progress = progress or NullProgress()
+        self.scan_index = 0
+        self.n_spectra = len(columns)
+        #filtered loads: the columns are those of the spectra with these native IDs
+        self.column_by_id = None if native_ids is None else {
+            native_id: column for native_id, column in zip(native_ids, columns) if column >= 0
+        }
 
-            for idx in idx_matches:
-                corrected_intensities[idx] = corrected_intensity
-            
+    def setExpectedSize(self, n_spectra, n_chromatograms):
+        if self.column_by_id is not None:
+            self.n_spectra = n_spectra
+        super().setExpectedSize(n_spectra, n_chromatograms)
 
-        # Create a new spectrum with corrected peaks
-        new_spectrum = oms.MSSpectrum()
-        new_spectrum.set_peaks((mzs, corrected_intensities))
-        
-        #Copy of the original metadata
-        new_spectrum.setRT(spectrum.getRT())
-        new_spectrum.setMSLevel(spectrum.getMSLevel())
-        new_spectrum.setRT(spectrum.getRT())
-        new_spectrum.setDriftTime(spectrum.getDriftTime())
-        new_spectrum.setPrecursors(spectrum.getPrecursors())
-        new_spectrum.setInstrumentSettings(spectrum.getInstrumentSettings())
-        new_spectrum.setAcquisitionInfo(spectrum.getAcquisitionInfo())
-        new_spectrum.setType(spectrum.getType())
-    
-        corrected_map.addSpectrum(new_spectrum)
+    def process_spectrum(self, spectrum):
+        if self.column_by_id is None:
+            column = self.columns[self.scan_index]
+        else:
+            column = self.column_by_id.get(spectrum.getNativeID(), -1)
+        if column >= 0:
+            mzs, intensities = spectrum.get_peaks()
+            corrected_intensities, matched = correct_peaks(
+                mzs, intensities, column, self.target_mzs, self.residual_matrix, self.mz_bin_size
+            )
+            if len(matched):
+                spectrum.set_peaks((mzs, corrected_intensities))
+                self.profiler.count("peaks_rewritten", len(matched))
+                self.profiler.count("spectra_rewritten")
+        self.scan_index += 1
+        self.progress.update("write", self.scan_index, self.n_spectra)
         
+        return spectrum
+
+def correct_spectra_streaming(file_path, save_as, oscillating_mzs, residual_signals, mz_bin_size=0.001, profiler=None, progress=None, scans=None, n_spectra=None, encoding=None, native_ids=None):
+    """
+    Streaming counterpart of `correct_spectra`: reads, corrects and writes one spectrum at a time.
+
+    The input file is read a second time, so only one spectrum is held in memory 
+    while the corrected mzML file is written. Metadata of each spectrum is kept 
+    as read, only the peaks matching an oscillating m/z are replaced.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the input MS data file (.mzML or .mzXML).
+
+    save_as : str
+        Path where the corrected mzML file will be saved.
+
+    oscillating_mzs : list of float
+        List of m/z values identified as oscillatory and to be corrected.
+
+    residual_signals : dict
+        Dictionary mapping each oscillating m/z value to a NumPy array of
+        corrected intensity values, indexed by scan.
+
+    mz_bin_size : float, optional (default=0.001)
+        The tolerance used when matching m/z values in the spectrum to the 
+        oscillating m/z values.
+
+    profiler : RunProfiler, optional
+        Profiler whose "peaks_rewritten" and "spectra_rewritten" counters are increased.
+
+    progress : ProgressReporter, optional
+        Reporter receiving the number of spectra written (stage "write").
+
+    scans : np.ndarray, optional
+        Sorted positions in the file of the spectra the residual signals are 
+        indexed by (see `iter_corrected_spectra`). Requires `n_spectra`.
+
+    n_spectra : int, optional
+        Number of spectra of the file. Only needed with `scans`.
+
+    encoding : dict, optional
+        Binary encoding of the written file (see `peak_file_options`).
+
+    native_ids : list of str, optional
+        Native IDs of the spectra the residual signals (and `scans`) refer to, 
+        when they are not all the spectra of the file (a filtered load, see 
+        `load_peak_table`). Then `n_spectra` is their number, and the spectra 
+        of the file with another native ID are written unchanged.
+
+    Returns
+    -------
+    time_correct_spectra : float
+        Total execution time (in seconds) required to correct and write the spectra.
+    """
+    start_time=time.time()
+    
+    target_mzs, residual_matrix = build_residual_lookup(oscillating_mzs, residual_signals)
+    columns = _scan_columns(residual_matrix.shape[1] if scans is None else n_spectra, scans)
+    stream_file(
+        file_path, save_as,
+        consumer_factory=lambda writer: _CorrectingConsumer(writer, target_mzs, residual_matrix, columns, mz_bin_size, profiler, progress, native_ids),
+        encoding=encoding
+    )
+    
     end_time=time.time()
     time_correct_spectra=end_time-start_time
     
-    return corrected_map, time_correct_spectra
-        
+    return time_correct_spectra
 
-def process_file(file_path, save_as, plot=False, verbose=False):
+def _scan_columns(n_spectra, scans=None):
+    """Column of the residual signals of each spectrum of the run, -1 for the spectra not in `scans`."""
+    if scans is None:
+        return np.arange(n_spectra)
+    columns = np.full(n_spectra, -1, dtype=np.int64)
+    columns[scans] = np.arange(len(scans))
+    
+    return columns
+
+def _store_original(file_path, save_as, input_map=None, encoding=None):
+    """Saves the uncorrected data, streaming it from `file_path` when no experiment was loaded."""
+    if input_map is None:
+        stream_file(file_path, save_as, encoding=encoding)
+    else:
+        store_file(save_as, input_map, encoding)
+
+def process_file(file_path, save_as, plot=False, verbose=False, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, streaming=False, jobs=1, power_threshold=0.15, cache_dir=None, cache_size_mb=DEFAULT_CACHE_SIZE_MB, msconvert=False, detector="fft", amplitude_model="percentile", profile=None, progress=None, mz_ref=922.098, n_references=3, calibration=None, save_calibration=None, encoding=None, load_filters=None):
     """
    Main pipeline for detecting and correcting oscillatory artifacts in an MS data file.
 
@@ -228,8 +567,10 @@ def process_file(file_path, save_as, plot=False, verbose=False):
 
    Workflow:
    ----------
-   1. Load MS data from file (converts from mzXML to mzML if needed).
-   2. Extract retention times, m/z, and intensity values.
+   1. Load MS data from file (mzML or mzXML, optionally converted with msconvert).
+   2. Extract retention times, m/z, and intensity values, and split the scans 
+      by MS level and polarity. Steps 3 to 5 run separately on each MS1 
+      stream; the other spectra are passed through unchanged.
    3. Compute local frequencies and phase from a reference m/z (922.098).
    4. Detect m/z values showing oscillatory behavior using FFT-based power analysis.
    5. For each oscillating m/z:
@@ -247,114 +588,543 @@ def process_file(file_path, save_as, plot=False, verbose=False):
    save_as : str
        Path where the corrected mzML file will be saved.
 
+   plot : bool, optional (default=False)
+       Show the original and corrected XIC of each oscillating m/z.
+
+   verbose : bool, optional (default=False)
+       Print progress information.
+
+   memory_budget_mb : float, optional (default=256)
+       Memory (in MB) allowed for each chunk of candidate XICs during detection.
+
+   streaming : bool, optional (default=False)
+       Process the file in two streaming passes instead of loading the whole 
+       experiment: the first pass only collects the peaks needed for the 
+       reference phase and detection, the second one reads, corrects and writes 
+       one spectrum at a time. Use it for files that do not fit in memory.
+
+   jobs : int, optional (default=1)
+       Number of processes used for detection and correction. The peak data 
+       is shared with the workers, and the result does not depend on `jobs`. 
+       With several MS1 streams, the streams are processed concurrently and 
+       share the processes.
+
+   power_threshold : float, optional (default=0.15)
+       Minimum relative spectral power for an m/z to be considered oscillating.
+
+   cache_dir : str, optional
+       Directory of an on-disk cache (see `sicritfix.io.cache`). The parsed peaks,
+       the reference phase and the detection results are stored there, keyed by
+       the content of the input file and the parameters they depend on, and
+       reused by later runs. No cache by default.
+
+   cache_size_mb : float, optional (default=10240)
+       Size cap of the cache. Least recently used runs are evicted beyond it.
+
+   msconvert : bool, optional (default=False)
+       Convert mzXML input with ProteoWizard's msconvert (with peak picking) 
+       instead of reading it natively. Conversions are cached by input hash.
+
+   detector : {"fft", "band"}, optional (default="fft")
+       Oscillation detector. "fft" flags an m/z if any bin of its full spectrum 
+       exceeds `power_threshold`; "band" only looks at the bins around the 
+       reference oscillation frequency, which is cheaper and ignores slow 
+       chromatographic peaks.
+
+   amplitude_model : {"percentile", "lockin"}, optional (default="percentile")
+       How the oscillation of each m/z is fitted. "percentile" estimates its 
+       amplitude from local interquartile ranges (see `get_amplitudes`); 
+       "lockin" fits the amplitude and phase offset of every m/z at once by 
+       least squares on the reference phase (see `fit_oscillations`).
+
+   profile : str, optional
+       Path of a JSON report of the run (see `sicritfix.utils.profiler`): wall 
+       and CPU time, peak RSS and tracemalloc peak of each stage (load, 
+       reference, binning, detection, correction, write), and counters of the 
+       spectra, peaks, candidate bins, XICs built, spectral transforms 
+       computed and peaks and spectra rewritten, and the number of scans of each stream. 
+       Written whatever the outcome of the run.
+
+   progress : callable, optional
+       Sink called with the progress events of the run (see 
+       `sicritfix.utils.progress`): start and end of the run and of each stage, 
+       and rate-limited updates of the candidates screened, the targets 
+       corrected and the spectra written, with the ETA of the stage. An 
+       exception raised by the sink aborts the run. E.g. `ProgressBar()`.
+
+   mz_ref : float or "auto", optional (default=922.098)
+       Reference m/z whose oscillation gives the phase. With "auto", the 
+       candidates are scored as references during the detection, from the 
+       same FFTs (oscillation strength and regularity, and coverage of the 
+       run; see `screen_oscillations`), and the phase is taken from the best 
+       ones (see `select_reference`), with no extra pass over the data. 
+       Requires the "fft" detector.
+
+   n_references : int, optional (default=3)
+       Maximum number of references averaged with ``mz_ref="auto"``.
+
+   calibration : str, optional
+       Path of a calibration file of the method (see 
+       `sicritfix.processing.calibration`). The reference phase is integrated 
+       from its frequency profile and only its offset is fitted on the run; 
+       if the calibrated oscillation explains less than 30% of the variance 
+       of the reference XIC, the phase is estimated as without calibration. 
+       Its amplitude priors replace amplitudes that can not be estimated.
+
+   save_calibration : str, optional
+       Path where the calibration of this run is saved when it is corrected.
+
+   encoding : dict, optional
+       Binary encoding of the output mzML file (see 
+       `sicritfix.io.io.peak_file_options`): MS-Numpress codec and precision 
+       (32 or 64 bits) of the m/z and intensity arrays, zlib compression and 
+       index. E.g. ``{"numpress_mz": "linear", "numpress_intensity": "slof"}``. 
+       The OpenMS encoding by default.
+
+   load_filters : dict, optional
+       Region of the run to analyze (see `sicritfix.io.io.load_options`): MS 
+       levels, RT range (in seconds) and m/z range. Only the spectra and peaks 
+       inside it are decoded for the detection and correction, in a first pass 
+       that keeps no chromatograms or metadata; the second pass, as in the 
+       streaming mode, writes the file with only the peaks of the corrected 
+       spectra rewritten (found by native ID). Spectra outside the region are 
+       written unchanged. E.g. ``{"ms_levels": [1], "rt_range": (60, 900)}``.
+
    Returns
    -------
-   None
-       The corrected mzML file is written to disk. Execution times for major steps
-       are printed to the console for profiling/debugging purposes.
+   file_corrected : bool
+       True if oscillations were detected and corrected, False if the original 
+       data was saved unchanged. The output mzML file is written to disk in both cases.
    """
     
     start_time=time.time()
-    input_map=load_file(file_path)
-
+    profiler = RunProfiler() if profile else NullProfiler()
+    profiler.set_info(
+        input_path=file_path, output_path=save_as, streaming=streaming, jobs=jobs, 
+        detector=detector, amplitude_model=amplitude_model, power_threshold=power_threshold, load_filters=load_filters,
+    )
+    if mz_ref == "auto" and detector != "fft":
+        raise ValueError('mz_ref="auto" requires the "fft" detector')
+    peak_file_options(encoding)#invalid encodings and filters fail before the run
+    load_options(load_filters)
+    reporter = ProgressReporter(progress) if progress else NullProgress()
+    reporter.emit("run_start", input_path=file_path, output_path=save_as)
+    outcome = "failed"
+    try:
+        file_corrected = _run_pipeline(
+            file_path, save_as, profiler, reporter, plot=plot, verbose=verbose, memory_budget_mb=memory_budget_mb, 
+            streaming=streaming, jobs=jobs, power_threshold=power_threshold, cache_dir=cache_dir, 
+            cache_size_mb=cache_size_mb, msconvert=msconvert, detector=detector, amplitude_model=amplitude_model,
+            mz_ref=mz_ref, n_references=n_references, save_calibration=save_calibration, encoding=encoding, load_filters=load_filters,
+            calibration=PhaseCalibration.load(calibration) if calibration else None,
+        )
+        outcome = "corrected" if file_corrected else "unchanged"
+        profiler.set_info(outcome=outcome)
+    except Exception as e:
+        profiler.set_info(outcome="failed", error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        if profile:
+            profiler.write(profile)
+        reporter.emit("run_end", outcome=outcome)
+    
+    #Computation of overall execution time
+    end_time=time.time()
+    time_elapsed=end_time-start_time
         
+    if file_corrected:
+        if verbose:
+            print(f" Correction done in {time_elapsed:.3f} seconds")
+            
+        print("<<< Correction done. ") 
+        print(f"Execution time: {time_elapsed:.3f}")
+            
+        if verbose:
+            print(f"Corrected file saved: {save_as}")
+            
+    return file_corrected
+
+@contextmanager
+def _stage(profiler, progress, name):
+    """Times a stage of the pipeline and reports its start and end."""
+    with profiler.stage(name), progress.stage(name):
+        yield
+
+def _stream_name(key):
+    """Name of a scan stream, e.g. "MS1+" for the positive MS1 scans."""
+    ms_level, polarity = key
+    
+    return f"MS{ms_level}" + {1: "+", 2: "-"}.get(polarity, "")
+
+class _ScanStream:
+    """
+    Scans of the same MS level and polarity (see `PeakTable.streams`), with 
+    their own peak table and the results of each step of the pipeline on them.
+    """
+
+    def __init__(self, key, scans, peak_table):
+        self.key = key
+        self.name = _stream_name(key)
+        self.scans = scans
+        self.peak_table = peak_table
+        self.executor = None
+        self.reference = None
+        self.calibration_fit = None
+        self.n_candidates = 0
+        self.binned_mzs = None
+        self.oscillating_mzs = []
+        self.scored = None
+        self.detection_key = None
+        self.xic_signals = {}
+        self.modulated_signals = {}#Dict[target_mz: float, modulated: np.ndarray]
+        self.residual_signals = {}#Dict[target_mz: float, residual: np.ndarray]
+
+    def params(self, params):
+        """Cache parameters of a result of this stream."""
+        return {**params, "stream": self.name}
+
+def _ms1_streams(peak_table, scan_streams):
+    """MS1 streams of the run. A stream holding every scan keeps the peak table of the run."""
+    streams = []
+    for key, scans in scan_streams.items():
+        if key[0] != 1:
+            continue
+        stream_table = peak_table if len(scans) == peak_table.n_scans else peak_table.take(scans)
+        streams.append(_ScanStream(key, scans, stream_table))
+    
+    return streams
+
+def _stream_executor(stream, jobs, n_streams):
+    """Executor of a stream: the jobs are shared by the streams, processed concurrently."""
+    if jobs is None or jobs <= 1:
+        return SerialExecutor(stream.peak_table)
+    
+    return ParallelExecutor(stream.peak_table, max(1, jobs // n_streams))
+
+def _map_streams(func, streams, concurrent=False):
+    """Runs `func` on each stream, in one thread per stream if `concurrent`."""
+    if not concurrent or len(streams) < 2:
+        return [func(stream) for stream in streams]
+    with ThreadPoolExecutor(len(streams)) as pool:
+        return list(pool.map(func, streams))
+
+class _StageProgress:
+    """
+    Reports the progress of the streams processed concurrently in a stage as 
+    the progress of the stage: items done in every stream over their total.
+    """
+
+    def __init__(self, progress, totals):
+        self.progress = progress
+        self.totals = totals
+        self.done = dict.fromkeys(totals, 0)
+        self._lock = threading.Lock()
+
+    def stream(self, name):
+        """Reporter of one stream, to pass as the `progress` of its step."""
+        return _StreamProgress(self, name)
+
+    def update_stream(self, name, stage, done):
+        with self._lock:
+            self.done[name] = done
+            self.progress.update(stage, sum(self.done.values()), sum(self.totals.values()))
+
+class _StreamProgress:
+    """Progress reporter of one stream of a `_StageProgress`."""
+
+    def __init__(self, stage_progress, name):
+        self.stage_progress = stage_progress
+        self.name = name
+
+    def update(self, stage, done, total):
+        self.stage_progress.update_stream(self.name, stage, done)
+
+def _calibrated_reference(stream, calibration, verbose):
+    """Reference of a stream from a calibration, or None if it does not fit the stream."""
+    try:
+        local_freqs_ref, phase_ref, stream.calibration_fit = calibrated_reference(stream.peak_table, calibration)
+    except ValueError as e:
+        if verbose:
+            print(f" Calibration not applied to {stream.name} ({e}). Estimating the reference phase.")
+        return None
+    
+    return {"local_freqs_ref": local_freqs_ref, "phase_ref": phase_ref, "reference_mzs": calibration.reference_mzs}
+
+def _set_reference_info(profiler, streams):
+    """Records the reference m/z in the profile: a list, or a dict by stream if there are several."""
+    references = {stream.name: stream.reference["reference_mzs"].tolist() for stream in streams}
+    profiler.set_info(reference_mzs=references[streams[0].name] if len(streams) == 1 else references)
+
+def _detect_in_stream(stream, cache, run_key, detection_params, n_references, power_threshold, memory_budget_mb, detector, progress):
+    """
+    Detects the oscillating m/z of a stream, scoring its candidates as 
+    references if it has none. Returns True if the detection was computed.
+    """
+    n_scored = n_references if stream.reference is None else 0#auto mode: references scored by the detection
+    freq_band = reference_band(stream.reference["local_freqs_ref"]) if detector == "band" else None
+    #the band depends on the reference (mz_ref, calibration), so it is part of the cache key
+    stream.detection_key = stream.params(detection_params if freq_band is None else {**detection_params, "freq_band": list(freq_band)})
+    detection = cache.load_result(run_key, "detection", stream.detection_key) if cache and not n_scored else None
+    if detection is not None:
+        stream.oscillating_mzs = detection["oscillating_mzs"].tolist()
+        return False
+    
+    stream.binned_mzs, stream.oscillating_mzs, time_detect_oscillating_mzs, *scored = detect_oscillating_mzs(
+        stream.peak_table, mz_bin_size=detection_params["mz_bin_size"], min_occurrences=detection_params["min_occurrences"], 
+        power_threshold=power_threshold, memory_budget_mb=memory_budget_mb, executor=stream.executor, 
+        freq_band=freq_band, progress=progress, n_references=n_scored
+    )
+    stream.scored = scored[0] if n_scored else None
+    
+    return True
+
+def _correct_stream(stream, amplitude_model, amplitude_priors, progress):
+    """Fits and removes the oscillation of each oscillating m/z of a stream."""
+    n_corrected = 0
+    target_chunks = split_evenly(stream.oscillating_mzs, stream.executor.jobs * _CORRECTION_CHUNKS_PER_JOB)
+    phase_ref = stream.reference["phase_ref"]
+    basis = lockin_basis(phase_ref) if amplitude_model == "lockin" else None#shared by the chunks
+    chunk_results = stream.executor.imap(
+        _correct_targets, target_chunks, phase_ref, stream.reference["local_freqs_ref"], amplitude_model, amplitude_priors, basis
+    )
+    
+    for target_chunk, corrections in zip(target_chunks, chunk_results):
+        for target_mz, (xic, modulated_signal, residual_signal) in zip(target_chunk, corrections):
+                    
+            stream.xic_signals[target_mz] = xic
+            stream.modulated_signals[target_mz] = modulated_signal
+            stream.residual_signals[target_mz] = residual_signal
+        n_corrected += len(target_chunk)
+        progress.update("correction", n_corrected, len(stream.oscillating_mzs))
+
+def _merge_corrections(streams, n_scans):
+    """
+    Residual signals of the corrected streams, indexed by the scans of all of 
+    them, with NaN (peaks left unchanged) in the scans of the other streams.
+    Returns the oscillating m/z, the residual signals and the sorted scans 
+    (None when they are all the scans of the run).
+    """
+    if len(streams) == 1 and len(streams[0].scans) == n_scans:
+        return streams[0].oscillating_mzs, streams[0].residual_signals, None
+    
+    scans = np.sort(np.concatenate([stream.scans for stream in streams]))
+    residual_signals = {}
+    for stream in streams:
+        columns = np.searchsorted(scans, stream.scans)
+        for target_mz, residual_signal in stream.residual_signals.items():
+            residual_signals.setdefault(target_mz, np.full(len(scans), np.nan))[columns] = residual_signal
+    
+    return list(residual_signals), residual_signals, scans
+
+def _run_pipeline(file_path, save_as, profiler, progress, plot, verbose, memory_budget_mb, streaming, jobs, power_threshold, cache_dir, cache_size_mb, msconvert, detector, amplitude_model, mz_ref, n_references, calibration, save_calibration, encoding, load_filters):
+    """Steps of `process_file`, timed by `profiler` and reported to `progress`. Returns True if the file was corrected."""
     # 1. Load MS data from the original file (rts, mzs, and intesity values)
+    #    (the streaming mode skips its first pass when the peaks are cached;
+    #    with load filters, only the region of interest is decoded)
+    #    and split its scans by MS level and polarity
+    with _stage(profiler, progress, "load"):
+        input_path = get_input_path(file_path, msconvert)
+        cache = RunCache(cache_dir, cache_size_mb) if cache_dir else None
+        run_key = cache.run_key(input_path) if cache else None
         
-    original_spectra = []
-    mz_array = []
-    intensity_array=[]
-    rts = []#secs
-    tic_original = []
-        
-        
-    for spectrum in input_map:
-        original_spectra.append(spectrum)
-        mzs, intensities = spectrum.get_peaks()
-        mz_array.append(mzs)
-        intensity_array.append(intensities)
-        rt = spectrum.getRT()
-        rts.append(rt)
-        tic_original.append(np.sum(intensities))
+        #filtered loads are not cached: the peak table would not be that of the run
+        peak_table = cache.load_peak_table(run_key) if cache and not load_filters else None
+        peaks_cached = peak_table is not None
+        native_ids = None
+        if load_filters:
+            input_map = None
+            peak_table, native_ids = load_peak_table(input_path, filters=load_filters, native_ids=True)
+        elif streaming:
+            input_map = None
+            if peak_table is None:
+                peak_table = load_peak_table(input_path)
+        else:
+            input_map=load_file(input_path)
+            if peak_table is None:
+                peak_table = PeakTable.from_experiment(input_map)
+        if cache and not peaks_cached and not load_filters:
+            cache.store_peak_table(run_key, peak_table)
+        scan_streams = peak_table.streams()
+        streams = _ms1_streams(peak_table, scan_streams)
+    profiler.count("spectra", peak_table.n_scans)
+    profiler.count("peaks", peak_table.n_peaks)
+    profiler.set_info(streams={_stream_name(key): len(scans) for key, scans in scan_streams.items()})
             
     if verbose:
         print(f"Loaded file from {file_path}")
-    # 2. Oscillations' correction
-            
-        #2.1 Extract freq from signal of ref: m/z=922.098  
-    try:
-        local_freqs_ref, phase_ref = obtain_freq_from_signal(rts, mz_array, intensity_array)
-    except ValueError:
-        print(" Reference signal empty. No oscillations detected")
-        oms.MzMLFile().store(save_as, input_map)
+        if len(scan_streams) > 1:
+            print(" Scan streams: " + ", ".join(f"{_stream_name(key)} ({len(scans)})" for key, scans in scan_streams.items()))
+    if not streams:
+        print(" File with no MS1 scans. Returning original file.")
+        with _stage(profiler, progress, "write"):
+            _store_original(input_path, save_as, input_map, encoding)
         return False
+    # 2. Oscillations' correction, separately in each MS1 stream (the other scans are not corrected)
             
-        #2.2 Detect mzs to correct
-    binned_mzs, oscillating_mzs, time_detect_oscillating_mzs=detect_oscillating_mzs(rts, mz_array, intensity_array)
-    #[DEBUG] PROFILING 
-    #print(f" TIME detect_oscillating_mzs: {time_detect_oscillating_mzs}")
+        #2.1 Extract freq from signal of ref: m/z=922.098 (in auto mode, after the detection),
+        #    or only fit its offset with a calibration
+    auto_reference = mz_ref == "auto"
+    reference_params = {**REFERENCE_PARAMS, "mz_ref": mz_ref}
+    if load_filters:
+        reference_params["load_filters"] = load_filters
+    if calibration is not None:
+        with _stage(profiler, progress, "reference"):
+            for stream in streams:
+                stream.reference = _calibrated_reference(stream, calibration, verbose)
+        calibration_fits = [stream.calibration_fit for stream in streams if stream.reference is not None]
+        profiler.count("xics_built", len(calibration_fits))
+        profiler.set_info(calibration="applied" if len(calibration_fits) == len(streams) else "partial" if calibration_fits else "fallback")
+        if calibration_fits:
+            profiler.set_info(calibration_fit=min(calibration_fits))
+    pending = [stream for stream in streams if stream.reference is None]
+    if auto_reference:
+        reference_params["n_references"] = n_references
+        for stream in pending:
+            stream.reference = cache.load_result(run_key, "reference", stream.params(reference_params)) if cache else None
+    elif pending:
+        with _stage(profiler, progress, "reference"):
+            for stream in pending:
+                stream.reference = cache.load_result(run_key, "reference", stream.params(reference_params)) if cache else None
+                if stream.reference is not None:
+                    continue
+                try:
+                    local_freqs_ref, phase_ref = obtain_freq_from_signal(stream.peak_table, mz_ref=mz_ref)
+                except ValueError:
+                    continue
+                profiler.count("xics_built")
+                profiler.count("ffts", len(local_freqs_ref))#one per local window
+                stream.reference = {"local_freqs_ref": local_freqs_ref, "phase_ref": phase_ref, "reference_mzs": np.array([mz_ref])}
+                if cache:
+                    cache.store_result(run_key, "reference", stream.params(reference_params), **stream.reference)
+        
+        streams = [stream for stream in streams if stream.reference is not None]
+        if not streams:
+            print(" Reference signal empty. No oscillations detected")
+            with _stage(profiler, progress, "write"):
+                _store_original(input_path, save_as, input_map, encoding)
+            return False
+    if all(stream.reference is not None for stream in streams):
+        _set_reference_info(profiler, streams)
             
-    if not oscillating_mzs:
-        print(" File with no oscillations detected. Returning original file.")
-        oms.MzMLFile().store(save_as, input_map)
-        print(f" Original file saved as: {save_as}")
-        return False
+        #2.2 Detect mzs to correct
+    with _stage(profiler, progress, "binning"):
+        for stream in streams:
+            binned_mzs, scan_counts = stream.peak_table.mz_histogram(DETECTION_MZ_BIN_SIZE)#cached, reused by the detection
+            stream.n_candidates = np.count_nonzero(scan_counts >= DETECTION_MIN_OCCURRENCES)
+    profiler.count("candidate_bins", sum(stream.n_candidates for stream in streams))
     
-    if verbose: 
-        print(" Oscillating m/z values found. Correcting...")
-           
-        #2.3 Call to the correcting function in corrector.py
-    xic_signals = {}
-    modulated_signals = {}#Dict[target_mz: float, modulated: np.ndarray]
-    residual_signals = {}#Dict[target_mz: float, residual: np.ndarray]
-            
-            
-            
-    start_time_corrector=time.time()
-            
-    print("<<< Correcting file. ") 
-    for target_mz in oscillating_mzs:
-                
-        xic, modulated_signal, residual_signal=correct_oscillations(rts, mz_array, intensity_array, phase_ref, local_freqs_ref, target_mz)
-                
-        xic_signals[target_mz] = xic
-        modulated_signals[target_mz] = modulated_signal
-        residual_signals[target_mz] = residual_signal
-                
-        if plot:
-            plot_original_and_corrected(rts, target_mz, xic, residual_signal)
-            
-        end_time_corrector=time.time()
-            
-        time_corrector=end_time_corrector-start_time_corrector
-        #[DEBUG] PROFILING 
-        #print(f" TIME corrector: {time_corrector}")
-            
-            
-            
-        # 3. Apply changes (corrections) to spectra
-        corrected_map, time_correct_spectra=correct_spectra(input_map, oscillating_mzs, rts, residual_signals)
-            
-        #[DEBUG] PROFILING 
-        #print(f" TIME correct_map: {time_correct_spectra}")
-            
-        #Computation of overall execution time
-        end_time=time.time()
-        time_elapsed=end_time-start_time
+    detection_params = {
+        "mz_bin_size": DETECTION_MZ_BIN_SIZE, "min_occurrences": DETECTION_MIN_OCCURRENCES, 
+        "power_threshold": power_threshold, "detector": detector
+    }
+    if load_filters:
+        detection_params["load_filters"] = load_filters
+    concurrent = jobs is not None and jobs > 1
+    with ExitStack() as executors:
+        for stream in streams:
+            stream.executor = executors.enter_context(_stream_executor(stream, jobs, len(streams)))
         
-        if verbose:
-            print(f" Correction done in {time_elapsed:.3f} seconds")
+        with _stage(profiler, progress, "detection"):
+            detection_progress = _StageProgress(progress, {stream.name: stream.n_candidates for stream in streams})
+            detected = _map_streams(
+                lambda stream: _detect_in_stream(
+                    stream, cache, run_key, detection_params, n_references, power_threshold, memory_budget_mb, detector, 
+                    detection_progress.stream(stream.name)
+                ),
+                streams, concurrent
+            )
+        for stream, computed in zip(streams, detected):
+            if computed:
+                profiler.count("xics_built", stream.n_candidates)
+                profiler.count("ffts", stream.n_candidates)#one spectrum per candidate XIC
+                if cache:
+                    cache.store_result(
+                        run_key, "detection", stream.detection_key, 
+                        binned_mzs=stream.binned_mzs, oscillating_mzs=np.asarray(stream.oscillating_mzs, dtype=float)
+                    )
         
-        print("<<< Correction done. ") 
-        print(f"Execution time: {time_elapsed:.3f}")
-            
-            
+        scored_streams = [stream for stream in streams if stream.scored is not None]
+        if scored_streams:
+            #2.1 (auto mode) Phase of the best scored candidates
+            with _stage(profiler, progress, "reference"):
+                for stream in scored_streams:
+                    candidates = stream.scored
+                    try:
+                        local_freqs_ref, phase_ref, selected = select_reference(stream.peak_table.rt, candidates["xics"], candidates["scores"])
+                    except ValueError:
+                        continue
+                    profiler.count("ffts", len(candidates["xics"]) * len(local_freqs_ref))#local windows of each candidate
+                    stream.reference = {"local_freqs_ref": local_freqs_ref, "phase_ref": phase_ref, "reference_mzs": candidates["mzs"][selected]}
+                    if cache:
+                        cache.store_result(run_key, "reference", stream.params(reference_params), **stream.reference)
             
-        # 4. Save changes in mzML file
-            
-        oms.MzMLFile().store(save_as, corrected_map)
+            streams = [stream for stream in streams if stream.reference is not None]
+            if not streams:
+                print(" No reference signal found. No oscillations detected")
+                with _stage(profiler, progress, "write"):
+                    _store_original(input_path, save_as, input_map, encoding)
+                return False
+            _set_reference_info(profiler, streams)
+            if verbose:
+                for stream in scored_streams:
+                    if stream.reference is not None:
+                        print(f" Reference m/z selected for {stream.name}: {', '.join(f'{mz:.3f}' for mz in stream.reference['reference_mzs'])}")
+        profiler.count("oscillating_mzs", sum(len(stream.oscillating_mzs) for stream in streams))
+        
+        streams = [stream for stream in streams if stream.oscillating_mzs]
+        if not streams:
+            print(" File with no oscillations detected. Returning original file.")
+            with _stage(profiler, progress, "write"):
+                _store_original(input_path, save_as, input_map, encoding)
+            print(f" Original file saved as: {save_as}")
+            return False
         
+        if verbose: 
+            print(" Oscillating m/z values found. Correcting...")
+               
+            #2.3 Call to the correcting function in corrector.py
+        print("<<< Correcting file. ") 
+        with _stage(profiler, progress, "correction"):
+            amplitude_priors = calibration.amplitude_priors if calibration is not None else None
+            correction_progress = _StageProgress(progress, {stream.name: len(stream.oscillating_mzs) for stream in streams})
+            _map_streams(
+                lambda stream: _correct_stream(stream, amplitude_model, amplitude_priors, correction_progress.stream(stream.name)),
+                streams, concurrent
+            )
+        profiler.count("xics_built", sum(len(stream.oscillating_mzs) for stream in streams))
+    
+    if plot:
+        for stream in streams:
+            for target_mz in stream.oscillating_mzs:
+                plot_original_and_corrected(stream.peak_table.rt, target_mz, stream.xic_signals[target_mz], stream.residual_signals[target_mz])
+            
+    # 3. Apply changes (corrections) to spectra and 4. save them in mzML file
+    #    (spectra are written in the background while the next ones are corrected;
+    #    spectra of the streams not corrected are passed through unchanged)
+    oscillating_mzs, residual_signals, scans = _merge_corrections(streams, peak_table.n_scans)
+    with _stage(profiler, progress, "write"):
+        if input_map is None:
+            correct_spectra_streaming(
+                input_path, save_as, oscillating_mzs, residual_signals, profiler=profiler, progress=progress, 
+                scans=scans, n_spectra=peak_table.n_scans, encoding=encoding, native_ids=native_ids
+            )
+        else:
+            corrected_spectra=iter_corrected_spectra(
+                input_map, oscillating_mzs, residual_signals, profiler=profiler, progress=progress, scans=scans, peak_table=peak_table
+            )
+            store_spectra(
+                save_as, corrected_spectra, n_spectra=input_map.getNrSpectra(), copy=False, encoding=encoding,
+                settings=input_map.getExperimentalSettings(), chromatograms=input_map.getChromatograms()
+            )
+    
+    if save_calibration:
+        #calibration of the first corrected stream; amplitude of a sinusoid from its standard deviation
+        stream = streams[0]
+        amplitude_priors = {target_mz: np.sqrt(2) * np.std(stream.modulated_signals[target_mz]) for target_mz in stream.oscillating_mzs}
+        PhaseCalibration.from_reference(
+            stream.peak_table.rt, stream.reference["local_freqs_ref"], stream.reference["reference_mzs"], amplitude_priors
+        ).save(save_calibration)
         if verbose:
-            print(f"Corrected file saved: {save_as}")
+            print(f" Calibration saved: {save_calibration}")
             
-        return True
-
+    return True
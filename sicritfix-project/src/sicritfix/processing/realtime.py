@@ -0,0 +1,459 @@
+# processing/realtime.py
+#!/usr/bin/env python
+
+"""
+This Python module corrects oscillatory artifacts while the spectra are being
+acquired, one spectrum at a time, without waiting for the end of the run.
+
+@contents  :  Online phase tracking and oscillation correction of a spectrum stream.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  realtime.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - numpy
+    - sicritfix.io.io
+    - sicritfix.utils.peak_table
+
+@classes :
+    - RealtimeCorrector
+    - RealtimeCorrectingConsumer
+
+@functions :
+    - correct_spectra_realtime
+    - correct_file_realtime
+
+@notes :
+    The offline pipeline (`sicritfix.processing.processor`) needs every scan
+    before it can fit the frequency of the reference m/z and integrate its
+    phase. Here the phase is tracked online instead:
+
+    - A local oscillator advances its phase by 2*pi*f*dt at each scan.
+    - Every m/z bin (and the reference XIC) is fitted as
+      ``c + a*sin(phase) + b*cos(phase)`` by exponentially weighted least
+      squares, whose memory is `window_size` scans. The normal equations are
+      shared by all bins, so each bin only keeps 6 running sums.
+    - The drift of the fitted phase of the reference, atan2(b, a), measures
+      the frequency error of the oscillator, which is corrected at each scan
+      (a phase-locked loop). The starting frequency is the FFT peak of the
+      first `window_size` scans of the reference.
+    - A bin is corrected when it is present in most of the window and its
+      fitted oscillation explains at least `power_threshold` of its variance;
+      ``a*sin(phase) + b*cos(phase)`` is subtracted from its peaks.
+
+    As in the offline pipeline, only MS1 scans are corrected, each polarity
+    with its own oscillator; the other scans are passed through unchanged.
+    Spectra are returned `latency` scans after they are pushed (the first
+    `window_size` ones once the oscillator is locked), so memory and delay
+    are bounded whatever the length of the run. Results are close to, but not
+    the same as, those of the offline pipeline.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+from collections import deque
+
+import numpy as np
+import pyopenms as oms
+
+from sicritfix.io.io import ForwardingConsumer, stream_file
+from sicritfix.utils.peak_table import spectrum_stream
+
+# Running sums are stored multiplied by a growing scale; rescaled beyond this
+_MAX_SCALE = 1e100
+
+
+class RealtimeCorrector:
+    """
+    Corrects the oscillations of a stream of spectra with bounded latency and memory.
+
+    Push the spectra in acquisition order with `push`, which returns the
+    corrected spectra that are ready, and call `flush` at the end of the run.
+
+    Only MS1 scans are tracked and corrected, with one oscillator per
+    polarity, as the offline pipeline splits the scans into streams (see
+    `sicritfix.utils.peak_table.spectrum_stream`). Other scans are passed
+    through unchanged; every spectrum is returned in acquisition order, so an
+    MSn scan is held until the MS1 scans pushed before it are returned.
+
+    Parameters
+    ----------
+    mz_ref : float, optional (default=922.098)
+        Reference m/z whose XIC drives the phase tracking.
+
+    window_size : int, optional (default=70)
+        Memory (in scans) of the running fits, and number of scans used to
+        lock the oscillator at the start of the run.
+
+    latency : int, optional (default=0)
+        Number of later scans included in the fit before a spectrum is
+        corrected and returned. Higher values give better amplitude
+        estimates at the cost of a longer delay.
+
+    power_threshold : float, optional (default=0.5)
+        Minimum fraction of the variance of an m/z bin explained by the
+        tracked oscillation for the bin to be corrected.
+
+    min_occupancy : float, optional (default=0.5)
+        Minimum fraction of the window in which a bin must be present to be
+        corrected.
+
+    mz_bin_size : float, optional (default=0.01)
+        Size of the m/z bins tracked and corrected.
+
+    mz_tol : float, optional (default=0.1)
+        Tolerance around `mz_ref` of the reference XIC.
+
+    loop_gain : float, optional (default=0.1)
+        Fraction of the measured frequency error corrected at each scan.
+
+    Attributes
+    ----------
+    trackers : dict
+        Oscillator of each polarity code seen in the MS1 scans (see `_PhaseTracker`).
+    """
+
+    def __init__(self, mz_ref=922.098, window_size=70, latency=0, power_threshold=0.5, min_occupancy=0.5, mz_bin_size=0.01, mz_tol=0.1, loop_gain=0.1):
+        if window_size < 4:
+            raise ValueError("window_size must be at least 4 scans")
+        if latency < 0:
+            raise ValueError("latency must be non-negative")
+        self.options = dict(
+            mz_ref=mz_ref, window_size=window_size, latency=latency, power_threshold=power_threshold,
+            min_occupancy=min_occupancy, mz_bin_size=mz_bin_size, mz_tol=mz_tol, loop_gain=loop_gain
+        )
+        self.trackers = {}
+        self._output = deque() # [spectrum, ready] of every pushed spectrum not returned yet
+        self._waiting = {} # polarity -> slots of _output held by its tracker, in order
+
+    @property
+    def locked(self):
+        """True once the oscillator of any polarity is locked."""
+        return any(tracker.locked for tracker in self.trackers.values())
+
+    @property
+    def frequency(self):
+        """Frequency (Hz) of the oscillator of the first polarity tracked, None before it is locked."""
+        tracker = next(iter(self.trackers.values()), None)
+
+        return tracker.frequency if tracker is not None else None
+
+    @property
+    def n_peaks_rewritten(self):
+        """Number of peaks corrected so far, over all the polarities."""
+        return sum(tracker.n_peaks_rewritten for tracker in self.trackers.values())
+
+    def push(self, spectrum):
+        """
+        Adds the next spectrum of the run.
+
+        Parameters
+        ----------
+        spectrum : oms.MSSpectrum
+            Next spectrum, with its peaks sorted by m/z.
+
+        Returns
+        -------
+        ready : list of oms.MSSpectrum
+            Spectra whose latency has elapsed, in acquisition order (possibly
+            empty). MS1 spectra are corrected, the others unchanged.
+        """
+        ms_level, polarity = spectrum_stream(spectrum)
+        slot = [spectrum, ms_level != 1]
+        self._output.append(slot)
+        if ms_level == 1:
+            if polarity not in self.trackers:
+                self.trackers[polarity] = _PhaseTracker(**self.options)
+                self._waiting[polarity] = deque()
+            self._waiting[polarity].append(slot)
+            self._fill(polarity, self.trackers[polarity].push(spectrum))
+
+        return self._pop_ready()
+
+    def flush(self):
+        """
+        Returns every spectrum still held, at the end of the run.
+
+        If the run was too short to lock the oscillator of a polarity, its
+        spectra are returned unchanged.
+        """
+        for polarity, tracker in self.trackers.items():
+            self._fill(polarity, tracker.flush())
+
+        return self._pop_ready()
+
+    def _fill(self, polarity, spectra):
+        """Stores the spectra returned by the tracker of `polarity` in their slots."""
+        waiting = self._waiting[polarity]
+        for spectrum in spectra:
+            slot = waiting.popleft()
+            slot[0], slot[1] = spectrum, True
+
+    def _pop_ready(self):
+        """Returns the leading spectra of the output that are ready."""
+        ready = []
+        while self._output and self._output[0][1]:
+            ready.append(self._output.popleft()[0])
+
+        return ready
+
+class _PhaseTracker:
+    """
+    Online phase tracking and correction of one scan stream (the MS1 scans of
+    one polarity), see the notes of the module. Takes the parameters of
+    `RealtimeCorrector`; `push` and `flush` return the spectra of the stream
+    that are ready, in order.
+    """
+
+    def __init__(self, mz_ref, window_size, latency, power_threshold, min_occupancy, mz_bin_size, mz_tol, loop_gain):
+        self.mz_ref = mz_ref
+        self.window_size = window_size
+        self.latency = latency
+        self.power_threshold = power_threshold
+        self.min_occupancy = min_occupancy
+        self.mz_bin_size = mz_bin_size
+        self.mz_tol = mz_tol
+        self.loop_gain = loop_gain
+        self.forgetting = 1 - 1 / window_size
+
+        self.locked = False
+        self.frequency = None # Hz
+        self.n_peaks_rewritten = 0
+        self._pending = deque() # (spectrum, rt, reference intensity, oscillator phase)
+        self._reset_fit()
+
+    def _reset_fit(self):
+        """Clears the oscillator and the running fits."""
+        self._phase = 0.0
+        self._last_rt = None
+        self._ref_phase = None
+        self._weight = 0.0 # sum of the weights of the scans
+        self._normal = np.zeros((3, 3)) # sum of w * h h^T, h = (sin, cos, 1)
+        self._ref_sums = np.zeros(3) # sum of w * h * y of the reference
+        # Sums of the bins, stored multiplied by self._scale (updated lazily)
+        self._scale = 1.0
+        self._bin_sums = np.zeros((0, 3)) # w * h * y
+        self._bin_moments = np.zeros((0, 3)) # w * (1, y, y^2)
+
+    def push(self, spectrum):
+        """Adds the next spectrum of the stream. Returns the corrected spectra that are ready."""
+        mzs, intensities = spectrum.get_peaks()
+        window = (mzs > self.mz_ref - self.mz_tol) & (mzs < self.mz_ref + self.mz_tol)
+        entry = [spectrum, spectrum.getRT(), float(np.sum(intensities[window])), None]
+        self._pending.append(entry)
+
+        if self.locked:
+            entry[3] = self._update(entry[1], entry[2], mzs, intensities)
+            return self._pop_ready(self.latency)
+
+        if len(self._pending) < self.window_size:
+            return []
+        return self._lock()
+
+    def flush(self):
+        """Returns every spectrum still held, unchanged if the oscillator could not be locked."""
+        ready = self._lock() if not self.locked and len(self._pending) >= 4 else []
+
+        return ready + self._pop_ready(0)
+
+    def _lock(self):
+        """
+        Estimates the starting frequency from the pending scans, replays them
+        through the fits and returns those that are ready. Without a reference
+        oscillation, the pending spectra are returned unchanged.
+        """
+        rts = np.array([entry[1] for entry in self._pending])
+        ref_xic = np.array([entry[2] for entry in self._pending])
+        dt = np.mean(np.diff(rts))
+        centered = ref_xic - np.mean(ref_xic)
+        if not np.any(centered) or not dt > 0:
+            ready = [entry[0] for entry in self._pending]
+            self._pending.clear()
+            return ready
+
+        # FFT peak of the zero-padded reference XIC
+        n_fft = 8 * len(centered)
+        power = np.abs(np.fft.rfft(centered, n_fft)) ** 2
+        self.frequency = (np.argmax(power[1:]) + 1) / (n_fft * dt)
+        self.locked = True
+        self._reset_fit()
+
+        for entry in self._pending:
+            mzs, intensities = entry[0].get_peaks()
+            entry[3] = self._update(entry[1], entry[2], mzs, intensities)
+
+        return self._pop_ready(self.latency)
+
+    def _update(self, rt, ref_intensity, mzs, intensities):
+        """Advances the oscillator to `rt` and adds a scan to the fits. Returns its phase."""
+        dt = rt - self._last_rt if self._last_rt is not None else 0.0
+        self._last_rt = rt
+        self._phase = (self._phase + 2 * np.pi * self.frequency * dt) % (2 * np.pi)
+        h = np.array([np.sin(self._phase), np.cos(self._phase), 1.0])
+
+        lam = self.forgetting
+        self._weight = lam * self._weight + 1
+        self._normal = lam * self._normal + np.outer(h, h)
+        self._ref_sums = lam * self._ref_sums + h * ref_intensity
+
+        # Bins: the decay of every sum is applied by growing the scale instead
+        self._scale /= lam
+        if self._scale > _MAX_SCALE:
+            self._bin_sums /= self._scale
+            self._bin_moments /= self._scale
+            self._scale = 1.0
+        if len(mzs):
+            bins, _, values = self._bin_peaks(mzs, intensities)
+            self._grow(bins[-1] + 1)
+            self._bin_sums[bins] += self._scale * values[:, None] * h
+            self._bin_moments[bins] += self._scale * np.column_stack((np.ones_like(values), values, values ** 2))
+
+        # Phase-locked loop: the drift of the reference phase is a frequency error
+        if self._weight >= 4 and dt > 0:
+            a, b, _ = np.linalg.solve(self._normal, self._ref_sums)
+            ref_phase = np.arctan2(b, a)
+            if self._ref_phase is not None:
+                drift = (ref_phase - self._ref_phase + np.pi) % (2 * np.pi) - np.pi
+                self.frequency += self.loop_gain * drift / (2 * np.pi * dt)
+            self._ref_phase = ref_phase
+
+        return self._phase
+
+    def _bin_peaks(self, mzs, intensities):
+        """Returns the sorted bins of a spectrum, the bin of each peak and the summed intensity of each bin."""
+        bins, inverse = np.unique(np.rint(np.asarray(mzs) / self.mz_bin_size).astype(np.int64), return_inverse=True)
+
+        return bins, inverse, np.bincount(inverse, weights=intensities, minlength=len(bins))
+
+    def _grow(self, n_bins):
+        """Extends the running sums of the bins to at least `n_bins`."""
+        if n_bins <= len(self._bin_sums):
+            return
+        n_bins = max(n_bins, int(len(self._bin_sums) * 1.25))
+        self._bin_sums = np.vstack((self._bin_sums, np.zeros((n_bins - len(self._bin_sums), 3))))
+        self._bin_moments = np.vstack((self._bin_moments, np.zeros((n_bins - len(self._bin_moments), 3))))
+
+    def _pop_ready(self, latency):
+        """Corrects and returns the pending spectra older than `latency` scans."""
+        ready = []
+        while len(self._pending) > latency:
+            spectrum, _, _, phase = self._pending.popleft()
+            ready.append(self._correct(spectrum, phase) if self.locked else spectrum)
+
+        return ready
+
+    def _correct(self, spectrum, phase):
+        """Subtracts the current fit of each oscillating bin from the peaks of a spectrum."""
+        mzs, intensities = spectrum.get_peaks()
+        if len(mzs) == 0:
+            return spectrum
+        bins, inverse, totals = self._bin_peaks(mzs, intensities)
+
+        # Fit of each bin: (a, b, c) from the shared normal equations
+        sums = self._bin_sums[bins] / self._scale
+        moments = self._bin_moments[bins] / (self._scale * self._weight)
+        coefs = np.linalg.solve(self._normal, sums.T).T
+        variance = moments[:, 2] - moments[:, 1] ** 2
+        oscillation_power = (coefs[:, 0] ** 2 + coefs[:, 1] ** 2) / 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            oscillating = (
+                (moments[:, 0] >= self.min_occupancy)
+                & (variance > 0)
+                & (oscillation_power >= self.power_threshold * variance)
+            )
+        if not np.any(oscillating):
+            return spectrum
+
+        # Oscillation of each bin, shared between its peaks by intensity
+        modulated = np.where(oscillating, coefs[:, 0] * np.sin(phase) + coefs[:, 1] * np.cos(phase), 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(totals[inverse] != 0, intensities / totals[inverse], 0.0)
+        corrected = intensities - modulated[inverse] * share
+        spectrum.set_peaks((mzs, corrected.astype(intensities.dtype)))
+        self.n_peaks_rewritten += int(np.count_nonzero(oscillating[inverse]))
+
+        return spectrum
+
+class RealtimeCorrectingConsumer(ForwardingConsumer):
+    """
+    Streaming consumer correcting the spectra with a `RealtimeCorrector` before
+    forwarding them. Spectra are forwarded as soon as the corrector returns them.
+    """
+
+    def __init__(self, consumer, corrector):
+        super().__init__(consumer)
+        self.corrector = corrector
+
+    def consumeSpectrum(self, spectrum):
+        for ready in self.corrector.push(oms.MSSpectrum(spectrum)):
+            self.consumer.consumeSpectrum(ready)
+
+    def flush(self):
+        for ready in self.corrector.flush():
+            self.consumer.consumeSpectrum(ready)
+
+def correct_spectra_realtime(spectra, **options):
+    """
+    Corrects an iterable of spectra (e.g. from a live acquisition) on the fly.
+
+    Parameters
+    ----------
+    spectra : iterable of oms.MSSpectrum
+        Spectra in acquisition order.
+
+    **options
+        Parameters of `RealtimeCorrector`.
+
+    Yields
+    ------
+    spectrum : oms.MSSpectrum
+        Corrected spectra, in order, at most ``max(window_size, latency)``
+        scans after they were read.
+    """
+    corrector = RealtimeCorrector(**options)
+    for spectrum in spectra:
+        yield from corrector.push(spectrum)
+    yield from corrector.flush()
+
+def correct_file_realtime(file_path, save_as, encoding=None, **options):
+    """
+    Corrects a file with the real-time corrector, in a single streaming pass.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the input MS data file (.mzML or .mzXML).
+
+    save_as : str
+        Path where the corrected mzML file will be saved.
+
+    encoding : dict, optional
+        Binary encoding of the written file (see `sicritfix.io.io.peak_file_options`).
+
+    **options
+        Parameters of `RealtimeCorrector`.
+
+    Returns
+    -------
+    corrector : RealtimeCorrector
+        The corrector, with its final state (`locked`, `frequency`,
+        `n_peaks_rewritten`).
+    """
+    corrector = RealtimeCorrector(**options)
+    stream_file(file_path, save_as, consumer_factory=lambda writer: RealtimeCorrectingConsumer(writer, corrector), encoding=encoding)
+
+    return corrector
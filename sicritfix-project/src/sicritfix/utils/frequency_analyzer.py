@@ -21,12 +21,21 @@ oscillatory behavior in chromatographic signals from mass spectrometry data.
     - scipy.fftpack
     - scipy.integrate
     - sicritfix.utils.intensity_analyzer
+    - sicritfix.utils.peak_table
 
 @functions :
     - calculate_freq
     - local_frequencies_with_fft
+    - local_window_times
+    - fit_frequency_polynomial
+    - phase_from_frequency_polynomial
     - apply_polynomial_regression
+    - reference_from_xics
     - obtain_freq_from_signal
+    - screen_oscillations
+    - select_reference
+    - reference_band
+    - screen_oscillations_in_band
 
 @notes :
     Phase and frequency estimation is central to the SICRITfix correction algorithm,
@@ -38,9 +47,11 @@ oscillatory behavior in chromatographic signals from mass spectrometry data.
 
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy.fftpack import fft
 from scipy.integrate import cumulative_trapezoid
 from sicritfix.utils.intensity_analyzer import build_xic
+from sicritfix.utils.peak_table import as_peak_table
 
 def calculate_freq(xic, sampling_interval=1.0):
     """
@@ -94,7 +105,8 @@ def local_frequencies_with_fft(xic, rts, window_size, sampling_interval):
     Parameters
     ----------
     xic : np.ndarray
-        The intensity signal (e.g., extracted ion chromatogram over time).
+        The intensity signal (e.g., extracted ion chromatogram over time), or a 
+        stack of signals of shape (n_signals, n_scans) sharing the same `rts`.
 
     rts : np.ndarray
         Array of retention times corresponding to each point in the XIC.
@@ -111,23 +123,109 @@ def local_frequencies_with_fft(xic, rts, window_size, sampling_interval):
         Array of mean retention times for each analyzed window.
 
     freqs : np.ndarray
-        Array of dominant frequencies (in Hz) estimated for each window.
+        Array of dominant frequencies (in Hz) estimated for each window, of 
+        shape (n_signals, n_windows) for a stack of signals.
+
+    Notes
+    -----
+    Windows start every ``window_size // 2`` points. All of them are built at 
+    once as strided views and transformed with one batched FFT, which gives the 
+    same result as applying `calculate_freq` to each window.
     """
+    xic = np.asarray(xic, dtype=float)
+    rts = np.asarray(rts, dtype=float)
+    n_points = xic.shape[-1]
+    step = window_size // 2
+    if step <= 0:
+        raise ValueError("window_size must be at least 2")
+    
+    if n_points <= window_size:
+        return np.array([]), np.zeros(xic.shape[:-1] + (0,))
+
+    window_starts = slice(0, n_points - window_size, step)
+    segments = sliding_window_view(xic, window_size, axis=-1)[..., window_starts, :]
     
-    freqs = []
-    times = []
+    centered_segments = segments - segments.mean(axis=-1, keepdims=True)
+    fft_magnitude = np.abs(np.fft.rfft(centered_segments, axis=-1))
+    
+    # Positive frequencies below Nyquist, as selected by calculate_freq
+    n_positive = (window_size - 1) // 2
+    fft_freqs = np.fft.rfftfreq(window_size, d=sampling_interval)[1:n_positive + 1]
+    freqs = fft_freqs[np.argmax(fft_magnitude[..., 1:n_positive + 1], axis=-1)]
+    times = local_window_times(rts, window_size)
+
+    return times, freqs
+
+def local_window_times(rts, window_size):
+    """
+    Returns the mean retention time of each window of `local_frequencies_with_fft`.
+    """
+    rts = np.asarray(rts, dtype=float)
     step = window_size // 2
+    if step <= 0:
+        raise ValueError("window_size must be at least 2")
+    if len(rts) <= window_size:
+        return np.array([])
+    
+    window_starts = slice(0, len(rts) - window_size, step)
+    
+    return sliding_window_view(rts, window_size)[window_starts].mean(axis=-1)
 
-    for i in range(0, len(xic) - window_size, step):
-        segment = xic[i:i+window_size]
-        rt_segment = rts[i:i+window_size]
-        
-        _, _, dom_freq = calculate_freq(segment, sampling_interval)
-        
-        freqs.append(dom_freq)
-        times.append(np.mean(rt_segment))
+def fit_frequency_polynomial(rts, rt_freqs, local_freqs, freq_deg=2):
+    """
+    Fits the polynomial frequency profile of `apply_polynomial_regression`.
+
+    Parameters
+    ----------
+    rts : array-like
+        Full array of retention times (in seconds).
+
+    rt_freqs : array-like
+        Retention times corresponding to the original local frequency estimates.
+
+    local_freqs : array-like
+        Estimated local dominant frequencies (in Hz) at `rt_freqs`.
+
+    freq_deg : int, optional (default=2)
+        Degree of the polynomial used to smooth the frequency data.
+
+    Returns
+    -------
+    coefficients : np.ndarray
+        Polynomial coefficients, highest power first (see `np.polyfit`), of the 
+        frequency against the time elapsed since the first scan, to be 
+        evaluated with `phase_from_frequency_polynomial`.
+    """
+    rts = np.array(rts)
+    freq_interp = np.interp(rts, rt_freqs, local_freqs)
+    
+    return np.polyfit(rts - rts[0], freq_interp, freq_deg)
+
+def phase_from_frequency_polynomial(rts, coefficients):
+    """
+    Integrates a polynomial frequency profile into the accumulated phase.
+
+    The polynomial is evaluated at the time elapsed since the first scan, as 
+    in `apply_polynomial_regression`.
+
+    Parameters
+    ----------
+    rts : array-like
+        Full array of retention times (in seconds).
 
-    return np.array(times), np.array(freqs)
+    coefficients : array-like
+        Polynomial coefficients (see `fit_frequency_polynomial`).
+
+    Returns
+    -------
+    phase : np.ndarray
+        Accumulated phase (in radians) at each retention time.
+    """
+    rts = np.array(rts)
+    t = (rts - rts[0])
+    f_t = np.poly1d(coefficients)(t)
+    
+    return 2 * np.pi * cumulative_trapezoid(f_t, t, initial=0)
 
 def apply_polynomial_regression(rts, rt_freqs, local_freqs, freq_deg=2):
     
@@ -158,20 +256,12 @@ def apply_polynomial_regression(rts, rt_freqs, local_freqs, freq_deg=2):
         Accumulated phase (in radians) computed by integrating the smoothed frequency
         over time.
     """
-    rts = np.array(rts)
-    t = (rts - rts[0])
-    
-    freq_interp = np.interp(rts, rt_freqs, local_freqs)
-    fit=np.polyfit(rts, freq_interp, freq_deg)
-    freq_poly = np.poly1d(fit)
-    f_t = freq_poly(t)
-
-
-    phase = 2 * np.pi * cumulative_trapezoid(f_t, t, initial=0)
+    fit = fit_frequency_polynomial(rts, rt_freqs, local_freqs, freq_deg)
+    phase = phase_from_frequency_polynomial(rts, fit)
     
     return phase 
 
-def obtain_freq_from_signal(rt_array, mz_array, intensity_array, window_size=70, mz_ref=922.098):
+def obtain_freq_from_signal(rt_array, mz_array=None, intensity_array=None, window_size=70, mz_ref=922.098):
     """
     Estimates the local frequency and phase of oscillations from a given reference m/z signal.
 
@@ -181,14 +271,15 @@ def obtain_freq_from_signal(rt_array, mz_array, intensity_array, window_size=70,
 
     Parameters
     ----------
-    rt_array : np.ndarray
-        Retention time values for each scan.
+    rt_array : np.ndarray or PeakTable
+        Retention time values for each scan, or the peak table of the run.
 
-    mz_array : np.ndarray
-        Array of m/z values for each scan.
+    mz_array : np.ndarray, optional
+        Array of m/z values for each scan. Not needed with a PeakTable.
 
-    intensity_array : np.ndarray
-        Intensity values corresponding to each m/z and retention time.
+    intensity_array : np.ndarray, optional
+        Intensity values corresponding to each m/z and retention time. Not 
+        needed with a PeakTable.
 
     window_size : int, optional (default=70)
         Size of the sliding window (in scans) used for local frequency estimation.
@@ -203,10 +294,306 @@ def obtain_freq_from_signal(rt_array, mz_array, intensity_array, window_size=70,
 
     phase_ref : np.ndarray
         Smoothed phase (in radians) derived from polynomial regression on frequency data.
+
+    Raises
+    ------
+    ValueError
+        If there is no signal at `mz_ref`, or too few scans for one window.
+    """
+    peak_table = as_peak_table(mz_array, intensity_array, rt_array)
+    
+    xic=build_xic(peak_table, target_mz=mz_ref)
+    if not np.any(xic):
+        raise ValueError(f"No signal at the reference m/z {mz_ref}")
+
+    return reference_from_xics(peak_table.rt, xic, window_size)
+
+def reference_from_xics(rts, xics, window_size=70, weights=None):
     """
-    xic=build_xic(mz_array, intensity_array, rt_array, target_mz=mz_ref)
-    sampling_interval = np.mean(np.diff(rt_array))
-    rt_freqs, local_freqs_ref = local_frequencies_with_fft(xic, rt_array, window_size, sampling_interval)
-    phase_ref=apply_polynomial_regression(rt_array, rt_freqs, local_freqs_ref)
+    Estimates the local frequency and phase of the oscillation from one or several reference XICs.
+
+    The local frequencies of the XICs (see `local_frequencies_with_fft`) are 
+    averaged, and smoothed and integrated into a phase with 
+    `apply_polynomial_regression`.
+
+    Parameters
+    ----------
+    rts : np.ndarray
+        Retention times (in seconds) of the scans.
+
+    xics : np.ndarray
+        Reference XIC, or stack of reference XICs of shape (n_references, n_scans).
+
+    window_size : int, optional (default=70)
+        Size of the sliding window (in scans) used for local frequency estimation.
+
+    weights : np.ndarray, optional
+        Weight of each XIC in the average of the local frequencies. Equal by default.
+
+    Returns
+    -------
+    local_freqs_ref : np.ndarray
+        Estimated local frequencies (in Hz) along the retention time.
+
+    phase_ref : np.ndarray
+        Smoothed phase (in radians) derived from polynomial regression on frequency data.
+
+    Raises
+    ------
+    ValueError
+        If there are too few scans for one window.
+    """
+    rts = np.asarray(rts, dtype=float)
+    xics = np.atleast_2d(xics)
+    sampling_interval = np.mean(np.diff(rts))
+    rt_freqs, local_freqs = local_frequencies_with_fft(xics, rts, window_size, sampling_interval)
+    if len(rt_freqs) == 0:
+        raise ValueError(f"At least {window_size + 1} scans are needed to estimate the reference frequency")
+    
+    local_freqs_ref = np.average(local_freqs, axis=0, weights=weights)
+    phase_ref=apply_polynomial_regression(rts, rt_freqs, local_freqs_ref)
+
+    return local_freqs_ref, phase_ref
+
+def screen_oscillations(xics, power_threshold=0.15, min_signal=1e-5, return_scores=False, min_periods=10, tolerance=0.1):
+    """
+    Flags which XICs of a stack exhibit oscillatory behavior using one batched FFT.
+
+    Each row is mean-centered and transformed with ``np.fft.rfft`` along axis 1. 
+    A row is flagged as oscillating if any non-DC bin of its normalized power 
+    spectrum exceeds `power_threshold`, exactly as done per XIC in 
+    `detect_oscillating_mzs`, but for the whole stack at once.
+
+    With `return_scores`, each XIC is also scored as a reference signal for 
+    the phase, from the same spectra: the strength of its oscillation (fraction 
+    of its power within `tolerance` of its dominant frequency, which must be at 
+    least `min_periods` cycles over the run, so that slow chromatographic 
+    peaks do not score) times its coverage (fraction of scans with signal). 
+    A strong, regular oscillation present all along the run scores close to 1.
+
+    Parameters
+    ----------
+    xics : np.ndarray
+        2D array of shape (n_xics, n_scans), one XIC per row.
+
+    power_threshold : float, optional (default=0.15)
+        Threshold on the normalized FFT power (excluding DC component).
+
+    min_signal : float, optional (default=1e-5)
+        XICs whose summed intensity is below this value are considered too 
+        weak and never flagged.
+
+    return_scores : bool, optional (default=False)
+        Also return the reference scores of the XICs.
+
+    min_periods : int, optional (default=10)
+        Lowest dominant frequency of a reference, in cycles over the run.
+
+    tolerance : float, optional (default=0.1)
+        Relative half-width of the band around the dominant frequency.
+
+    Returns
+    -------
+    oscillating : np.ndarray
+        Boolean array of length n_xics, True for the oscillating XICs.
+
+    scores : np.ndarray
+        Reference scores in [0, 1] of the XICs, only with `return_scores`.
+    """
+    xics = np.atleast_2d(xics)
+    oscillating = np.zeros(len(xics), dtype=bool)
+    scores = np.zeros(len(xics))
+    
+    strong = np.sum(xics, axis=1) >= min_signal
+    if not np.any(strong):
+        return (oscillating, scores) if return_scores else oscillating
+    
+    centered = xics[strong] - np.mean(xics[strong], axis=1, keepdims=True)
+    power_spectra = np.abs(np.fft.rfft(centered, axis=1)) ** 2
+    total_power = np.sum(power_spectra, axis=1, keepdims=True)
+    
+    # Flat XICs have no power at all and can not be oscillating
+    with np.errstate(invalid="ignore", divide="ignore"):
+        norm_power = power_spectra / total_power
+    oscillating[strong] = np.any(norm_power[:, 1:] > power_threshold, axis=1)
+    if not return_scores:
+        return oscillating
+    
+    if norm_power.shape[1] > min_periods:
+        n_bins = norm_power.shape[1]
+        dominant = min_periods + np.argmax(norm_power[:, min_periods:], axis=1)
+        half_width = np.maximum(1, np.floor(tolerance * dominant)).astype(int)
+        low = np.maximum(dominant - half_width, 1)
+        high = np.minimum(dominant + half_width, n_bins - 1)
+        # Power of the bins low..high of each row from its running sum
+        cumulative = np.cumsum(norm_power, axis=1)
+        rows = np.arange(len(norm_power))
+        strength = np.nan_to_num(cumulative[rows, high] - cumulative[rows, low - 1])
+        coverage = np.mean(xics[strong] > 0, axis=1)
+        scores[strong] = strength * coverage
+    
+    return oscillating, scores
+
+def select_reference(rts, xics, scores, window_size=70, tolerance=0.1):
+    """
+    Builds the reference phase from the best scored XICs (see `screen_oscillations`).
+
+    The XICs whose median local frequency is within `tolerance` of that of 
+    the best one are averaged, weighted by their score, so that an ensemble of 
+    references oscillating with the same artifact is more robust than a 
+    single one, and an unrelated oscillation is left out.
+
+    Parameters
+    ----------
+    rts : np.ndarray
+        Retention times (in seconds) of the scans.
+
+    xics : np.ndarray
+        Stack of candidate reference XICs, of shape (n_candidates, n_scans).
+
+    scores : np.ndarray
+        Reference score of each XIC. XICs scoring 0 are never selected.
+
+    window_size : int, optional (default=70)
+        Size of the sliding window (in scans) used for local frequency estimation.
+
+    tolerance : float, optional (default=0.1)
+        Relative tolerance on the median local frequency.
+
+    Returns
+    -------
+    local_freqs_ref : np.ndarray
+        Estimated local frequencies (in Hz) along the retention time.
+
+    phase_ref : np.ndarray
+        Smoothed phase (in radians) of the reference.
+
+    selected : np.ndarray
+        Indices of the XICs used, best first.
+
+    Raises
+    ------
+    ValueError
+        If no XIC has a positive score, or there are too few scans for one window.
+    """
+    xics = np.atleast_2d(xics)
+    scores = np.asarray(scores, dtype=float)
+    order = np.argsort(-scores, kind="stable")
+    order = order[scores[order] > 0]
+    if len(order) == 0:
+        raise ValueError("No candidate reference signal")
+    
+    rts = np.asarray(rts, dtype=float)
+    _, local_freqs = local_frequencies_with_fft(xics[order], rts, window_size, np.mean(np.diff(rts)))
+    if local_freqs.shape[1] == 0:
+        raise ValueError(f"At least {window_size + 1} scans are needed to estimate the reference frequency")
+    median_freqs = np.median(local_freqs, axis=1)
+    selected = order[np.abs(median_freqs - median_freqs[0]) <= tolerance * median_freqs[0]]
+    
+    local_freqs_ref, phase_ref = reference_from_xics(rts, xics[selected], window_size, weights=scores[selected])
+    
+    return local_freqs_ref, phase_ref, selected
+
+def reference_band(local_freqs_ref, tolerance=0.1):
+    """
+    Returns the frequency band spanned by the reference oscillation.
+
+    Parameters
+    ----------
+    local_freqs_ref : np.ndarray
+        Local frequencies (in Hz) of the reference signal (see `obtain_freq_from_signal`).
+
+    tolerance : float, optional (default=0.1)
+        Relative widening of the band on each side.
+
+    Returns
+    -------
+    freq_band : tuple of float
+        Lowest and highest frequency (in Hz) of the band.
+
+    Raises
+    ------
+    ValueError
+        If there is no positive reference frequency.
+    """
+    local_freqs_ref = np.asarray(local_freqs_ref, dtype=float)
+    positive_freqs = local_freqs_ref[local_freqs_ref > 0]
+    if len(positive_freqs) == 0:
+        raise ValueError("No positive reference frequency to build the band from")
+    
+    return positive_freqs.min() * (1 - tolerance), positive_freqs.max() * (1 + tolerance)
+
+def screen_oscillations_in_band(xics, sampling_interval, freq_band, power_threshold=0.15, min_signal=1e-5):
+    """
+    Flags which XICs of a stack oscillate within a frequency band.
+
+    Same criterion as `screen_oscillations`, but only the FFT bins inside 
+    `freq_band` may exceed `power_threshold`. When the band holds at most 
+    log2(n_scans) bins, they are evaluated directly (as the Goertzel algorithm 
+    does) for the whole stack with one matrix product and the total power comes 
+    from Parseval's theorem, so each XIC costs O(n_scans) per bin instead of a 
+    full FFT. Wider bands are taken from a batched FFT. Slow chromatographic 
+    peaks, whose power lies at low frequencies, are no longer flagged when the 
+    band is that of the reference oscillation.
+
+    Parameters
+    ----------
+    xics : np.ndarray
+        2D array of shape (n_xics, n_scans), one XIC per row.
+
+    sampling_interval : float
+        Time between consecutive scans (in seconds).
+
+    freq_band : tuple of float
+        Lowest and highest frequency (in Hz) of the band (see `reference_band`). 
+        The FFT bin closest to the band is used if none falls inside.
+
+    power_threshold : float, optional (default=0.15)
+        Threshold on the normalized FFT power of the bins of the band.
+
+    min_signal : float, optional (default=1e-5)
+        XICs whose summed intensity is below this value are considered too 
+        weak and never flagged.
+
+    Returns
+    -------
+    oscillating : np.ndarray
+        Boolean array of length n_xics, True for the oscillating XICs.
+    """
+    xics = np.atleast_2d(xics)
+    n_scans = xics.shape[1]
+    oscillating = np.zeros(len(xics), dtype=bool)
+    
+    strong = np.sum(xics, axis=1) >= min_signal
+    if not np.any(strong) or n_scans < 2:
+        return oscillating
+    
+    # FFT bins (excluding DC) inside the band
+    low_bin, high_bin = np.asarray(freq_band, dtype=float) * n_scans * sampling_interval
+    low_bin = int(np.clip(np.ceil(low_bin), 1, n_scans // 2))
+    high_bin = int(np.clip(np.floor(high_bin), low_bin, n_scans // 2))
+    band_bins = np.arange(low_bin, high_bin + 1)
+    
+    centered = xics[strong] - np.mean(xics[strong], axis=1, keepdims=True)
+    if len(band_bins) <= np.log2(n_scans):
+        basis = np.exp(-2j * np.pi * np.outer(np.arange(n_scans), band_bins) / n_scans)
+        band_power = np.abs(centered @ basis) ** 2
+    else:
+        # Wide band: one FFT is cheaper than evaluating each bin
+        band_power = np.abs(np.fft.rfft(centered, axis=1)[:, band_bins]) ** 2
+    
+    # Power of all the rfft bins: half the power of the full spectrum, plus half
+    # the Nyquist bin, which appears once in both
+    total_power = n_scans * np.sum(centered ** 2, axis=1)
+    if n_scans % 2 == 0:
+        nyquist = np.sum(centered[:, ::2], axis=1) - np.sum(centered[:, 1::2], axis=1)
+        total_power += nyquist ** 2
+    total_power /= 2
+    
+    # Flat XICs have no power at all and can not be oscillating
+    with np.errstate(invalid="ignore", divide="ignore"):
+        norm_power = band_power / total_power[:, np.newaxis]
+    oscillating[strong] = np.any(norm_power > power_threshold, axis=1)
+    
+    return oscillating
 
-    return local_freqs_ref, phase_ref
\ No newline at end of file
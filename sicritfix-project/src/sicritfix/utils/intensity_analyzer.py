@@ -20,10 +20,14 @@ specifically for building XICs and estimating local oscillation amplitudes.
 
 @dependencies :
     - numpy
+    - sicritfix.utils.peak_table
 
 @functions :
     - build_xic
+    - build_xics
     - get_amplitude
+    - amplitude_windows
+    - get_amplitudes
 
 @notes :
     These functions are used to support frequency analysis and correction modeling
@@ -40,8 +44,9 @@ __copyright__ = "GPL License version 3"
 
 
 import numpy as np
+from sicritfix.utils.peak_table import as_peak_table
 
-def build_xic(mz_array, intensity_array, rt_array, target_mz, mz_tol=0.1):
+def build_xic(mz_array, intensity_array=None, rt_array=None, target_mz=None, mz_tol=0.1):
     """
     Builds an Extracted Ion Chromatogram (XIC) for a target m/z value.
 
@@ -52,15 +57,17 @@ def build_xic(mz_array, intensity_array, rt_array, target_mz, mz_tol=0.1):
 
     Parameters
     ----------
-    mz_array : list of np.ndarray
-        List containing arrays of m/z values for each scan (typically from MS1).
+    mz_array : PeakTable or list of np.ndarray
+        Peak table of the run, or list containing arrays of m/z values for 
+        each scan (typically from MS1).
 
-    intensity_array : list of np.ndarray
+    intensity_array : list of np.ndarray, optional
         List containing arrays of intensity values corresponding to each m/z 
-        array in `mz_array`.
+        array in `mz_array`. Not needed when `mz_array` is a PeakTable.
 
-    rt_array : np.ndarray
-        Array of retention times corresponding to each scan.
+    rt_array : np.ndarray, optional
+        Array of retention times corresponding to each scan. Not needed when 
+        `mz_array` is a PeakTable.
 
     target_mz : float
         The m/z value of interest to extract the chromatogram for.
@@ -75,15 +82,49 @@ def build_xic(mz_array, intensity_array, rt_array, target_mz, mz_tol=0.1):
         1D array of summed intensities at each retention time for the 
         specified m/z window.
     """
-    xic = []
-    for mzs, intensities in zip(mz_array, intensity_array):
-        is_in_tol = np.abs(mzs - target_mz) < mz_tol
-        if np.any(is_in_tol):
-            xic.append(np.sum(intensities[is_in_tol]))
-        else:
-            xic.append(0.0)
+    peak_table = as_peak_table(mz_array, intensity_array, rt_array)
+    xic = peak_table.xic(target_mz, mz_tol)
             
-    return np.array(xic)
+    return xic
+
+def build_xics(mz_array, intensity_array=None, rt_array=None, target_mzs=None, mz_tol=0.1):
+    """
+    Builds the Extracted Ion Chromatograms (XICs) of several target m/z values 
+    at once.
+
+    All the targets are extracted in a single sweep over the scans, which is much 
+    cheaper than calling `build_xic` once per target when there are many of them.
+
+    Parameters
+    ----------
+    mz_array : PeakTable or list of np.ndarray
+        Peak table of the run, or list containing arrays of m/z values for 
+        each scan.
+
+    intensity_array : list of np.ndarray, optional
+        List containing arrays of intensity values corresponding to each m/z 
+        array in `mz_array`. Not needed when `mz_array` is a PeakTable.
+
+    rt_array : np.ndarray, optional
+        Array of retention times corresponding to each scan. Not needed when 
+        `mz_array` is a PeakTable.
+
+    target_mzs : array-like of float
+        The m/z values of interest.
+
+    mz_tol : float, optional (default=0.1)
+        Tolerance window around each target m/z.
+
+    Returns
+    -------
+    xics : np.ndarray
+        2D array of shape (n_targets, n_scans); row ``k`` is the XIC of 
+        ``target_mzs[k]``, identical to ``build_xic(..., target_mzs[k])``.
+    """
+    peak_table = as_peak_table(mz_array, intensity_array, rt_array)
+    xics = peak_table.xics(target_mzs, mz_tol)
+    
+    return xics
 
 def get_amplitude(target_mz, xic, rt_array, local_freqs, sampling_interval):
     
@@ -116,26 +157,102 @@ def get_amplitude(target_mz, xic, rt_array, local_freqs, sampling_interval):
         of the local amplitude estimates across all valid local frequencies.
     """
     
-    local_amplitudes=[]
+    amplitude = get_amplitudes(np.asarray(xic)[np.newaxis], local_freqs, sampling_interval)[0]
+    
+    return amplitude
+
+def amplitude_windows(n_scans, local_freqs, sampling_interval):
+    """
+    Computes the bounds of the windows used to estimate local amplitudes.
+
+    There is one window per positive local frequency, one period long and 
+    centered on the scan matching the position of that frequency. The windows 
+    only depend on the reference frequencies, so they are shared by every XIC.
+
+    Parameters
+    ----------
+    n_scans : int
+        Number of scans of the XICs.
     
+    local_freqs : np.ndarray
+        Array of local frequency estimates (in Hz) across the signal.
     
-    for i, freq in enumerate (local_freqs):
-        
-        if freq<=0:
+    sampling_interval : float
+        Time interval between samples in the XIC (in seconds).
+
+    Returns
+    -------
+    starts : np.ndarray
+        First scan of each window.
+
+    ends : np.ndarray
+        Scan after the last one of each window.
+    """
+    local_freqs = np.asarray(local_freqs, dtype=float)
+    valid = np.flatnonzero(local_freqs > 0)
+    if len(valid) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    
+    periods = (1 / (local_freqs[valid] * sampling_interval)).astype(np.intp)
+    centers = valid * int(n_scans / len(local_freqs))
+    starts = np.maximum(0, centers - periods / 2).astype(np.intp)
+    ends = np.minimum(n_scans, centers + periods / 2).astype(np.intp)
+    
+    return starts, ends
+
+def get_amplitudes(xics, local_freqs, sampling_interval, windows=None, max_block_size=1 << 24):
+    """
+    Estimates the oscillation amplitude of every XIC of a stack at once.
+
+    Same estimate as `get_amplitude`: half the interquartile range of each local 
+    window, and the 75th percentile of those local amplitudes. The windows of 
+    equal length are gathered into one array and their quartiles are computed 
+    in a single call for all XICs.
+
+    Parameters
+    ----------
+    xics : np.ndarray
+        2D array of shape (n_xics, n_scans), one XIC per row.
+    
+    local_freqs : np.ndarray
+        Array of local frequency estimates (in Hz) across the signal.
+    
+    sampling_interval : float
+        Time interval between samples in the XIC (in seconds).
+
+    windows : tuple of np.ndarray, optional
+        Precomputed output of `amplitude_windows`.
+
+    max_block_size : int, optional (default=2**24)
+        Maximum number of gathered samples processed at a time, which bounds 
+        the temporary memory used.
+
+    Returns
+    -------
+    amplitudes : np.ndarray
+        Estimated amplitude of each XIC.
+    """
+    xics = np.atleast_2d(np.asarray(xics, dtype=float))
+    n_xics, n_scans = xics.shape
+    starts, ends = windows if windows is not None else amplitude_windows(n_scans, local_freqs, sampling_interval)
+    if len(starts) == 0:
+        return np.full(n_xics, np.nan)
+    
+    local_amplitudes = np.empty((n_xics, len(starts)))
+    lengths = ends - starts
+    for length in np.unique(lengths):
+        selected = np.flatnonzero(lengths == length)
+        if length <= 0:
+            local_amplitudes[:, selected] = np.nan # empty window, as np.percentile([])
             continue
         
-        period=int(1/(freq*sampling_interval))
-        
-        center=i*int(len(xic) / len(local_freqs))
-        start=int(max(0, center-period/2))
-        end=int(min(len(xic), center+period/2))
-        window=xic[start:end]
-        
-        q25, q75 = np.percentile(window, [25, 75])
-        local_amplitude = (q75 - q25) / 2
-        local_amplitudes.append(local_amplitude)
-        
-        
-    amplitude = np.percentile(local_amplitudes, 75)
+        window_indices = starts[selected, np.newaxis] + np.arange(length)
+        rows_per_block = max(1, max_block_size // window_indices.size)
+        for first in range(0, n_xics, rows_per_block):
+            block = xics[first:first + rows_per_block][:, window_indices]
+            q25, q75 = np.percentile(block, [25, 75], axis=-1)
+            local_amplitudes[first:first + rows_per_block, selected] = (q75 - q25) / 2
     
-    return amplitude
+    amplitudes = np.percentile(local_amplitudes, 75, axis=1)
+    
+    return amplitudes
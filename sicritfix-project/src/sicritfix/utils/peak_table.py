@@ -0,0 +1,520 @@
+#utils/peak_table.py
+
+#!/usr/bin/env python
+
+"""
+This Python module provides a columnar (CSR-like) representation of the peaks
+of a mass spectrometry run, used by the analyzers to extract signals quickly.
+
+@contents  :  PeakTable structure and helpers to build it from spectra.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  peak_table.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - numpy
+
+@classes :
+    - PeakTable
+
+@functions :
+    - spectrum_stream
+    - as_peak_table
+
+@notes :
+    All peaks are stored in one contiguous m/z array and one intensity array.
+    The peaks of scan ``i`` live in ``[offsets[i], offsets[i + 1])`` and are
+    sorted by m/z, so the intensity summed inside any m/z window of any scan
+    is the difference of two entries of the cumulative intensity array.
+
+    Scans are also labelled with their MS level and polarity, which split a
+    run into independent scan streams (e.g. the MS1 and MS2 scans of a DDA
+    run, or the positive and negative scans of a polarity-switching run).
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import numpy as np
+
+
+class PeakTable:
+    """
+    Columnar storage of all the peaks of an MS run.
+
+    Parameters
+    ----------
+    mz : np.ndarray
+        Concatenated m/z values of every scan.
+
+    intensity : np.ndarray
+        Concatenated intensity values, aligned with `mz`.
+
+    offsets : np.ndarray
+        Array of length ``n_scans + 1`` with the start index of each scan in
+        `mz` and `intensity`. The last entry is the total number of peaks.
+
+    rt : np.ndarray
+        Retention time (in seconds) of each scan.
+
+    ms_level : np.ndarray, optional
+        MS level of each scan. All scans are MS1 by default.
+
+    polarity : np.ndarray, optional
+        Polarity of each scan, as the ``IonSource.Polarity`` code of OpenMS 
+        (0 unknown, 1 positive, 2 negative). Unknown by default.
+
+    Attributes
+    ----------
+    cumulative_intensity : np.ndarray
+        Prefix sums of `intensity` with a leading zero, so that
+        ``cumulative_intensity[j] - cumulative_intensity[i]`` is the summed
+        intensity of peaks ``i`` to ``j - 1``.
+    """
+
+    def __init__(self, mz, intensity, offsets, rt, ms_level=None, polarity=None):
+        self.mz = np.ascontiguousarray(mz, dtype=np.float64)
+        self.intensity = np.ascontiguousarray(intensity, dtype=np.float64)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        self.rt = np.ascontiguousarray(rt, dtype=np.float64)
+        self.ms_level, self.polarity = _scan_labels(len(self.rt), ms_level, polarity)
+
+        if len(self.offsets) != len(self.rt) + 1:
+            raise ValueError("offsets must have one more entry than rt")
+        if len(self.ms_level) != len(self.rt) or len(self.polarity) != len(self.rt):
+            raise ValueError("ms_level and polarity must have one entry per scan")
+        if self.offsets[-1] != len(self.mz) or len(self.mz) != len(self.intensity):
+            raise ValueError("offsets, mz and intensity sizes do not match")
+
+        self._histograms = {}
+        self._sort_scans()
+        self.cumulative_intensity = np.concatenate(([0.0], np.cumsum(self.intensity)))
+
+    @classmethod
+    def from_arrays(cls, rt_array, mz_array, intensity_array, ms_levels=None, polarities=None):
+        """
+        Builds a PeakTable from per-scan lists of arrays.
+
+        Parameters
+        ----------
+        rt_array : list of float
+            Retention time of each scan.
+
+        mz_array : list of np.ndarray
+            List of m/z arrays for each scan.
+
+        intensity_array : list of np.ndarray
+            List of intensity arrays corresponding to each m/z array.
+
+        ms_levels, polarities : list of int, optional
+            MS level and polarity code of each scan (see `PeakTable`).
+
+        Returns
+        -------
+        PeakTable
+            The columnar table holding the same peaks.
+        """
+        lengths = np.fromiter((len(mzs) for mzs in mz_array), dtype=np.int64, count=len(mz_array))
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        if len(mz_array):
+            mz = np.concatenate([np.asarray(mzs, dtype=np.float64) for mzs in mz_array])
+            intensity = np.concatenate([np.asarray(ints, dtype=np.float64) for ints in intensity_array])
+        else:
+            mz = np.empty(0)
+            intensity = np.empty(0)
+
+        return cls(mz, intensity, offsets, rt_array, ms_levels, polarities)
+
+    @classmethod
+    def from_buffers(cls, mz, intensity, offsets, rt, cumulative_intensity, ms_level=None, polarity=None):
+        """
+        Wraps arrays of an existing PeakTable without copying or sorting them.
+
+        Used to rebuild a table on top of shared memory in worker processes; 
+        the arrays must come from a valid PeakTable.
+
+        Parameters
+        ----------
+        mz, intensity, offsets, rt, cumulative_intensity : np.ndarray
+            The arrays of the same name of the original PeakTable.
+
+        ms_level, polarity : np.ndarray, optional
+            Scan labels of the original PeakTable. Defaults as in `PeakTable`.
+
+        Returns
+        -------
+        PeakTable
+            A table viewing the given arrays.
+        """
+        peak_table = cls.__new__(cls)
+        peak_table.mz = mz
+        peak_table.intensity = intensity
+        peak_table.offsets = offsets
+        peak_table.rt = rt
+        peak_table.cumulative_intensity = cumulative_intensity
+        peak_table.ms_level, peak_table.polarity = _scan_labels(len(rt), ms_level, polarity)
+        peak_table._scan_index = None
+        peak_table._histograms = {}
+        
+        return peak_table
+
+    @classmethod
+    def from_experiment(cls, input_map):
+        """
+        Builds a PeakTable from the spectra of an MSExperiment.
+
+        Parameters
+        ----------
+        input_map : MSExperiment
+            The loaded mass spectrometry experiment.
+
+        Returns
+        -------
+        PeakTable
+            The columnar table holding the peaks of every spectrum.
+        """
+        mz_array = []
+        intensity_array = []
+        rts = []
+        ms_levels = []
+        polarities = []
+
+        for spectrum in input_map:
+            mzs, intensities = spectrum.get_peaks()
+            mz_array.append(mzs)
+            intensity_array.append(intensities)
+            rts.append(spectrum.getRT())
+            ms_level, polarity = spectrum_stream(spectrum)
+            ms_levels.append(ms_level)
+            polarities.append(polarity)
+
+        return cls.from_arrays(rts, mz_array, intensity_array, ms_levels, polarities)
+
+    @property
+    def n_scans(self):
+        """int: Number of scans in the table."""
+        return len(self.rt)
+
+    @property
+    def n_peaks(self):
+        """int: Total number of peaks in the table."""
+        return len(self.mz)
+
+    @property
+    def scan_index(self):
+        """np.ndarray: Scan number of every peak, aligned with `mz`."""
+        if self._scan_index is None:
+            self._scan_index = np.repeat(np.arange(self.n_scans), np.diff(self.offsets))
+        return self._scan_index
+
+    def scan(self, i):
+        """
+        Returns the m/z and intensity views of one scan.
+
+        Parameters
+        ----------
+        i : int
+            Scan number.
+
+        Returns
+        -------
+        mzs : np.ndarray
+            Sorted m/z values of the scan.
+
+        intensities : np.ndarray
+            Intensities aligned with `mzs`.
+        """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.mz[start:end], self.intensity[start:end]
+
+    def streams(self):
+        """
+        Splits the scans into streams of the same MS level and polarity.
+
+        Returns
+        -------
+        streams : dict
+            Maps each ``(ms_level, polarity)`` pair to the sorted scan numbers 
+            of its stream, in increasing order of the pair.
+        """
+        keys = self.ms_level.astype(np.int64) * 256 + self.polarity
+        stream_keys, stream_ids = np.unique(keys, return_inverse=True)
+        order = np.argsort(stream_ids, kind="stable")
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(stream_ids, minlength=len(stream_keys)))))
+
+        return {
+            (int(key // 256), int(key % 256)): order[start:end]
+            for key, start, end in zip(stream_keys, bounds[:-1], bounds[1:])
+        }
+
+    def take(self, scans):
+        """
+        Builds the PeakTable of a subset of the scans.
+
+        Parameters
+        ----------
+        scans : array-like of int
+            Scan numbers to keep, in the order of the new table.
+
+        Returns
+        -------
+        PeakTable
+            A new table with a copy of the peaks of `scans`. Its scan ``k`` is 
+            scan ``scans[k]`` of this table.
+        """
+        scans = np.asarray(scans, dtype=np.int64)
+        starts = self.offsets[scans]
+        lengths = self.offsets[scans + 1] - starts
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        peaks = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+        return PeakTable(
+            self.mz[peaks], self.intensity[peaks], offsets, self.rt[scans], 
+            self.ms_level[scans], self.polarity[scans]
+        )
+
+    def mz_histogram(self, mz_bin_size=0.01):
+        """
+        Counts in how many distinct scans each m/z bin is observed.
+
+        The m/z values are mapped to integer bins ``round(mz / mz_bin_size)`` and
+        counted with ``np.bincount``, so memory is bounded by the m/z range of
+        the run rather than by the number of distinct m/z values. Results are
+        cached per bin size, so several stages can share the histogram.
+
+        Parameters
+        ----------
+        mz_bin_size : float, optional (default=0.01)
+            Width of the m/z bins.
+
+        Returns
+        -------
+        bin_mzs : np.ndarray
+            Centre m/z of every bin observed at least once, in increasing order.
+
+        scan_counts : np.ndarray
+            Number of scans containing at least one peak in each bin.
+        """
+        if mz_bin_size in self._histograms:
+            return self._histograms[mz_bin_size]
+
+        if self.n_peaks == 0:
+            histogram = (np.empty(0), np.empty(0, dtype=np.int64))
+            self._histograms[mz_bin_size] = histogram
+            return histogram
+
+        bin_ids = np.round(self.mz / mz_bin_size).astype(np.int64)
+
+        # Scans are sorted by m/z, so repeated bins inside a scan are adjacent
+        first_in_scan = np.ones(self.n_peaks, dtype=bool)
+        first_in_scan[1:] = bin_ids[1:] != bin_ids[:-1]
+        scan_starts = self.offsets[:-1][np.diff(self.offsets) > 0]
+        first_in_scan[scan_starts] = True
+
+        min_bin = bin_ids.min()
+        counts = np.bincount(bin_ids[first_in_scan] - min_bin)
+        observed = np.flatnonzero(counts)
+
+        histogram = ((observed + min_bin) * mz_bin_size, counts[observed])
+        self._histograms[mz_bin_size] = histogram
+        return histogram
+
+    def window_sum(self, lower, upper):
+        """
+        Sums the intensities with ``lower < m/z < upper`` in every scan.
+
+        The scan boundaries are searched simultaneously for all the scans with a
+        vectorized binary search, so the cost does not depend on the number of
+        peaks inside each scan beyond a logarithmic factor.
+
+        Parameters
+        ----------
+        lower : float
+            Exclusive lower m/z bound of the window.
+
+        upper : float
+            Exclusive upper m/z bound of the window.
+
+        Returns
+        -------
+        sums : np.ndarray
+            Summed intensity of the window for each scan.
+        """
+        start = self._segment_searchsorted(lower, side="right")
+        end = self._segment_searchsorted(upper, side="left")
+        end = np.maximum(end, start)
+
+        return self.cumulative_intensity[end] - self.cumulative_intensity[start]
+
+    def xic(self, target_mz, mz_tol=0.1):
+        """
+        Builds the extracted ion chromatogram of `target_mz`.
+
+        Parameters
+        ----------
+        target_mz : float
+            The m/z value of interest.
+
+        mz_tol : float, optional (default=0.1)
+            Peaks with ``|m/z - target_mz| < mz_tol`` are summed.
+
+        Returns
+        -------
+        xic : np.ndarray
+            Summed intensity around `target_mz` for each scan.
+        """
+        return self.window_sum(target_mz - mz_tol, target_mz + mz_tol)
+
+    def xics(self, target_mzs, mz_tol=0.1):
+        """
+        Builds the extracted ion chromatograms of many targets in one sweep.
+
+        Each scan is visited once and all the target windows are located in it
+        with two ``np.searchsorted`` calls, so the cost is
+        O(n_scans * n_targets * log(peaks per scan)) instead of one full pass
+        over the peaks per target.
+
+        Parameters
+        ----------
+        target_mzs : array-like of float
+            The m/z values of interest.
+
+        mz_tol : float, optional (default=0.1)
+            Peaks with ``|m/z - target_mz| < mz_tol`` are summed.
+
+        Returns
+        -------
+        xics : np.ndarray
+            Matrix of shape ``(n_targets, n_scans)`` with one XIC per row.
+        """
+        target_mzs = np.asarray(target_mzs, dtype=np.float64).ravel()
+        lower = target_mzs - mz_tol
+        upper = target_mzs + mz_tol
+
+        # Filled scan by scan, so rows of the transposed matrix are contiguous
+        xics = np.zeros((self.n_scans, len(target_mzs)))
+        for i in range(self.n_scans):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            if start == end:
+                continue
+            mzs = self.mz[start:end]
+            lo = np.searchsorted(mzs, lower, side="right")
+            hi = np.maximum(np.searchsorted(mzs, upper, side="left"), lo)
+            xics[i] = self.cumulative_intensity[start + hi] - self.cumulative_intensity[start + lo]
+
+        return np.ascontiguousarray(xics.T)
+
+    def _segment_searchsorted(self, value, side="left"):
+        """
+        Runs ``np.searchsorted(scan_mzs, value, side)`` on every scan at once.
+
+        Returns global peak indices (i.e. already shifted by the scan offsets).
+        """
+        lo = self.offsets[:-1].copy()
+        hi = self.offsets[1:].copy()
+        if self.n_peaks == 0:
+            return lo
+
+        while True:
+            active = lo < hi
+            if not np.any(active):
+                return lo
+            mid = (lo + hi) // 2
+            mid_mz = self.mz[np.minimum(mid, self.n_peaks - 1)]
+            if side == "left":
+                go_right = mid_mz < value
+            else:
+                go_right = mid_mz <= value
+            go_right &= active
+            lo = np.where(go_right, mid + 1, lo)
+            hi = np.where(go_right | ~active, hi, mid)
+
+    def _sort_scans(self):
+        """Sorts the peaks of each scan by m/z if they are not sorted already."""
+        self._scan_index = None
+        if self.n_peaks < 2:
+            return
+
+        decreasing = np.diff(self.mz) < 0
+        # A decrease across a scan boundary is expected and harmless
+        boundaries = self.offsets[1:-1] - 1
+        boundaries = boundaries[(boundaries >= 0) & (boundaries < self.n_peaks - 1)]
+        decreasing[boundaries] = False
+
+        if np.any(decreasing):
+            order = np.lexsort((self.mz, self.scan_index))
+            self.mz = self.mz[order]
+            self.intensity = self.intensity[order]
+
+
+def spectrum_stream(spectrum):
+    """
+    Returns the stream key ``(ms_level, polarity)`` of a spectrum (see `PeakTable.streams`).
+
+    Parameters
+    ----------
+    spectrum : MSSpectrum
+        The spectrum.
+
+    Returns
+    -------
+    key : tuple of int
+        MS level and polarity code of the spectrum.
+    """
+    polarity = spectrum.getInstrumentSettings().getPolarity()
+
+    return spectrum.getMSLevel(), int(getattr(polarity, "value", polarity))
+
+def _scan_labels(n_scans, ms_level=None, polarity=None):
+    """MS level and polarity arrays of `n_scans` scans, with their defaults (MS1, unknown)."""
+    ms_level = np.ones(n_scans, dtype=np.int8) if ms_level is None else np.asarray(ms_level, dtype=np.int8)
+    polarity = np.zeros(n_scans, dtype=np.int8) if polarity is None else np.asarray(polarity, dtype=np.int8)
+
+    return ms_level, polarity
+
+def as_peak_table(mz_array, intensity_array=None, rt_array=None):
+    """
+    Returns the PeakTable passed as `mz_array` or `rt_array` unchanged, 
+    otherwise builds one from the per-scan lists.
+
+    This lets the analyzer functions accept either a PeakTable or the legacy
+    ``(rt_array, mz_array, intensity_array)`` lists.
+
+    Parameters
+    ----------
+    mz_array : PeakTable or list of np.ndarray
+        The peak table, or the list of m/z arrays for each scan.
+
+    intensity_array : list of np.ndarray, optional
+        Intensity arrays for each scan. Ignored when a PeakTable is given.
+
+    rt_array : PeakTable or list of float, optional
+        The peak table, or the retention times of each scan. When missing, 
+        scans are numbered 0, 1, 2...
+
+    Returns
+    -------
+    PeakTable
+    """
+    if isinstance(mz_array, PeakTable):
+        return mz_array
+    if isinstance(rt_array, PeakTable):
+        return rt_array
+    if rt_array is None:
+        rt_array = np.arange(len(mz_array), dtype=np.float64)
+
+    return PeakTable.from_arrays(rt_array, mz_array, intensity_array)
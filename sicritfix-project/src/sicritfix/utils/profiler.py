@@ -0,0 +1,177 @@
+# utils/profiler.py
+#!/usr/bin/env python
+
+"""
+This Python module records where the time and memory of a run go, stage by
+stage, together with counters of the work done.
+
+@contents  :  Per-stage wall/CPU time, peak memory and work counters of a run.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  profiler.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - tracemalloc
+    - resource (optional, not available on Windows)
+
+@classes :
+    - RunProfiler
+    - NullProfiler
+
+@notes :
+    CPU time is that of the current process: the work of the worker processes
+    of a parallel run shows up as wall time only. The peak RSS of a stage is
+    the high-water mark of the process at the end of the stage (it never
+    decreases). The tracemalloc peak is the largest Python/numpy allocation
+    total traced during the stage; memory allocated by OpenMS is only
+    visible in the RSS.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+
+def _peak_rss_mb():
+    """Returns the peak resident set size of the process in MB, or None if unknown."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Bytes on macOS, kilobytes elsewhere
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024
+
+class RunProfiler:
+    """
+    Collects the stage timings, memory peaks and work counters of a run.
+
+    Use `stage` around each step of the pipeline and `count` to add to the
+    counters; `report` returns everything as a JSON-serializable dict.
+
+    Parameters
+    ----------
+    trace_memory : bool, optional (default=True)
+        Trace Python allocations with tracemalloc, which slows the run down
+        slightly.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counters = {}
+        self.info = {}
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._started_tracemalloc = False
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager timing a stage. A stage entered several times accumulates
+        its times and keeps its largest memory peaks.
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.trace_memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record = self.stages.setdefault(name, {
+                "wall_time": 0.0, "cpu_time": 0.0, "peak_rss_mb": None, "tracemalloc_peak_mb": None,
+            })
+            record["wall_time"] += time.perf_counter() - start_wall
+            record["cpu_time"] += time.process_time() - start_cpu
+            record["peak_rss_mb"] = _max(record["peak_rss_mb"], _peak_rss_mb())
+            if self.trace_memory and tracemalloc.is_tracing():
+                record["tracemalloc_peak_mb"] = _max(
+                    record["tracemalloc_peak_mb"], tracemalloc.get_traced_memory()[1] / 1024 ** 2
+                )
+
+    def count(self, name, n=1):
+        """Adds `n` to the counter `name`."""
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def set_info(self, **info):
+        """Records descriptive fields of the run (input path, options, outcome...)."""
+        self.info.update(info)
+
+    def report(self):
+        """
+        Returns the profile of the run.
+
+        Returns
+        -------
+        report : dict
+            ``info`` fields, ``stages`` (wall_time and cpu_time in s,
+            peak_rss_mb, tracemalloc_peak_mb per stage, in execution order),
+            ``counters`` and ``total`` wall/CPU time and peak RSS.
+        """
+        return {
+            **self.info,
+            "stages": self.stages,
+            "counters": self.counters,
+            "total": {
+                "wall_time": time.perf_counter() - self._start_wall,
+                "cpu_time": time.process_time() - self._start_cpu,
+                "peak_rss_mb": _peak_rss_mb(),
+            },
+        }
+
+    def write(self, path):
+        """Writes the report as JSON to `path` and stops memory tracing."""
+        report = self.report()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        return report
+
+class NullProfiler:
+    """Profiler doing nothing, used when no profile is requested."""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def count(self, name, n=1):
+        pass
+
+    def set_info(self, **info):
+        pass
+
+def _max(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
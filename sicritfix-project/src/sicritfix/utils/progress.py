@@ -0,0 +1,158 @@
+# utils/progress.py
+#!/usr/bin/env python
+
+"""
+This Python module reports the progress of a run as structured events.
+
+@contents  :  Rate-limited progress events of a run and a text progress bar.
+@project   :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program   :  N/A
+@file      :  progress.py
+@version   :  0.0.1, 18 July 2025
+@author    :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@information :
+    https://www.python.org/dev/peps/pep-0020/
+    https://www.python.org/dev/peps/pep-0008/
+    http://sphinxcontrib-napoleon.readthedocs.io/en/latest/example_numpy.html
+
+@dependencies :
+    - N/A
+
+@classes :
+    - ProgressReporter
+    - NullProgress
+    - ProgressBar
+
+@notes :
+    Every event is a dict with an "event" field:
+
+        run_start   : input_path, output_path
+        stage_start : stage
+        progress    : stage, done, total, fraction, eta (s, None if unknown)
+        stage_end   : stage, stage_time (s)
+        run_end     : outcome ("corrected", "unchanged" or "failed")
+
+    and the "elapsed" time (s) since the start of the run. Progress events
+    are rate-limited: an update is dropped unless `min_interval` seconds have
+    passed since the last emitted one, except the first and last update of a
+    stage, so a sink sees a bounded number of events whatever the size of
+    the run. An exception raised by the sink is not caught and aborts the run.
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+
+
+import sys
+import time
+from contextlib import contextmanager
+
+
+class ProgressReporter:
+    """
+    Sends the progress events of a run to a sink.
+
+    Parameters
+    ----------
+    sink : callable
+        Function called with each event (a dict, see the notes of the module).
+
+    min_interval : float, optional (default=0.5)
+        Minimum time (in seconds) between two progress events.
+    """
+
+    def __init__(self, sink, min_interval=0.5):
+        self.sink = sink
+        self.min_interval = min_interval
+        self._start = time.monotonic()
+        self._stage_start = self._start
+        self._last_emit = float("-inf")
+
+    def emit(self, event, **fields):
+        """Sends an event to the sink, with the elapsed time of the run."""
+        self.sink({"event": event, **fields, "elapsed": time.monotonic() - self._start})
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager sending the start and end events of a stage."""
+        self._stage_start = time.monotonic()
+        self._last_emit = float("-inf")
+        self.emit("stage_start", stage=name)
+        yield
+        self.emit("stage_end", stage=name, stage_time=time.monotonic() - self._stage_start)
+
+    def update(self, stage, done, total):
+        """
+        Reports that `done` of the `total` items of a stage are processed.
+
+        Cheap enough to be called once per item: the event is only built when
+        it is not dropped by the rate limit.
+        """
+        now = time.monotonic()
+        if now - self._last_emit < self.min_interval and done < total:
+            return
+        self._last_emit = now
+
+        stage_time = now - self._stage_start
+        fraction = done / total if total else 1.0
+        eta = stage_time * (total - done) / done if done else None
+        self.emit("progress", stage=stage, done=done, total=total, fraction=fraction, eta=eta)
+
+class NullProgress:
+    """Progress reporter doing nothing, used when no sink is given."""
+
+    def emit(self, event, **fields):
+        pass
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def update(self, stage, done, total):
+        pass
+
+class ProgressBar:
+    """
+    Event sink drawing a one-line progress bar per stage on a text stream.
+
+    Parameters
+    ----------
+    stream : file-like, optional (default=sys.stderr)
+        Where the bar is drawn.
+
+    width : int, optional (default=30)
+        Number of characters of the bar.
+    """
+
+    def __init__(self, stream=None, width=30):
+        self.stream = stream or sys.stderr
+        self.width = width
+        self._line_length = 0
+
+    def __call__(self, event):
+        kind = event["event"]
+        if kind == "stage_start":
+            self._draw(f"  {event['stage']:<10} ...")
+        elif kind == "progress":
+            filled = int(round(self.width * event["fraction"]))
+            eta = f"  ETA {event['eta']:.0f} s" if event["eta"] is not None else ""
+            self._draw(
+                f"  {event['stage']:<10} [{'#' * filled}{'.' * (self.width - filled)}] "
+                f"{100 * event['fraction']:5.1f}% ({event['done']}/{event['total']}){eta}"
+            )
+        elif kind == "stage_end":
+            self._draw(f"  {event['stage']:<10} done in {event['stage_time']:.2f} s")
+            self.stream.write("\n")
+            self._line_length = 0
+        self.stream.flush()
+
+    def _draw(self, line):
+        """Redraws the current line, blanking what is left of the previous one."""
+        self.stream.write("\r" + line.ljust(self._line_length))
+        self._line_length = len(line)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+This Python module contains unit tests for the batch.py module of the SICRITfix project.
+
+@contents :  Unit tests for batch processing with a pool of worker processes.
+@project  :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program  :  N/A
+@file     :  test_batch.py
+@version  :  0.0.1, 18 July 2025
+@author   :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pyopenms as oms
+from sicritfix.processing.batch import find_input_files, process_batch, format_batch_summary
+
+
+def slow_process_file(input_path, output_path, **options):
+    import time
+    with open(output_path, "w") as f:
+        f.write("truncated")
+    time.sleep(30)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.outdir = os.path.join(self.temp_dir, "out")
+
+        rts = np.arange(100) * 0.5
+        for name, amplitude in [("osc.mzML", 500.0), ("flat.mzML", 0.0)]:
+            exp = oms.MSExperiment()
+            for rt in rts:
+                spec = oms.MSSpectrum()
+                spec.setRT(rt)
+                spec.setMSLevel(1)
+                intensity = 1000 + amplitude * np.sin(2 * np.pi * 0.1 * rt)
+                spec.set_peaks((np.array([500.2, 922.098]), np.array([intensity, intensity])))
+                exp.addSpectrum(spec)
+            oms.MzMLFile().store(os.path.join(self.temp_dir, name), exp)
+
+        with open(os.path.join(self.temp_dir, "broken.mzML"), "w") as f:
+            f.write("not an mzML file")
+        with open(os.path.join(self.temp_dir, "notes.txt"), "w") as f:
+            f.write("ignored")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_find_input_files(self):
+        names = [os.path.basename(path) for path in find_input_files(self.temp_dir)]
+        self.assertEqual(names, ["broken.mzML", "flat.mzML", "osc.mzML"])
+        names = [os.path.basename(path) for path in find_input_files(os.path.join(self.temp_dir, "o*.mzML"))]
+        self.assertEqual(names, ["osc.mzML"])
+
+    def test_process_batch_isolates_failures(self):
+        results = process_batch(find_input_files(self.temp_dir), self.outdir, jobs=2)
+        statuses = {os.path.basename(r.input_path): r.status for r in results}
+        self.assertEqual(statuses, {"broken.mzML": "failed", "flat.mzML": "unchanged", "osc.mzML": "corrected"})
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "osc_corrected.mzML")))
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, "flat_corrected.mzML")))
+        # The failed file leaves no partial output behind
+        self.assertEqual(sorted(os.listdir(self.outdir)), ["flat_corrected.mzML", "osc_corrected.mzML"])
+
+        # Existing outputs are skipped unless overwrite is requested
+        results = process_batch(find_input_files(self.temp_dir), self.outdir, jobs=2)
+        self.assertEqual(results[2].status, "skipped")
+
+        summary = format_batch_summary(results)
+        self.assertIn("osc.mzML", summary)
+        self.assertIn("3 files", summary)
+
+    @mock.patch("sicritfix.processing.batch.process_file", slow_process_file)
+    def test_process_batch_timeout(self):
+        input_paths = [os.path.join(self.temp_dir, "osc.mzML")]
+        results = process_batch(input_paths, self.outdir, jobs=1, timeout=0.5)
+        self.assertEqual(results[0].status, "timeout")
+        self.assertLess(results[0].elapsed, 10)
+        self.assertEqual(os.listdir(self.outdir), [])
+
+    def test_process_batch_reports_conflicting_outputs(self):
+        other_dir = os.path.join(self.temp_dir, "other")
+        os.makedirs(other_dir)
+        shutil.copy(os.path.join(self.temp_dir, "osc.mzML"), other_dir)
+        input_paths = [os.path.join(self.temp_dir, "osc.mzML"), os.path.join(other_dir, "osc.mzML"), os.path.join(self.temp_dir, "flat.mzML")]
+
+        results = process_batch(input_paths, self.outdir)
+        self.assertEqual([r.status for r in results], ["conflict", "conflict", "unchanged"])
+        self.assertIn(input_paths[1], results[0].error)
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, "osc_corrected.mzML")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for the benchmark suite (benchmarks/)
+
+@contents : Smoke tests for the synthetic workloads and the stage benchmarks.
+@project  : SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@file     : test_benchmarks.py
+@author   : Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+@version  : 0.0.1, 24 July 2025
+
+@license  : GNU AFFERO GENERAL PUBLIC LICENSE v3
+"""
+
+
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+
+from workloads import REFERENCE_MZ, make_experiment
+from bench_stages import STAGES, run_benchmarks, scaling_exponents, format_report
+from bench_encoding import ENCODINGS, run_encoding_benchmarks, format_encoding_report
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_make_experiment(self):
+        experiment = make_experiment(50, 20, oscillating_fraction=0.5)
+        self.assertEqual(experiment.getNrSpectra(), 50)
+        mzs, _ = experiment[0].get_peaks()
+        self.assertEqual(len(mzs), 20)
+        self.assertIn(REFERENCE_MZ, mzs)
+
+    def test_run_benchmarks_covers_every_stage(self):
+        results = run_benchmarks([120, 240], [20], [0.2], repeat=1, verbose=False)
+        self.assertEqual({record["stage"] for record in results}, set(STAGES))
+        for record in results:
+            self.assertGreater(record["peaks_per_second"], 0)
+            self.assertGreater(record["n_oscillating"], 0)
+
+        self.assertEqual(set(scaling_exponents(results)), set(STAGES))
+        report = format_report(results, baseline=results)
+        self.assertIn("process_file", report)
+        self.assertIn("1.00x", report)
+
+    def test_run_encoding_benchmarks_covers_every_encoding(self):
+        results = run_encoding_benchmarks([60], [20], repeat=1, verbose=False)
+        self.assertEqual({record["encoding"] for record in results}, set(ENCODINGS))
+        for record in results:
+            self.assertGreater(record["size"], 0)
+            self.assertGreater(record["mb_per_second"], 0)
+        default = next(record for record in results if record["encoding"] == "default")
+        self.assertAlmostEqual(default["relative_size"], 1.0)
+        self.assertIn("numpress", format_encoding_report(results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for cache.py
+
+@contents : Tests for the content-hash keyed on-disk cache.
+@project  : SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@file     : test_cache.py
+@author   : Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+@version  : 0.0.1, 24 July 2025
+
+@license  : GNU AFFERO GENERAL PUBLIC LICENSE v3
+"""
+
+
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pyopenms as oms
+from sicritfix.io.cache import RunCache, file_hash, params_hash
+from sicritfix.processing.processor import process_file
+from sicritfix.utils.peak_table import PeakTable
+
+
+class TestRunCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = RunCache(os.path.join(self.tmp_dir, "cache"))
+        rng = np.random.default_rng(0)
+        self.table = PeakTable.from_arrays(
+            np.arange(20, dtype=float),
+            [rng.uniform(100, 200, 30) for _ in range(20)],
+            [rng.uniform(0, 1000, 30) for _ in range(20)],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_keys(self):
+        path = os.path.join(self.tmp_dir, "a.txt")
+        with open(path, "wb") as f:
+            f.write(b"spectra")
+        key = self.cache.run_key(path)
+        self.assertEqual(key, file_hash(path))
+        with open(path, "ab") as f:
+            f.write(b"!")
+        self.assertNotEqual(self.cache.run_key(path), key)
+        self.assertEqual(params_hash({"a": 1, "b": 0.5}), params_hash({"b": 0.5, "a": 1}))
+        self.assertNotEqual(params_hash({"a": 1}), params_hash({"a": 2}))
+
+    def test_peak_table_roundtrip(self):
+        self.assertIsNone(self.cache.load_peak_table("run"))
+        self.cache.store_peak_table("run", self.table)
+
+        cached = self.cache.load_peak_table("run")
+        self.assertIsInstance(cached.mz, np.memmap)
+        np.testing.assert_array_equal(cached.rt, self.table.rt)
+        np.testing.assert_array_equal(cached.xic(150.0, 5.0), self.table.xic(150.0, 5.0))
+
+    def test_result_roundtrip(self):
+        params = {"power_threshold": 0.15}
+        self.assertIsNone(self.cache.load_result("run", "detection", params))
+        self.cache.store_result("run", "detection", params, oscillating_mzs=np.array([1.0, 2.0]))
+
+        result = self.cache.load_result("run", "detection", params)
+        np.testing.assert_array_equal(result["oscillating_mzs"], [1.0, 2.0])
+        self.assertIsNone(self.cache.load_result("run", "detection", {"power_threshold": 0.2}))
+
+    def test_lru_eviction(self):
+        self.cache.store_peak_table("old", self.table)
+        self.cache.store_peak_table("new", self.table)
+        os.utime(os.path.join(self.cache.cache_dir, "old"), (time.time() - 100,) * 2)
+        self.cache.load_peak_table("old") # used again: "new" becomes the oldest
+
+        self.cache.max_size_mb = self.cache.size_mb() * 0.75
+        self.cache.evict()
+        self.assertIsNotNone(self.cache.load_peak_table("old"))
+        self.assertIsNone(self.cache.load_peak_table("new"))
+
+    def test_process_file_reuses_cache(self):
+        rts = np.arange(200) * 0.5
+        input_map = oms.MSExperiment()
+        for rt in rts:
+            spec = oms.MSSpectrum()
+            spec.setRT(rt)
+            spec.setMSLevel(1)
+            spec.set_peaks((np.array([300.1, 500.2, 922.098]),
+                            np.array([50.0, 2000 + 800 * np.sin(0.2 * np.pi * rt), 1000 + 500 * np.sin(0.2 * np.pi * rt)])))
+            input_map.addSpectrum(spec)
+        input_file = os.path.join(self.tmp_dir, "osc.mzML")
+        oms.MzMLFile().store(input_file, input_map)
+        cache_dir = self.cache.cache_dir
+
+        first = os.path.join(self.tmp_dir, "first.mzML")
+        self.assertTrue(process_file(input_file, first, streaming=True, cache_dir=cache_dir))
+
+        # Cached run: no parse pass, reference or detection is computed again
+        second = os.path.join(self.tmp_dir, "second.mzML")
+        with mock.patch("sicritfix.processing.processor.load_peak_table") as load, \
+             mock.patch("sicritfix.processing.processor.obtain_freq_from_signal") as reference, \
+             mock.patch("sicritfix.processing.processor.detect_oscillating_mzs") as detect:
+            self.assertTrue(process_file(input_file, second, streaming=True, cache_dir=cache_dir))
+        load.assert_not_called()
+        reference.assert_not_called()
+        detect.assert_not_called()
+
+        with open(first, "rb") as f1, open(second, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
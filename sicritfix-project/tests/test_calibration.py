@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for calibration.py
+
+@contents : Tests for the phase-calibration profiles and their use by process_file.
+@project  : SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@file     : test_calibration.py
+@author   : Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+@version  : 0.0.1, 24 July 2025
+
+@license  : GNU AFFERO GENERAL PUBLIC LICENSE v3
+"""
+
+
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pyopenms as oms
+from sicritfix.processing.calibration import PhaseCalibration, calibrated_reference
+from sicritfix.processing.processor import process_file
+from sicritfix.utils.frequency_analyzer import apply_polynomial_regression, local_window_times, obtain_freq_from_signal
+from sicritfix.utils.peak_table import PeakTable
+
+
+def _oscillating_map(n_scans=300, offset=0.0, reference=True):
+    """Run with an oscillating m/z (500.2), a flat one (300.1) and the reference (922.098)."""
+    rts = np.arange(n_scans) * 0.5
+    phase = 2 * np.pi * 0.1 * rts + offset
+    input_map = oms.MSExperiment()
+    for rt, scan_phase in zip(rts, phase):
+        mzs = [300.1, 500.2] + ([922.098] if reference else [])
+        intensities = [50.0, 2000 + 800 * np.sin(scan_phase + 1.0), 1000 + 500 * np.sin(scan_phase)][:len(mzs)]
+        spec = oms.MSSpectrum()
+        spec.setRT(float(rt))
+        spec.setMSLevel(1)
+        spec.set_peaks((np.array(mzs), np.array(intensities)))
+        input_map.addSpectrum(spec)
+
+    return input_map
+
+
+class TestCalibration(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save_load_roundtrip(self):
+        calibration = PhaseCalibration([1e-5, 2e-3, 0.1], [922.098, 500.2], {500.2004: 800.0}, window_size=50)
+        path = os.path.join(self.tmp_dir, "method.json")
+        calibration.save(path)
+        loaded = PhaseCalibration.load(path)
+
+        np.testing.assert_array_equal(loaded.freq_coefficients, calibration.freq_coefficients)
+        np.testing.assert_array_equal(loaded.reference_mzs, calibration.reference_mzs)
+        self.assertEqual(loaded.window_size, 50)
+        self.assertEqual(loaded.amplitude_prior(500.2), 800.0)
+        self.assertTrue(np.isnan(loaded.amplitude_prior(300.1)))
+
+        with open(path) as f:
+            data = json.load(f)
+        data["version"] = 0
+        with open(path, "w") as f:
+            json.dump(data, f)
+        with self.assertRaises(ValueError):
+            PhaseCalibration.load(path)
+
+    def test_phase_matches_the_polynomial_regression(self):
+        peak_table = PeakTable.from_experiment(_oscillating_map())
+        rts = peak_table.rt
+        local_freqs_ref, phase_ref = obtain_freq_from_signal(peak_table)
+        calibration = PhaseCalibration.from_reference(rts, local_freqs_ref, [922.098])
+
+        np.testing.assert_allclose(calibration.phase(rts), phase_ref)
+        np.testing.assert_allclose(
+            calibration.phase(rts), apply_polynomial_regression(rts, local_window_times(rts, 70), local_freqs_ref)
+        )
+
+    def test_calibrated_reference_fits_the_offset(self):
+        calibration = PhaseCalibration.from_reference(
+            *self._reference(_oscillating_map()), [922.098]
+        )
+        _, _, fit = calibrated_reference(PeakTable.from_experiment(_oscillating_map()), calibration)
+        shifted = PeakTable.from_experiment(_oscillating_map(offset=1.2))
+        _, phase_ref, shifted_fit = calibrated_reference(shifted, calibration)
+
+        # The offset is fitted, so a shifted run fits as well as the calibration run
+        self.assertGreater(fit, 0.5)
+        self.assertAlmostEqual(shifted_fit, fit, delta=0.05)
+        xic = np.array([spec.get_peaks()[1][2] for spec in _oscillating_map(offset=1.2)])
+        self.assertGreater(np.corrcoef(np.sin(phase_ref), xic)[0, 1], 0.75)
+
+        # No reference in the run, or a calibration not matching it
+        with self.assertRaises(ValueError):
+            calibrated_reference(PeakTable.from_experiment(_oscillating_map(reference=False)), calibration)
+        with self.assertRaises(ValueError):
+            calibrated_reference(shifted, PhaseCalibration([0.0, 0.37], [922.098]))
+
+    def test_process_file_with_calibration(self):
+        input_file = os.path.join(self.tmp_dir, "osc.mzML")
+        oms.MzMLFile().store(input_file, _oscillating_map())
+        calibration_file = os.path.join(self.tmp_dir, "method.json")
+        report_file = os.path.join(self.tmp_dir, "report.json")
+
+        self.assertTrue(process_file(input_file, os.path.join(self.tmp_dir, "first.mzML"), save_calibration=calibration_file))
+        self.assertGreater(PhaseCalibration.load(calibration_file).amplitude_prior(500.2), 400)
+
+        output_file = os.path.join(self.tmp_dir, "second.mzML")
+        self.assertTrue(process_file(input_file, output_file, calibration=calibration_file, profile=report_file))
+        with open(report_file) as f:
+            report = json.load(f)
+        self.assertEqual(report["calibration"], "applied")
+
+        output_map = oms.MSExperiment()
+        oms.MzMLFile().load(output_file, output_map)
+        in_500 = np.array([spec.get_peaks()[1][1] for spec in _oscillating_map()])
+        out_500 = np.array([spec.get_peaks()[1][1] for spec in output_map])
+        self.assertLess(np.std(out_500), np.std(in_500))
+
+        # A calibration that does not fit the run falls back to the estimation
+        PhaseCalibration([0.0, 0.37], [922.098]).save(calibration_file)
+        self.assertTrue(process_file(input_file, output_file, calibration=calibration_file, profile=report_file))
+        with open(report_file) as f:
+            self.assertEqual(json.load(f)["calibration"], "fallback")
+
+    @staticmethod
+    def _reference(input_map):
+        peak_table = PeakTable.from_experiment(input_map)
+        local_freqs_ref, _ = obtain_freq_from_signal(peak_table)
+
+        return peak_table.rt, local_freqs_ref
+
+
+if __name__ == "__main__":
+    unittest.main()
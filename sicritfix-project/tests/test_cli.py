@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for cli.py
+
+@contents : Tests of the options passed by the command line to the pipeline.
+@project  : SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@file     : test_cli.py
+@author   : Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+@version  : 0.0.1, 24 July 2025
+
+@license  : GNU AFFERO GENERAL PUBLIC LICENSE v3
+"""
+
+
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from sicritfix import cli
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.tmp_dir, "run.mzML")
+        self.output_file = os.path.join(self.tmp_dir, "run_corrected.mzML")
+        open(self.input_file, "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _main(self, *options):
+        """Runs the command line on the input file, returns its exit code (None on success)."""
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            try:
+                cli.main([self.input_file, *options])
+            except SystemExit as e:
+                return e.code
+
+    @mock.patch.object(cli, "correct_file_realtime")
+    def test_realtime_forwards_its_options(self, correct_file_realtime):
+        correct_file_realtime.return_value = mock.Mock(locked=True, n_peaks_rewritten=3)
+
+        self.assertIsNone(self._main("--realtime", "--mz_ref", "500.2", "--power_threshold", "0.3", "--zlib"))
+        correct_file_realtime.assert_called_once_with(
+            self.input_file, self.output_file, encoding={"zlib": True}, mz_ref=500.2, power_threshold=0.3
+        )
+
+        # Without --power_threshold, the corrector keeps its own default
+        correct_file_realtime.reset_mock()
+        self.assertIsNone(self._main("--realtime"))
+        correct_file_realtime.assert_called_once_with(self.input_file, self.output_file, encoding=None, mz_ref=922.098)
+
+    @mock.patch.object(cli, "correct_file_realtime")
+    def test_realtime_rejects_unsupported_options(self, correct_file_realtime):
+        for options in (["--rt_range", "10", "20"], ["--progress"], ["--profile", "report.json"], ["--jobs", "2"], ["--mz_ref", "auto"]):
+            self.assertEqual(self._main("--realtime", *options), 2, options)
+        correct_file_realtime.assert_not_called()
+
+    @mock.patch.object(cli, "process_file", return_value=True)
+    def test_zlib_can_be_turned_on_and_off(self, process_file):
+        for options, encoding in (([], None), (["--zlib"], {"zlib": True}), (["--no_zlib"], {"zlib": False}), (["--zlib", "--no_zlib"], {"zlib": False})):
+            self.assertIsNone(self._main("--overwrite", *options))
+            self.assertEqual(process_file.call_args.kwargs["encoding"], encoding, options)
+
+    @mock.patch.object(cli, "process_file", return_value=True)
+    def test_load_filters(self, process_file):
+        self.assertIsNone(self._main())
+        self.assertIsNone(process_file.call_args.kwargs["load_filters"])
+
+        self.assertIsNone(self._main("--overwrite", "--ms_levels", "1", "--skip_chromatograms", "--skip_metadata"))
+        self.assertEqual(
+            process_file.call_args.kwargs["load_filters"], {"ms_levels": [1], "skip_chromatograms": True, "skip_metadata": True}
+        )
+
+    @mock.patch.object(cli, "process_file", return_value=True)
+    def test_default_power_threshold(self, process_file):
+        self.assertIsNone(self._main())
+        self.assertEqual(process_file.call_args.kwargs["power_threshold"], 0.15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -38,7 +38,11 @@ __copyright__ = "GPL License version 3"
 
 import unittest
 import numpy as np
-from sicritfix.processing.corrector import generate_modulated_signal, correct_oscillations
+from sicritfix.processing.corrector import (
+    generate_modulated_signal, correct_oscillations, build_residual_lookup, correct_peaks,
+    lockin_basis, fit_oscillations, scans_with_targets,
+)
+from sicritfix.utils.peak_table import PeakTable
 
 class TestCorrector(unittest.TestCase):
 
@@ -73,6 +77,56 @@ class TestCorrector(unittest.TestCase):
         # Check signal shape
         self.assertTrue(np.allclose(xic, modulated_signal + residual_signal, rtol=1e-4))
 
+    def test_fit_oscillations_recovers_amplitude_and_offset(self):
+        rts = np.arange(500) * 0.4
+        phase_ref = 2 * np.pi * (0.1 * rts + 0.0005 * rts ** 2)
+        amplitudes = np.array([0.0, 5.0, 300.0, 42.0])
+        offsets = np.array([0.0, 0.3, -1.2, 2.5])
+        baselines = np.array([10.0, 1000.0, 5e4, 0.0])
+        xics = baselines[:, None] + amplitudes[:, None] * np.sin(phase_ref + offsets[:, None])
+
+        fitted_amplitudes, fitted_offsets, modulated = fit_oscillations(xics, phase_ref)
+        np.testing.assert_allclose(fitted_amplitudes, amplitudes, atol=1e-6)
+        np.testing.assert_allclose(fitted_offsets[1:], offsets[1:], atol=1e-9)
+        np.testing.assert_allclose(xics - modulated, np.repeat(baselines[:, None], len(rts), axis=1), atol=1e-6)
+
+        # A precomputed basis gives the same fit, row by row
+        basis = lockin_basis(phase_ref)
+        for xic, signal in zip(xics, modulated):
+            np.testing.assert_allclose(fit_oscillations(xic, phase_ref, basis=basis)[2][0], signal, atol=1e-8)
+
+    def test_correct_peaks_matches_loop(self):
+        rng = np.random.default_rng(1)
+        oscillating_mzs = [100.0, 100.001, 150.25, 200.5]
+        residual_signals = {mz: rng.normal(size=5) for mz in oscillating_mzs}
+        target_mzs, residual_matrix = build_residual_lookup(oscillating_mzs[::-1], residual_signals)
+        np.testing.assert_array_equal(target_mzs, sorted(oscillating_mzs))
+        self.assertEqual(residual_matrix.shape, (4, 5))
+
+        mzs = np.array([99.9995, 100.0005, 100.0012, 120.0, 150.2505, 200.502, 300.0])
+        intensities = np.arange(len(mzs), dtype=float)
+        for mz_bin_size in [0.001, 0.01]:
+            corrected, matched = correct_peaks(mzs, intensities, 3, target_mzs, residual_matrix, mz_bin_size)
+
+            expected = intensities.copy()
+            for target_mz in sorted(oscillating_mzs):
+                expected[np.abs(mzs - target_mz) <= mz_bin_size] = residual_signals[target_mz][3]
+            np.testing.assert_array_equal(corrected, expected)
+            np.testing.assert_array_equal(matched, np.flatnonzero(corrected != intensities))
+        np.testing.assert_array_equal(intensities, np.arange(len(mzs)), "Input must not be modified")
+
+    def test_scans_with_targets_matches_correct_peaks(self):
+        target_mzs = np.array([100.0, 150.25])
+        mz_array = [np.array([99.9995, 120.0]), np.array([]), np.array([120.0, 300.0]), np.array([150.2505])]
+        peak_table = PeakTable.from_arrays(np.arange(4.0), mz_array, [np.ones(len(mzs)) for mzs in mz_array])
+        residual_matrix = np.zeros((2, 4))
+
+        is_matched = scans_with_targets(peak_table, target_mzs)
+        expected = [len(correct_peaks(mzs, np.ones(len(mzs)), i, target_mzs, residual_matrix, 0.001)[1]) > 0 for i, mzs in enumerate(mz_array)]
+        np.testing.assert_array_equal(is_matched, expected)
+        np.testing.assert_array_equal(is_matched, [True, False, False, True])
+        self.assertFalse(scans_with_targets(peak_table, np.empty(0)).any())
+
 if __name__ == "__main__":
     unittest.main()
 
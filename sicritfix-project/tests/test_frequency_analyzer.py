@@ -26,7 +26,13 @@ from sicritfix.utils.frequency_analyzer import (
     calculate_freq,
     local_frequencies_with_fft,
     apply_polynomial_regression,
+    screen_oscillations,
+    reference_band,
+    screen_oscillations_in_band,
+    select_reference,
+    obtain_freq_from_signal,
 )
+from sicritfix.utils.peak_table import PeakTable
 
 class TestFrequencyAnalyzer(unittest.TestCase):
     
@@ -48,6 +54,24 @@ class TestFrequencyAnalyzer(unittest.TestCase):
         self.assertEqual(len(times), len(freqs))
         self.assertTrue(np.allclose(freqs, self.true_freq, atol=0.05))
 
+    def test_local_frequencies_match_window_loop(self):
+        rng = np.random.default_rng(0)
+        rts = np.cumsum(rng.uniform(0.9, 1.1, 300))
+        xics = np.vstack([np.sin(2 * np.pi * f * rts) + rng.normal(0, 0.3, 300) for f in (0.05, 0.2, 0.31)])
+
+        for window_size in (20, 35, 70):
+            times, freqs = local_frequencies_with_fft(xics, rts, window_size, self.sampling_interval)
+            step = window_size // 2
+            starts = range(0, len(rts) - window_size, step)
+            np.testing.assert_allclose(times, [np.mean(rts[i:i + window_size]) for i in starts])
+            for xic, xic_freqs in zip(xics, freqs):
+                expected = [calculate_freq(xic[i:i + window_size], self.sampling_interval)[2] for i in starts]
+                np.testing.assert_allclose(xic_freqs, expected)
+                np.testing.assert_array_equal(local_frequencies_with_fft(xic, rts, window_size, self.sampling_interval)[1], xic_freqs)
+
+        times, freqs = local_frequencies_with_fft(xics[0, :10], rts[:10], 20, self.sampling_interval)
+        self.assertEqual((len(times), len(freqs)), (0, 0))
+
     def test_apply_polynomial_regression(self):
         rts = self.time
         step = 10
@@ -59,5 +83,104 @@ class TestFrequencyAnalyzer(unittest.TestCase):
         self.assertEqual(phase.shape, rts.shape)
         self.assertTrue(np.all(np.diff(phase) >= 0))
 
+    def test_apply_polynomial_regression_time_shift(self):
+        """The phase only depends on the time elapsed since the first scan (e.g. an RT window)."""
+        rts = self.time
+        rt_freqs = rts[::11]
+        local_freqs = 0.2 + 0.001 * rt_freqs
+        phase = apply_polynomial_regression(rts, rt_freqs, local_freqs)
+        np.testing.assert_allclose(phase, 2 * np.pi * (0.2 * rts + 0.0005 * rts ** 2), rtol=1e-6)
+
+        shifted_phase = apply_polynomial_regression(rts + 600.0, rt_freqs + 600.0, local_freqs)
+        np.testing.assert_allclose(shifted_phase, phase, rtol=1e-6)
+
+    def test_reference_phase_ignores_the_start_of_the_run(self):
+        """A run starting late (e.g. after a divert valve) gets the phase of the same run starting at 0."""
+        rts = np.arange(400) * 0.5
+        mz_array = [np.array([300.0, 922.098]) for _ in rts]
+        intensity_array = [np.array([50.0, 1000 + 500 * np.sin(2 * np.pi * (0.1 * rt + 0.0002 * rt ** 2))]) for rt in rts]
+
+        freqs, phase = obtain_freq_from_signal(PeakTable.from_arrays(rts, mz_array, intensity_array))
+        shifted_freqs, shifted_phase = obtain_freq_from_signal(PeakTable.from_arrays(rts + 600.0, mz_array, intensity_array))
+        np.testing.assert_allclose(shifted_freqs, freqs)
+        np.testing.assert_allclose(shifted_phase, phase, rtol=1e-6, atol=1e-6)
+
+    def test_screen_oscillations(self):
+        flat = np.full_like(self.signal, 5.0)
+        empty = np.zeros_like(self.signal)
+        trend = np.linspace(0, 1, len(self.signal))
+        xics = np.vstack([self.signal + 2.0, flat, empty, trend])
+        oscillating = screen_oscillations(xics, power_threshold=0.15)
+        np.testing.assert_array_equal(oscillating, [True, False, False, True])
+
+        # Same decision as the per-XIC computation
+        for xic, flag in zip(xics, oscillating):
+            if np.sum(xic) < 1e-5 or np.all(xic == xic[0]):
+                self.assertFalse(flag)
+                continue
+            power = np.abs(np.fft.rfft(xic - np.mean(xic))) ** 2
+            self.assertEqual(bool(np.any(power[1:] / np.sum(power) > 0.15)), flag)
+
+    def test_screen_oscillations_in_band(self):
+        n_scans = 256
+        sampling_interval = 0.5
+        t = np.arange(n_scans) * sampling_interval
+        rng = np.random.default_rng(0)
+        oscillating = 100 + 20 * np.sin(2 * np.pi * 0.2 * t) + rng.normal(0, 1, n_scans)
+        peak = 100 * np.exp(-0.5 * ((t - 60) / 8) ** 2)  # slow chromatographic peak
+        off_band = 100 + 20 * np.sin(2 * np.pi * 0.6 * t)
+        xics = np.vstack([oscillating, peak, off_band, np.zeros(n_scans)])
+
+        band = reference_band([0.19, 0.2, 0.21])
+        flags = screen_oscillations_in_band(xics, sampling_interval, band)
+        np.testing.assert_array_equal(flags, [True, False, False, False])
+        wide_band = reference_band([0.1, 0.3])  # evaluated with an FFT
+        np.testing.assert_array_equal(screen_oscillations_in_band(xics, sampling_interval, wide_band), flags)
+        np.testing.assert_array_equal(screen_oscillations(xics), [True, True, True, False])
+
+        # Normalized power of the band bins equals that of the full rfft
+        for xic in xics[:3]:
+            power = np.abs(np.fft.rfft(xic - xic.mean())) ** 2
+            for low, high in (band, wide_band):
+                bins = np.arange(int(np.ceil(low * n_scans * sampling_interval)),
+                                 int(np.floor(high * n_scans * sampling_interval)) + 1)
+                expected = bool(np.any(power[bins] / power.sum() > 0.05))
+                flag = screen_oscillations_in_band(xic, sampling_interval, (low, high), power_threshold=0.05)[0]
+                self.assertEqual(flag, expected)
+
+        with self.assertRaises(ValueError):
+            reference_band([0.0, -1.0])
+
+    def test_reference_scores_and_selection(self):
+        n_scans = 400
+        t = np.arange(n_scans) * 0.5
+        rng = np.random.default_rng(0)
+        oscillating = 100 + 40 * np.sin(2 * np.pi * 0.1 * t) + rng.normal(0, 1, n_scans)
+        half_run = np.where(t < 100, oscillating, 0.0)  # present in half the scans
+        weaker = 100 + 10 * np.sin(2 * np.pi * 0.1 * t + 1) + rng.normal(0, 5, n_scans)
+        peak = 100 * np.exp(-0.5 * ((t - 100) / 10) ** 2)  # slow chromatographic peak
+        other = 100 + 20 * np.sin(2 * np.pi * 0.35 * t) + rng.normal(0, 5, n_scans)  # unrelated oscillation
+        xics = np.vstack([oscillating, half_run, weaker, peak, other, np.zeros(n_scans)])
+
+        flags, scores = screen_oscillations(xics, return_scores=True)
+        np.testing.assert_array_equal(flags, screen_oscillations(xics))
+        self.assertGreater(scores[0], 0.9)
+        self.assertGreater(scores[0], scores[1])
+        self.assertGreater(scores[1], scores[3])
+        self.assertLess(scores[3], 0.05)
+        self.assertEqual(scores[5], 0)
+
+        # The ensemble keeps the references sharing the best one's frequency
+        local_freqs_ref, phase_ref, selected = select_reference(t, xics, scores)
+        self.assertEqual(selected[0], 0)
+        self.assertNotIn(4, selected)
+        self.assertNotIn(5, selected)
+        self.assertAlmostEqual(np.median(local_freqs_ref), 0.1, delta=0.02)
+        self.assertEqual(len(phase_ref), n_scans)
+
+        with self.assertRaises(ValueError):
+            select_reference(t, xics[5:], scores[5:])
+
+
 if __name__ == "__main__":
     unittest.main()
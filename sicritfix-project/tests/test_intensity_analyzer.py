@@ -16,7 +16,7 @@ Unit tests for intensity_analyzer.py
 
 import unittest
 import numpy as np
-from sicritfix.utils.intensity_analyzer import build_xic, get_amplitude
+from sicritfix.utils.intensity_analyzer import build_xic, build_xics, get_amplitude, get_amplitudes
 
 
 class TestIntensityAnalyzer(unittest.TestCase):
@@ -50,6 +50,14 @@ class TestIntensityAnalyzer(unittest.TestCase):
         xic = build_xic(self.mz_array, self.intensity_array, self.rt_array, self.target_mz, self.mz_tol)
         self.assertTrue(np.any(xic > 0), "XIC should contain non-zero signal near the target m/z")
 
+    def test_build_xics_matches_build_xic(self):
+        targets = [self.target_mz, 850.0, 999.5, 1200.0]
+        xics = build_xics(self.mz_array, self.intensity_array, self.rt_array, targets, self.mz_tol)
+        self.assertEqual(xics.shape, (len(targets), self.n_scans))
+        for target, xic in zip(targets, xics):
+            expected = build_xic(self.mz_array, self.intensity_array, self.rt_array, target, self.mz_tol)
+            np.testing.assert_allclose(xic, expected, atol=1e-6)
+
     def test_get_amplitude_positive(self):
         xic = build_xic(self.mz_array, self.intensity_array, self.rt_array, self.target_mz, self.mz_tol)
         amplitude = get_amplitude(self.target_mz, xic, self.rt_array, self.local_freqs, self.sampling_interval)
@@ -61,6 +69,27 @@ class TestIntensityAnalyzer(unittest.TestCase):
         amp2 = get_amplitude(self.target_mz, xic, self.rt_array, self.local_freqs, self.sampling_interval)
         self.assertAlmostEqual(amp1, amp2, places=5, msg="Amplitude should be stable across identical input")
 
+    def test_get_amplitudes_matches_percentile_loop(self):
+        rng = np.random.default_rng(1)
+        n_scans = 400
+        sampling_interval = 0.5
+        xics = rng.normal(0, 1, (6, n_scans)) + 10 * np.sin(np.linspace(0, 60, n_scans))
+        local_freqs = np.concatenate([rng.uniform(0.05, 0.3, 20), [0.0, -0.1]])
+
+        amplitudes = get_amplitudes(xics, local_freqs, sampling_interval, max_block_size=500)
+        for xic, amplitude in zip(xics, amplitudes):
+            local_amplitudes = []
+            for i, freq in enumerate(local_freqs):
+                if freq <= 0:
+                    continue
+                period = int(1 / (freq * sampling_interval))
+                center = i * int(n_scans / len(local_freqs))
+                window = xic[int(max(0, center - period / 2)):int(min(n_scans, center + period / 2))]
+                q25, q75 = np.percentile(window, [25, 75])
+                local_amplitudes.append((q75 - q25) / 2)
+            self.assertAlmostEqual(amplitude, np.percentile(local_amplitudes, 75), places=10)
+            self.assertAlmostEqual(get_amplitude(None, xic, None, local_freqs, sampling_interval), amplitude, places=12)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -36,7 +36,11 @@ import tempfile
 import shutil
 import pyopenms as oms
 from unittest import mock
-from sicritfix.io.io import load_file, convert_mzxml_2_mzml
+import numpy as np
+from sicritfix.io.io import (
+    load_file, convert_mzxml_2_mzml, get_input_path, load_peak_table, stream_file, store_spectra, BackgroundSpectrumWriter,
+    peak_file_options, store_file, load_options
+)
 
 
 class TestIOUtils(unittest.TestCase):
@@ -57,6 +61,130 @@ class TestIOUtils(unittest.TestCase):
         self.assertIsInstance(result, oms.MSExperiment)
         self.assertEqual(len(result.getSpectra()), 0)  # Dummy file is empty
 
+    def _store_small_run(self, path):
+        exp = oms.MSExperiment()
+        for i in range(5):
+            spec = oms.MSSpectrum()
+            spec.setRT(float(i))
+            spec.setMSLevel(1)
+            spec.set_peaks((np.array([100.0, 200.0 + i]), np.array([1.0, 2.0 * i])))
+            exp.addSpectrum(spec)
+        oms.MzMLFile().store(path, exp)
+        return exp
+
+    def test_load_peak_table(self):
+        path = os.path.join(self.temp_dir, "run.mzML")
+        self._store_small_run(path)
+        table = load_peak_table(path)
+        self.assertEqual(table.n_scans, 5)
+        self.assertEqual(table.n_peaks, 10)
+        np.testing.assert_array_equal(table.rt, np.arange(5.0))
+        np.testing.assert_allclose(table.xic(200.0 + 3, 0.1), [0, 0, 0, 6.0, 0])
+
+    def test_load_filters(self):
+        path = os.path.join(self.temp_dir, "run.mzML")
+        exp = self._store_small_run(path)
+        spec = oms.MSSpectrum()
+        spec.setRT(2.5)
+        spec.setMSLevel(2)
+        spec.set_peaks((np.array([150.0]), np.array([3.0])))
+        exp.addSpectrum(spec)
+        exp.sortSpectra(False)
+        exp.addChromatogram(oms.MSChromatogram())
+        oms.MzMLFile().store(path, exp)
+
+        # Both bounds of the ranges are included
+        loaded = load_file(path, filters={"ms_levels": [1], "rt_range": (1.0, 3.0), "mz_range": (150.0, 203.0), "skip_chromatograms": True})
+        self.assertEqual([spec.getRT() for spec in loaded], [1.0, 2.0, 3.0])
+        self.assertEqual(loaded.getNrChromatograms(), 0)
+        for spec in loaded:
+            self.assertEqual(spec.getMSLevel(), 1)
+        self.assertEqual([spec.get_peaks()[0].tolist() for spec in loaded], [[201.0], [202.0], [203.0]])
+        self.assertEqual(load_file(path).getNrChromatograms(), 1)
+
+        table, native_ids = load_peak_table(path, filters={"ms_levels": [2]}, native_ids=True)
+        self.assertEqual(table.n_scans, 1)
+        self.assertEqual(native_ids, [spec.getNativeID() for spec in load_file(path) if spec.getMSLevel() == 2])
+
+        with self.assertRaises(ValueError):
+            load_options({"rt_range": (3.0, 1.0)})
+        with self.assertRaises(ValueError):
+            load_options({"scan_range": (0, 2)})
+
+    def test_stream_file_copies_like_store(self):
+        path = os.path.join(self.temp_dir, "run.mzML")
+        stored = os.path.join(self.temp_dir, "stored.mzML")
+        streamed = os.path.join(self.temp_dir, "streamed.mzML")
+        exp = self._store_small_run(path)
+        loaded = oms.MSExperiment()
+        oms.MzMLFile().load(path, loaded)
+        oms.MzMLFile().store(stored, loaded)
+
+        stream_file(path, streamed)
+        with open(stored, "rb") as f_stored, open(streamed, "rb") as f_streamed:
+            self.assertEqual(f_stored.read(), f_streamed.read())
+
+    def test_store_spectra_matches_store(self):
+        exp = oms.MSExperiment()
+        for i in range(20):
+            spec = oms.MSSpectrum()
+            spec.setRT(float(i))
+            spec.setMSLevel(1)
+            spec.set_peaks((np.linspace(100, 200, 50), np.full(50, float(i))))
+            exp.addSpectrum(spec)
+        stored = os.path.join(self.temp_dir, "stored.mzML")
+        written = os.path.join(self.temp_dir, "written.mzML")
+        oms.MzMLFile().store(stored, exp)
+
+        store_spectra(written, iter(exp), n_spectra=exp.getNrSpectra())
+        with open(stored, "rb") as f_stored, open(written, "rb") as f_written:
+            self.assertEqual(f_stored.read(), f_written.read())
+
+    def test_store_spectra_with_encoding(self):
+        exp = oms.MSExperiment()
+        for i in range(20):
+            spec = oms.MSSpectrum()
+            spec.setRT(float(i))
+            spec.setMSLevel(1)
+            spec.set_peaks((np.linspace(100, 200, 50), np.full(50, 1000.0 + i)))
+            exp.addSpectrum(spec)
+        stored = os.path.join(self.temp_dir, "stored.mzML")
+        store_spectra(stored, iter(exp), n_spectra=exp.getNrSpectra())
+
+        for encoding in [{"mz_precision": 64, "intensity_precision": 64, "zlib": True, "write_index": False},
+                         {"numpress_mz": "linear", "numpress_intensity": "slof"}]:
+            written = os.path.join(self.temp_dir, "written.mzML")
+            store_spectra(written, iter(exp), n_spectra=exp.getNrSpectra(), encoding=encoding)
+            self.assertLess(os.path.getsize(written), os.path.getsize(stored))
+            loaded = load_file(written)
+            self.assertEqual(loaded.getNrSpectra(), exp.getNrSpectra())
+            for original, read in zip(exp, loaded):
+                np.testing.assert_allclose(read.get_peaks()[0], original.get_peaks()[0], atol=1e-4)
+                np.testing.assert_allclose(read.get_peaks()[1], original.get_peaks()[1], rtol=1e-3)
+
+        # store_file writes the same file for the same encoding
+        encoding = {"numpress_mz": "linear", "numpress_intensity": "pic", "zlib": True}
+        streamed = os.path.join(self.temp_dir, "streamed.mzML")
+        stored = os.path.join(self.temp_dir, "stored_encoded.mzML")
+        store_spectra(streamed, iter(exp), n_spectra=exp.getNrSpectra(), encoding=encoding)
+        store_file(stored, exp, encoding)
+        with open(stored, "rb") as f_stored, open(streamed, "rb") as f_streamed:
+            self.assertEqual(f_stored.read(), f_streamed.read())
+
+    def test_peak_file_options_rejects_invalid_encodings(self):
+        self.assertIsInstance(peak_file_options(None), oms.PeakFileOptions)
+        self.assertTrue(peak_file_options({"mz_precision": 32}).getMz32Bit())
+        for encoding in [{"numpress_mz": "gzip"}, {"intensity_precision": 16}, {"level": 9}]:
+            with self.assertRaises(ValueError):
+                peak_file_options(encoding)
+
+    def test_background_writer_reports_errors(self):
+        with self.assertRaises(RuntimeError):
+            with BackgroundSpectrumWriter(os.path.join(self.temp_dir, "out.mzML"), max_queue_size=1) as writer:
+                writer._consumer = None  # every write now fails in the writer thread
+                for _ in range(5):
+                    writer.consumeSpectrum(oms.MSSpectrum())
+
     @mock.patch("subprocess.run")
     @mock.patch("os.path.exists")
     def test_convert_mzxml_2_mzml_success(self, mock_exists, mock_run):
@@ -75,21 +203,56 @@ class TestIOUtils(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             convert_mzxml_2_mzml("fake.mzXML")
 
-    @mock.patch("sicritfix.io.io.convert_mzxml_2_mzml")
-    @mock.patch("os.path.exists", return_value=True)
-    #@mock.patch("pyopenms.MzMLFile.load")
-    def test_load_file_with_conversion(self, mock_exists, mock_convert):
-        # Setup mocks
-        mock_convert.return_value = self.fake_mzml
-        #mock_load.return_value = None  # No return, it fills input_map in-place
+    def test_load_mzxml_natively(self):
+        path = os.path.join(self.temp_dir, "run.mzXML")
+        exp = oms.MSExperiment()
+        for i in range(5):
+            spec = oms.MSSpectrum()
+            spec.setRT(float(i))
+            spec.setMSLevel(1)
+            spec.set_peaks((np.array([100.0, 200.0 + i]), np.array([1.0, 2.0 * i])))
+            exp.addSpectrum(spec)
+        oms.MzXMLFile().store(path, exp)
 
-        # Call function
-        result = load_file("some_file.mzXML")
+        with mock.patch("sicritfix.io.io.convert_mzxml_2_mzml") as mock_convert:
+            result = load_file(path)
+            table = load_peak_table(path)
+        mock_convert.assert_not_called()
+        self.assertEqual(result.getNrSpectra(), 5)
+        np.testing.assert_allclose(table.xic(203.0, 0.1), [0, 0, 0, 6.0, 0])
 
-        self.assertIsInstance(result, oms.MSExperiment)
+    def _fake_convert(self, file_path, output_folder=None):
+        converted = os.path.join(output_folder, "converted.mzML")
+        shutil.copy(self.fake_mzml, converted)
+        return converted
+
+    def test_get_input_path_caches_conversion(self):
+        mzxml = os.path.join(self.temp_dir, "file.mzXML")
+        with open(mzxml, "w") as f:
+            f.write("<mzXML/>")
+        scratch_dir = os.path.join(self.temp_dir, "scratch")
+
+        self.assertEqual(get_input_path(mzxml, msconvert=False), mzxml)
+        self.assertEqual(get_input_path(self.fake_mzml, msconvert=True), self.fake_mzml)
+        with mock.patch("sicritfix.io.io.convert_mzxml_2_mzml", side_effect=self._fake_convert) as mock_convert:
+            first = get_input_path(mzxml, msconvert=True, scratch_dir=scratch_dir)
+            second = get_input_path(mzxml, msconvert=True, scratch_dir=scratch_dir)
         mock_convert.assert_called_once()
-        #mock_load.assert_called_once()
+        self.assertEqual(first, second)
+        self.assertEqual(os.listdir(scratch_dir), [os.path.basename(first)])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "file.mzML")), "Input folder must stay untouched")
+
+    def test_load_file_with_conversion(self):
+        mzxml = os.path.join(self.temp_dir, "some_file.mzXML")
+        with open(mzxml, "w") as f:
+            f.write("<mzXML/>")
 
+        with mock.patch("sicritfix.io.io.DEFAULT_SCRATCH_DIR", os.path.join(self.temp_dir, "scratch")), \
+             mock.patch("sicritfix.io.io.convert_mzxml_2_mzml", side_effect=self._fake_convert) as mock_convert:
+            result = load_file(mzxml, msconvert=True)
+
+        self.assertIsInstance(result, oms.MSExperiment)
+        mock_convert.assert_called_once()
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+This Python module contains unit tests for the parallel.py module of the SICRITfix project.
+
+@contents :  Unit tests for the serial and shared-memory parallel executors.
+@project  :  SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@program  :  N/A
+@file     :  test_parallel.py
+@version  :  0.0.1, 18 July 2025
+@author   :  Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+
+@copyright :
+    Copyright 2025 GNU AFFERO GENERAL PUBLIC LICENSE.
+    All rights reserved. Reproduction in whole or in part is prohibited
+    without the written consent of the copyright owner.
+"""
+
+__author__    = "Maite Gómez del Rio Vinuesa"
+__copyright__ = "GPL License version 3"
+
+import unittest
+import numpy as np
+from sicritfix.processing.parallel import SerialExecutor, ParallelExecutor, get_executor, split_evenly
+from sicritfix.processing.processor import detect_oscillating_mzs
+from sicritfix.utils.peak_table import PeakTable
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        rts = np.arange(120) * 0.5
+        mz_array, intensity_array = [], []
+        for rt in rts:
+            mzs = np.concatenate(([500.2, 700.4], rng.uniform(100, 1000, 300)))
+            intensities = np.concatenate(([1000 + 500 * np.sin(2 * np.pi * 0.1 * rt), 40.0], rng.uniform(0, 5, 300)))
+            mz_array.append(mzs)
+            intensity_array.append(intensities)
+        self.peak_table = PeakTable.from_arrays(rts, mz_array, intensity_array)
+
+    def test_get_executor(self):
+        self.assertIsInstance(get_executor(self.peak_table, 1), SerialExecutor)
+        self.assertIsInstance(get_executor(self.peak_table, 3), ParallelExecutor)
+
+    def test_split_evenly(self):
+        chunks = split_evenly(list(range(10)), 3)
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 4])
+        self.assertEqual(sum(chunks, []), list(range(10)))
+        self.assertEqual(len(split_evenly([1, 2], 8)), 2)
+
+    def test_parallel_detection_matches_serial(self):
+        _, expected, _ = detect_oscillating_mzs(self.peak_table, min_occurrences=10)
+        self.assertIn(500.2, expected)
+
+        with get_executor(self.peak_table, 2) as executor:
+            _, oscillating_mzs, _ = detect_oscillating_mzs(self.peak_table, min_occurrences=10, executor=executor)
+        self.assertEqual(oscillating_mzs, expected)
+
+if __name__ == "__main__":
+    unittest.main()
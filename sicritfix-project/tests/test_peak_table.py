@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for peak_table.py
+
+@contents : Tests for the columnar PeakTable and its window sums.
+@project  : SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@file     : test_peak_table.py
+@author   : Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+@version  : 0.0.1, 24 July 2025
+
+@license  : GNU AFFERO GENERAL PUBLIC LICENSE v3
+"""
+
+
+
+import unittest
+import numpy as np
+import pyopenms as oms
+from sicritfix.utils.peak_table import PeakTable, as_peak_table
+
+
+def naive_xic(mz_array, intensity_array, target_mz, mz_tol):
+    return np.array([
+        np.sum(ints[np.abs(mzs - target_mz) < mz_tol]) for mzs, ints in zip(mz_array, intensity_array)
+    ])
+
+
+class TestPeakTable(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.rt_array = np.arange(40, dtype=float)
+        self.mz_array = []
+        self.intensity_array = []
+        for i in range(40):
+            n_peaks = 0 if i % 7 == 0 else rng.integers(1, 60)
+            self.mz_array.append(rng.uniform(100, 110, n_peaks))  # unsorted on purpose
+            self.intensity_array.append(rng.uniform(0, 1000, n_peaks))
+
+        self.table = PeakTable.from_arrays(self.rt_array, self.mz_array, self.intensity_array)
+
+    def test_layout(self):
+        self.assertEqual(self.table.n_scans, 40)
+        self.assertEqual(self.table.n_peaks, sum(len(m) for m in self.mz_array))
+        self.assertEqual(len(self.table.offsets), 41)
+        for i in range(self.table.n_scans):
+            mzs, ints = self.table.scan(i)
+            self.assertTrue(np.all(np.diff(mzs) >= 0), "Scans must be sorted by m/z")
+            self.assertAlmostEqual(np.sum(ints), np.sum(self.intensity_array[i]))
+
+    def test_xic_matches_naive_loop(self):
+        for target_mz, mz_tol in [(105.0, 0.1), (100.0, 0.5), (109.99, 0.05), (200.0, 0.1)]:
+            expected = naive_xic(self.mz_array, self.intensity_array, target_mz, mz_tol)
+            np.testing.assert_allclose(self.table.xic(target_mz, mz_tol), expected, atol=1e-6)
+
+    def test_empty_windows_are_exactly_zero(self):
+        xic = self.table.xic(500.0, 0.1)
+        self.assertTrue(np.all(xic == 0.0))
+
+    def test_mz_histogram_counts_distinct_scans(self):
+        table = PeakTable.from_arrays(
+            [0.0, 1.0, 2.0],
+            [np.array([100.001, 100.002, 200.0]), np.array([100.0]), np.array([300.0, 200.004])],
+            [np.ones(3), np.ones(1), np.ones(2)],
+        )
+        bin_mzs, scan_counts = table.mz_histogram(mz_bin_size=0.01)
+        np.testing.assert_allclose(bin_mzs, [100.0, 200.0, 300.0])
+        np.testing.assert_array_equal(scan_counts, [2, 2, 1])
+        self.assertIs(table.mz_histogram(0.01)[0], bin_mzs, "Histogram should be cached")
+
+    def test_mz_histogram_matches_rounding(self):
+        bin_mzs, scan_counts = self.table.mz_histogram(mz_bin_size=0.1)
+        expected = {}
+        for mzs in self.mz_array:
+            for mz in set(np.round(mzs / 0.1).astype(int)):
+                expected[mz] = expected.get(mz, 0) + 1
+        self.assertEqual(len(bin_mzs), len(expected))
+        for mz, count in zip(bin_mzs, scan_counts):
+            self.assertEqual(expected[int(round(mz / 0.1))], count)
+
+    def test_from_experiment(self):
+        exp = oms.MSExperiment()
+        for rt, mzs, ints in zip(self.rt_array, self.mz_array, self.intensity_array):
+            spec = oms.MSSpectrum()
+            spec.setRT(rt)
+            spec.set_peaks((mzs, ints))
+            exp.addSpectrum(spec)
+
+        table = PeakTable.from_experiment(exp)
+        np.testing.assert_array_equal(table.rt, self.rt_array)
+        np.testing.assert_allclose(table.xic(105.0, 0.1), self.table.xic(105.0, 0.1))
+
+    def test_streams_and_take(self):
+        ms_levels = [1 if i % 4 == 0 else 2 for i in range(40)]
+        polarities = [1 if i % 8 < 4 else 2 for i in range(40)]
+        table = PeakTable.from_arrays(self.rt_array, self.mz_array, self.intensity_array, ms_levels, polarities)
+
+        streams = table.streams()
+        self.assertEqual(list(streams), [(1, 1), (1, 2), (2, 1), (2, 2)])
+        np.testing.assert_array_equal(streams[(1, 1)], np.arange(0, 40, 8))
+        np.testing.assert_array_equal(np.sort(np.concatenate(list(streams.values()))), np.arange(40))
+
+        scans = streams[(2, 2)]
+        stream_table = table.take(scans)
+        np.testing.assert_array_equal(stream_table.rt, self.rt_array[scans])
+        np.testing.assert_array_equal(stream_table.ms_level, 2)
+        np.testing.assert_allclose(stream_table.xic(105.0, 0.1), table.xic(105.0, 0.1)[scans])
+        self.assertEqual(list(self.table.streams()), [(1, 0)])
+
+    def test_as_peak_table(self):
+        self.assertIs(as_peak_table(self.table), self.table)
+        self.assertIs(as_peak_table(None, None, self.table), self.table)
+        table = as_peak_table(self.mz_array, self.intensity_array, self.rt_array)
+        self.assertEqual(table.n_peaks, self.table.n_peaks)
+
+
+if __name__ == "__main__":
+    unittest.main()
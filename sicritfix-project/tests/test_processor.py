@@ -33,7 +33,9 @@ import numpy as np
 import pyopenms as oms
 import tempfile
 import os
-from sicritfix.processing.processor import detect_oscillating_mzs, correct_spectra, process_file
+from sicritfix.processing.processor import detect_oscillating_mzs, correct_spectra, iter_corrected_spectra, process_file, candidates_per_chunk
+from sicritfix.utils.profiler import RunProfiler
+from sicritfix.utils.peak_table import PeakTable
 
 
 class TestProcessor(unittest.TestCase):
@@ -42,8 +44,9 @@ class TestProcessor(unittest.TestCase):
         self.rt_array = np.linspace(0, 10, 50)
         self.osc_mz = 100.123
 
-        # Create artificial oscillating XIC
-        osc_signal = np.sin(2 * np.pi * 3 * self.rt_array) + np.random.normal(0, 0.1, 50)
+        # Create artificial oscillating XIC (seeded, so detection results are deterministic)
+        rng = np.random.default_rng(0)
+        osc_signal = np.sin(2 * np.pi * 3 * self.rt_array) + rng.normal(0, 0.1, 50)
         flat_signal = np.zeros(50)
 
         self.mz_array = [np.array([self.osc_mz, 150.0]) for _ in range(50)]
@@ -64,6 +67,19 @@ class TestProcessor(unittest.TestCase):
         )
         self.assertIn(round(self.osc_mz, 2), oscillating_mzs)
 
+    def test_detect_oscillating_mzs_chunked(self):
+        """Tiny memory budgets (one candidate per chunk) must not change the result."""
+        _, expected, _ = detect_oscillating_mzs(
+            self.rt_array, self.mz_array, self.intensity_array,
+            mz_bin_size=0.01, min_occurrences=5, power_threshold=0.05
+        )
+        _, oscillating_mzs, _ = detect_oscillating_mzs(
+            self.rt_array, self.mz_array, self.intensity_array,
+            mz_bin_size=0.01, min_occurrences=5, power_threshold=0.05, memory_budget_mb=1e-6
+        )
+        self.assertEqual(oscillating_mzs, expected)
+        self.assertEqual(candidates_per_chunk(50, memory_budget_mb=1e-6), 1)
+
     def test_correct_spectra_structure(self):
         dummy_residuals = {
             round(self.osc_mz, 3): np.ones(len(self.rt_array)) * 0.5
@@ -75,6 +91,51 @@ class TestProcessor(unittest.TestCase):
         self.assertEqual(corrected_map.getNrSpectra(), self.input_map.getNrSpectra())
         #self.assertTrue(exec_time > 0)
         
+    def test_correct_spectra_skips_spectra_without_targets(self):
+        input_map = oms.MSExperiment()
+        for i in range(10):
+            spec = oms.MSSpectrum()
+            spec.setRT(float(i))
+            spec.setMSLevel(1)
+            mzs = [self.osc_mz, 150.0] if i % 2 == 0 else [120.0, 150.0]
+            spec.set_peaks((np.array(mzs), np.array([10.0 + i, 5.0])))
+            input_map.addSpectrum(spec)
+        original = [spec.get_peaks() for spec in input_map]
+        residuals = {self.osc_mz: np.full(10, -1.0)}
+        peak_table = PeakTable.from_experiment(input_map)
+
+        profiler = RunProfiler(trace_memory=False)
+        spectra = list(iter_corrected_spectra(input_map, [self.osc_mz], residuals, profiler=profiler, peak_table=peak_table))
+        self.assertEqual(profiler.counters["peaks_rewritten"], 5)
+        self.assertEqual(profiler.counters["spectra_rewritten"], 5)
+        for i, (spec, (mzs, intensities)) in enumerate(zip(spectra, original)):
+            np.testing.assert_array_equal(spec.get_peaks()[0], mzs)
+            np.testing.assert_array_equal(spec.get_peaks()[1], [-1.0, 5.0] if i % 2 == 0 else intensities)
+
+        corrected_map, _ = correct_spectra(input_map, [self.osc_mz], peak_table.rt, residuals, peak_table=peak_table)
+        for spec, expected in zip(corrected_map, spectra):
+            np.testing.assert_array_equal(spec.get_peaks()[1], expected.get_peaks()[1])
+
+    def test_correct_spectra_keeps_the_experiment(self):
+        """Only the peaks change: spectrum metadata and chromatograms are kept."""
+        input_map = oms.MSExperiment()
+        for i, spec in enumerate(self.input_map):
+            spec.setNativeID(f"scan={i + 1}")
+            input_map.addSpectrum(spec)
+        chromatogram = oms.MSChromatogram()
+        chromatogram.setNativeID("TIC")
+        input_map.addChromatogram(chromatogram)
+
+        residuals = {self.osc_mz: np.zeros(len(self.rt_array))}
+        corrected_map, _ = correct_spectra(input_map, [self.osc_mz], self.rt_array, residuals, mz_bin_size=0.01)
+        self.assertIs(corrected_map, input_map)
+        self.assertEqual([c.getNativeID() for c in corrected_map.getChromatograms()], ["TIC"])
+        for i, spec in enumerate(corrected_map):
+            self.assertEqual(spec.getNativeID(), f"scan={i + 1}")
+            self.assertEqual(spec.getMSLevel(), 1)
+            self.assertEqual(spec.getRT(), self.rt_array[i])
+            np.testing.assert_array_equal(spec.get_peaks()[1], [0.0, 0.0])
+
     def test_process_file_no_oscillations(self):
         """Ensure process_file returns original file if no oscillations are detected."""
         # To create an MSExperiment with no oscillations
@@ -111,6 +172,257 @@ class TestProcessor(unittest.TestCase):
             np.testing.assert_array_equal(mz_in, mz_out)
             np.testing.assert_array_equal(intens_in, intens_out)
 
+    def test_process_file_with_oscillations(self):
+        """Ensure process_file corrects every oscillating m/z and writes all spectra."""
+        rts = np.arange(200) * 0.5
+        input_map = oms.MSExperiment()
+        for rt in rts:
+            spec = oms.MSSpectrum()
+            spec.setRT(rt)
+            spec.setMSLevel(1)
+            mzs = np.array([300.1, 500.2, 922.098])
+            intensities = np.array([50.0,
+                                    2000 + 800 * np.sin(2 * np.pi * 0.1 * rt),
+                                    1000 + 500 * np.sin(2 * np.pi * 0.1 * rt)])
+            spec.set_peaks((mzs, intensities))
+            input_map.addSpectrum(spec)
+
+        tmp_dir = tempfile.mkdtemp()
+        input_file = os.path.join(tmp_dir, "osc.mzML")
+        output_file = os.path.join(tmp_dir, "osc_corrected.mzML")
+        oms.MzMLFile().store(input_file, input_map)
+
+        file_corrected = process_file(input_file, output_file)
+        self.assertTrue(file_corrected, "Should return True when oscillations are corrected")
+
+        result_map = oms.MSExperiment()
+        oms.MzMLFile().load(output_file, result_map)
+        self.assertEqual(result_map.getNrSpectra(), input_map.getNrSpectra())
+
+        # The oscillating m/z must have been rewritten, the flat one left untouched
+        out_500 = np.array([spec.get_peaks()[1][1] for spec in result_map])
+        in_500 = np.array([spec.get_peaks()[1][1] for spec in input_map])
+        out_300 = np.array([spec.get_peaks()[1][0] for spec in result_map])
+        self.assertFalse(np.allclose(out_500, in_500))
+        np.testing.assert_array_equal(out_300, np.full(len(rts), 50.0))
+
+        # The streaming mode must produce the same peaks
+        streamed_file = os.path.join(tmp_dir, "osc_streamed.mzML")
+        self.assertTrue(process_file(input_file, streamed_file, streaming=True))
+        streamed_map = oms.MSExperiment()
+        oms.MzMLFile().load(streamed_file, streamed_map)
+        self.assertEqual(streamed_map.getNrSpectra(), result_map.getNrSpectra())
+        for spec_mem, spec_stream in zip(result_map, streamed_map):
+            np.testing.assert_array_equal(spec_mem.get_peaks()[0], spec_stream.get_peaks()[0])
+            np.testing.assert_array_equal(spec_mem.get_peaks()[1], spec_stream.get_peaks()[1])
+
+        # The band detector finds the same oscillating m/z values here
+        band_file = os.path.join(tmp_dir, "osc_band.mzML")
+        self.assertTrue(process_file(input_file, band_file, detector="band"))
+        with open(output_file, "rb") as f_fft, open(band_file, "rb") as f_band:
+            self.assertEqual(f_fft.read(), f_band.read())
+
+        # The least-squares fit leaves no more oscillation than the percentile amplitude
+        lockin_file = os.path.join(tmp_dir, "osc_lockin.mzML")
+        self.assertTrue(process_file(input_file, lockin_file, amplitude_model="lockin"))
+        lockin_map = oms.MSExperiment()
+        oms.MzMLFile().load(lockin_file, lockin_map)
+        lockin_500 = np.array([spec.get_peaks()[1][1] for spec in lockin_map])
+        self.assertLess(np.std(lockin_500), np.std(in_500))
+        self.assertLessEqual(np.std(lockin_500), np.std(out_500) + 1e-3)
+
+    def test_process_file_keeps_chromatograms(self):
+        """The chromatograms of the input are written by both write paths."""
+        rts = np.arange(200) * 0.5
+        input_map = oms.MSExperiment()
+        for rt in rts:
+            spec = oms.MSSpectrum()
+            spec.setRT(rt)
+            spec.setMSLevel(1)
+            spec.set_peaks((np.array([500.2, 922.098]), np.array([2000 + 800 * np.sin(2 * np.pi * 0.1 * rt), 1000 + 500 * np.sin(2 * np.pi * 0.1 * rt)])))
+            input_map.addSpectrum(spec)
+        for native_id in ("TIC", "BPC"):
+            chromatogram = oms.MSChromatogram()
+            chromatogram.setNativeID(native_id)
+            chromatogram.set_peaks((rts, np.full(len(rts), 1000.0)))
+            input_map.addChromatogram(chromatogram)
+
+        tmp_dir = tempfile.mkdtemp()
+        input_file = os.path.join(tmp_dir, "chromatograms.mzML")
+        oms.MzMLFile().store(input_file, input_map)
+
+        # Skipping the chromatograms only concerns the analysis, they are still written
+        for name, options in (("default", {}), ("streaming", {"streaming": True}), ("skipped", {"load_filters": {"skip_chromatograms": True, "skip_metadata": True}})):
+            output_file = os.path.join(tmp_dir, f"chromatograms_{name}.mzML")
+            self.assertTrue(process_file(input_file, output_file, **options))
+            result_map = oms.MSExperiment()
+            oms.MzMLFile().load(output_file, result_map)
+            self.assertEqual(result_map.getNrChromatograms(), input_map.getNrChromatograms())
+            self.assertEqual([c.getNativeID() for c in result_map.getChromatograms()], ["TIC", "BPC"])
+
+    def test_process_file_late_start(self):
+        """The correction of an unfiltered run does not depend on the RT of its first scan."""
+        rts = np.arange(200) * 0.5
+        tmp_dir = tempfile.mkdtemp()
+        results = []
+        for start in (0.0, 600.0):
+            input_map = oms.MSExperiment()
+            for rt in rts:
+                spec = oms.MSSpectrum()
+                spec.setRT(start + rt)
+                spec.setMSLevel(1)
+                spec.set_peaks((np.array([300.1, 500.2, 922.098]),
+                                np.array([50.0, 2000 + 800 * np.sin(2 * np.pi * 0.1 * rt), 1000 + 500 * np.sin(2 * np.pi * 0.1 * rt)])))
+                input_map.addSpectrum(spec)
+            input_file = os.path.join(tmp_dir, f"osc_{start:.0f}.mzML")
+            output_file = os.path.join(tmp_dir, f"osc_{start:.0f}_corrected.mzML")
+            oms.MzMLFile().store(input_file, input_map)
+            self.assertTrue(process_file(input_file, output_file))
+            result_map = oms.MSExperiment()
+            oms.MzMLFile().load(output_file, result_map)
+            results.append(np.array([spec.get_peaks()[1] for spec in result_map]))
+
+        np.testing.assert_allclose(results[1], results[0], rtol=1e-4)
+
+    def test_process_file_auto_reference(self):
+        """Without the 922.098 reference, only the auto mode corrects the file."""
+        rts = np.arange(200) * 0.5
+        input_map = oms.MSExperiment()
+        for rt in rts:
+            spec = oms.MSSpectrum()
+            spec.setRT(rt)
+            spec.setMSLevel(1)
+            spec.set_peaks((np.array([300.1, 500.2, 700.3]),
+                            np.array([50.0, 2000 + 800 * np.sin(2 * np.pi * 0.1 * rt), 1000 + 500 * np.sin(2 * np.pi * 0.1 * rt + 1)])))
+            input_map.addSpectrum(spec)
+
+        tmp_dir = tempfile.mkdtemp()
+        input_file = os.path.join(tmp_dir, "no_ref.mzML")
+        oms.MzMLFile().store(input_file, input_map)
+
+        self.assertFalse(process_file(input_file, os.path.join(tmp_dir, "fixed.mzML")))
+
+        auto_file = os.path.join(tmp_dir, "auto.mzML")
+        self.assertTrue(process_file(input_file, auto_file, mz_ref="auto"))
+        result_map = oms.MSExperiment()
+        oms.MzMLFile().load(auto_file, result_map)
+        in_500 = np.array([spec.get_peaks()[1][1] for spec in input_map])
+        out_500 = np.array([spec.get_peaks()[1][1] for spec in result_map])
+        out_300 = np.array([spec.get_peaks()[1][0] for spec in result_map])
+        self.assertLess(np.std(out_500), 0.5 * np.std(in_500))
+        np.testing.assert_array_equal(out_300, np.full(len(rts), 50.0))
+
+        # The references are scored during the detection
+        _, oscillating_mzs, _, references = detect_oscillating_mzs(PeakTable.from_experiment(input_map), n_references=3)
+        self.assertEqual(sorted(np.round(references["mzs"], 1)), [500.2, 700.3])
+        self.assertEqual(references["xics"].shape, (2, len(rts)))
+
+        with self.assertRaises(ValueError):
+            process_file(input_file, auto_file, mz_ref="auto", detector="band")
+
+    def test_process_file_scan_streams(self):
+        """MS1 scans of each polarity are corrected separately, MS2 scans are passed through."""
+        cycles = np.arange(200) * 0.5
+        input_map = oms.MSExperiment()
+        for rt in cycles:
+            oscillation = np.sin(2 * np.pi * 0.1 * rt)
+            for polarity, ms_level, mzs, intensities in (
+                (1, 1, [300.1, 500.2, 922.098], [50.0, 2000 + 800 * oscillation, 1000 + 500 * oscillation]),
+                (2, 1, [600.3, 922.098], [3000 - 900 * oscillation, 1000 - 500 * oscillation]),
+                (1, 2, [150.1, 500.2], [10.0, 400 + 100 * oscillation]),
+            ):
+                spec = oms.MSSpectrum()
+                spec.setRT(rt + 0.1 * (len(input_map.getSpectra()) % 3))
+                spec.setMSLevel(ms_level)
+                settings = spec.getInstrumentSettings()
+                settings.setPolarity(polarity)
+                spec.setInstrumentSettings(settings)
+                if ms_level == 2:
+                    precursor = oms.Precursor()
+                    precursor.setMZ(500.2)
+                    spec.setPrecursors([precursor])
+                spec.set_peaks((np.array(mzs), np.array(intensities)))
+                input_map.addSpectrum(spec)
+
+        tmp_dir = tempfile.mkdtemp()
+        input_file = os.path.join(tmp_dir, "dda.mzML")
+        oms.MzMLFile().store(input_file, input_map)
+        input_map = oms.MSExperiment()
+        oms.MzMLFile().load(input_file, input_map)
+        spectra = list(input_map)
+
+        # The positive MS1 scans alone give the same correction
+        positive_map = oms.MSExperiment()
+        for spec in spectra[0::3]:
+            positive_map.addSpectrum(spec)
+        positive_file = os.path.join(tmp_dir, "positive.mzML")
+        oms.MzMLFile().store(positive_file, positive_map)
+        self.assertTrue(process_file(positive_file, os.path.join(tmp_dir, "positive_fixed.mzML"), amplitude_model="lockin"))
+        positive_map = oms.MSExperiment()
+        oms.MzMLFile().load(os.path.join(tmp_dir, "positive_fixed.mzML"), positive_map)
+
+        for streaming, jobs in ((False, 1), (True, 1), (False, 2)):
+            output_file = os.path.join(tmp_dir, f"fixed_{streaming}_{jobs}.mzML")
+            self.assertTrue(process_file(input_file, output_file, streaming=streaming, jobs=jobs, amplitude_model="lockin"))
+            result_map = oms.MSExperiment()
+            oms.MzMLFile().load(output_file, result_map)
+            results = list(result_map)
+            self.assertEqual(len(results), len(spectra))
+
+            in_500 = np.array([spec.get_peaks()[1][1] for spec in spectra[0::3]])
+            out_500 = np.array([spec.get_peaks()[1][1] for spec in results[0::3]])
+            in_600 = np.array([spec.get_peaks()[1][0] for spec in spectra[1::3]])
+            out_600 = np.array([spec.get_peaks()[1][0] for spec in results[1::3]])
+            self.assertLess(np.std(out_500), np.std(in_500))
+            self.assertLess(np.std(out_600), np.std(in_600))
+            np.testing.assert_array_equal(out_500, [spec.get_peaks()[1][1] for spec in positive_map])
+            for original, result in zip(spectra[2::3], results[2::3]):
+                np.testing.assert_array_equal(result.get_peaks()[1], original.get_peaks()[1])
+                self.assertEqual(result.getMSLevel(), 2)
+                self.assertEqual(result.getPrecursors()[0].getMZ(), 500.2)
+
+        # Loading only the MS1 scans gives the same output
+        filtered_file = os.path.join(tmp_dir, "fixed_ms1.mzML")
+        self.assertTrue(process_file(input_file, filtered_file, amplitude_model="lockin", load_filters={"ms_levels": [1]}))
+        with open(os.path.join(tmp_dir, "fixed_True_1.mzML"), "rb") as f_streamed, open(filtered_file, "rb") as f_filtered:
+            self.assertEqual(f_streamed.read(), f_filtered.read())
+
+    def test_process_file_rt_range(self):
+        """Only the spectra inside the RT range are corrected, the others are written unchanged."""
+        rts = np.arange(300) * 0.5
+        input_map = oms.MSExperiment()
+        for rt in rts:
+            spec = oms.MSSpectrum()
+            spec.setRT(rt)
+            spec.setMSLevel(1)
+            spec.set_peaks((np.array([300.1, 500.2, 922.098]),
+                            np.array([50.0, 2000 + 800 * np.sin(2 * np.pi * 0.1 * rt), 1000 + 500 * np.sin(2 * np.pi * 0.1 * rt)])))
+            input_map.addSpectrum(spec)
+
+        tmp_dir = tempfile.mkdtemp()
+        input_file = os.path.join(tmp_dir, "osc.mzML")
+        output_file = os.path.join(tmp_dir, "osc_window.mzML")
+        oms.MzMLFile().store(input_file, input_map)
+
+        self.assertTrue(process_file(input_file, output_file, amplitude_model="lockin", load_filters={"rt_range": (20.0, 120.0)}))
+        input_map = oms.MSExperiment()
+        oms.MzMLFile().load(input_file, input_map)
+        result_map = oms.MSExperiment()
+        oms.MzMLFile().load(output_file, result_map)
+        self.assertEqual(result_map.getNrSpectra(), input_map.getNrSpectra())
+
+        inside = (rts >= 20.0) & (rts <= 120.0)
+        for is_inside, original, result in zip(inside, input_map, result_map):
+            np.testing.assert_array_equal(result.get_peaks()[0], original.get_peaks()[0])
+            if not is_inside:
+                np.testing.assert_array_equal(result.get_peaks()[1], original.get_peaks()[1])
+        in_500 = np.array([spec.get_peaks()[1][1] for spec in input_map])
+        out_500 = np.array([spec.get_peaks()[1][1] for spec in result_map])
+        self.assertLess(np.std(out_500[inside]), np.std(in_500[inside]))
+
+        with self.assertRaises(ValueError):
+            process_file(input_file, output_file, load_filters={"rt_range": (120.0, 20.0)})
+
 if __name__ == "__main__":
     unittest.main()
 
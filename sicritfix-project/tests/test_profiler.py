@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for profiler.py
+
+@contents : Tests for the run profiler and the profile report of process_file.
+@project  : SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@file     : test_profiler.py
+@author   : Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+@version  : 0.0.1, 24 July 2025
+
+@license  : GNU AFFERO GENERAL PUBLIC LICENSE v3
+"""
+
+
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pyopenms as oms
+from sicritfix.processing.processor import process_file
+from sicritfix.utils.profiler import RunProfiler, NullProfiler
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_stages_and_counters(self):
+        profiler = RunProfiler()
+        for _ in range(2):
+            with profiler.stage("work"):
+                data = np.ones(10 ** 6)
+                del data
+        profiler.count("items", 3)
+        profiler.count("items")
+        profiler.set_info(input_path="run.mzML")
+
+        report = profiler.write(os.path.join(self.tmp_dir, "report.json"))
+        self.assertEqual(report["input_path"], "run.mzML")
+        self.assertEqual(report["counters"], {"items": 4})
+        self.assertGreater(report["stages"]["work"]["wall_time"], 0)
+        self.assertGreaterEqual(report["stages"]["work"]["tracemalloc_peak_mb"], 7.5)
+        self.assertGreaterEqual(report["total"]["wall_time"], report["stages"]["work"]["wall_time"])
+
+        with NullProfiler().stage("work"):
+            pass
+
+    def test_process_file_profile(self):
+        input_map = oms.MSExperiment()
+        for rt in np.arange(200) * 0.5:
+            spec = oms.MSSpectrum()
+            spec.setRT(rt)
+            spec.setMSLevel(1)
+            spec.set_peaks((np.array([300.1, 500.2, 922.098]),
+                            np.array([50.0, 2000 + 800 * np.sin(0.2 * np.pi * rt), 1000 + 500 * np.sin(0.2 * np.pi * rt)])))
+            input_map.addSpectrum(spec)
+        input_file = os.path.join(self.tmp_dir, "osc.mzML")
+        oms.MzMLFile().store(input_file, input_map)
+
+        report_file = os.path.join(self.tmp_dir, "report.json")
+        self.assertTrue(process_file(input_file, os.path.join(self.tmp_dir, "out.mzML"), profile=report_file))
+        with open(report_file) as f:
+            report = json.load(f)
+
+        self.assertEqual(report["outcome"], "corrected")
+        self.assertEqual(list(report["stages"]), ["load", "reference", "binning", "detection", "correction", "write"])
+        counters = report["counters"]
+        self.assertEqual(counters["spectra"], 200)
+        self.assertEqual(counters["peaks"], 600)
+        self.assertEqual(counters["candidate_bins"], 3)
+        self.assertEqual(counters["oscillating_mzs"], 2)
+        self.assertEqual(counters["xics_built"], 1 + 3 + 2)
+        # 922.098 is detected as the 922.10 bin, outside the 0.001 matching tolerance
+        self.assertEqual(counters["peaks_rewritten"], 200)
+
+        # A failing run still writes its report
+        with self.assertRaises(Exception):
+            process_file(os.path.join(self.tmp_dir, "missing.mzML"), os.path.join(self.tmp_dir, "x.mzML"), profile=report_file)
+        with open(report_file) as f:
+            self.assertEqual(json.load(f)["outcome"], "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
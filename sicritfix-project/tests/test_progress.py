@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for progress.py
+
+@contents : Tests for the progress events of process_file and the progress bar.
+@project  : SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@file     : test_progress.py
+@author   : Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+@version  : 0.0.1, 24 July 2025
+
+@license  : GNU AFFERO GENERAL PUBLIC LICENSE v3
+"""
+
+
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pyopenms as oms
+from sicritfix.processing.processor import process_file
+from sicritfix.utils.progress import ProgressReporter, ProgressBar
+
+
+class TestProgress(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_updates_are_rate_limited(self):
+        events = []
+        reporter = ProgressReporter(events.append, min_interval=60)
+        with reporter.stage("write"):
+            for i in range(1000):
+                reporter.update("write", i + 1, 1000)
+
+        self.assertEqual([event["event"] for event in events], ["stage_start", "progress", "progress", "stage_end"])
+        first, last = events[1], events[2]
+        self.assertEqual((first["done"], first["total"]), (1, 1000))
+        self.assertEqual(last["fraction"], 1.0)
+        self.assertEqual(last["eta"], 0)
+
+    def test_process_file_events(self):
+        input_map = oms.MSExperiment()
+        for rt in np.arange(200) * 0.5:
+            spec = oms.MSSpectrum()
+            spec.setRT(rt)
+            spec.setMSLevel(1)
+            spec.set_peaks((np.array([300.1, 500.2, 922.098]),
+                            np.array([50.0, 2000 + 800 * np.sin(0.2 * np.pi * rt), 1000 + 500 * np.sin(0.2 * np.pi * rt)])))
+            input_map.addSpectrum(spec)
+        input_file = os.path.join(self.tmp_dir, "osc.mzML")
+        oms.MzMLFile().store(input_file, input_map)
+
+        for streaming in (False, True):
+            events = []
+            stream = io.StringIO()
+            bar = ProgressBar(stream)
+
+            def sink(event):
+                events.append(event)
+                bar(event)
+
+            self.assertTrue(process_file(input_file, os.path.join(self.tmp_dir, "out.mzML"), streaming=streaming, progress=sink))
+
+            self.assertEqual(events[0]["event"], "run_start")
+            self.assertEqual(events[-1], {"event": "run_end", "outcome": "corrected", "elapsed": events[-1]["elapsed"]})
+            stages = [event["stage"] for event in events if event["event"] == "stage_start"]
+            self.assertEqual(stages, ["load", "reference", "binning", "detection", "correction", "write"])
+
+            last_progress = {event["stage"]: event for event in events if event["event"] == "progress"}
+            self.assertEqual((last_progress["detection"]["done"], last_progress["detection"]["total"]), (3, 3))
+            self.assertEqual((last_progress["correction"]["done"], last_progress["correction"]["total"]), (2, 2))
+            self.assertEqual((last_progress["write"]["done"], last_progress["write"]["total"]), (200, 200))
+            self.assertIn("write      done in", stream.getvalue())
+
+        # A failing run still ends with its run_end event
+        events = []
+        with self.assertRaises(Exception):
+            process_file(os.path.join(self.tmp_dir, "missing.mzML"), os.path.join(self.tmp_dir, "x.mzML"), progress=events.append)
+        self.assertEqual(events[-1]["outcome"], "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""
+Unit tests for realtime.py
+
+@contents : Tests for the real-time corrector and its streaming consumer.
+@project  : SICRITfix – Oscillation Correction in Mass Spectrometry Data
+@file     : test_realtime.py
+@author   : Maite Gómez del Rio Vinuesa (maite.gomezriovinuesa@gmail.com)
+@version  : 0.0.1, 24 July 2025
+
+@license  : GNU AFFERO GENERAL PUBLIC LICENSE v3
+"""
+
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pyopenms as oms
+from sicritfix.processing.realtime import RealtimeCorrector, correct_spectra_realtime, correct_file_realtime
+
+
+def _chirped_run(n_scans=600, reference=True, seed=0):
+    """Spectra with an oscillating m/z (500.2), a flat one (300.1) and the reference (922.098)."""
+    rng = np.random.default_rng(seed)
+    rts = np.arange(n_scans) * 0.5
+    phase = 2 * np.pi * (0.1 * rts + 5e-5 * rts ** 2)
+    spectra = []
+    for rt, scan_phase in zip(rts, phase):
+        mzs = [300.1, 500.2] + ([922.098] if reference else [])
+        intensities = [1000 * rng.uniform(0.98, 1.02), 2000 + 800 * np.sin(scan_phase + 1.0), 1000 + 500 * np.sin(scan_phase)][:len(mzs)]
+        spec = oms.MSSpectrum()
+        spec.setRT(float(rt))
+        spec.setMSLevel(1)
+        spec.set_peaks((np.array(mzs), np.array(intensities)))
+        spectra.append(spec)
+
+    return spectra
+
+def _intensities(spectra, mz):
+    return np.array([s.get_peaks()[1][np.argmin(np.abs(s.get_peaks()[0] - mz))] for s in spectra])
+
+
+class TestRealtimeCorrector(unittest.TestCase):
+    def test_tracks_and_corrects_a_chirp(self):
+        spectra = _chirped_run()
+        original = _intensities(spectra, 500.2)
+        flat = _intensities(spectra, 300.1)
+
+        corrector = RealtimeCorrector()
+        corrected = []
+        for spectrum in spectra:
+            corrected += corrector.push(oms.MSSpectrum(spectrum))
+        corrected += corrector.flush()
+
+        self.assertEqual(len(corrected), len(spectra))
+        self.assertTrue(corrector.locked)
+        # Final frequency of the chirp: 0.1 + 2 * 5e-5 * rt
+        self.assertAlmostEqual(corrector.frequency, 0.1 + 1e-4 * 299.5, delta=2e-3)
+        corrected_osc = _intensities(corrected, 500.2)
+        self.assertLess(np.std(corrected_osc[100:]), 0.15 * np.std(original[100:]))
+        np.testing.assert_array_equal(_intensities(corrected, 300.1), flat)
+
+    def test_latency_bounds_the_delay(self):
+        corrector = RealtimeCorrector(window_size=20, latency=5)
+        returned = [len(corrector.push(spectrum)) for spectrum in _chirped_run(60)]
+
+        # Held until the oscillator is locked, then one out for each one in
+        self.assertEqual(returned[:19], [0] * 19)
+        self.assertEqual(returned[19], 15)
+        self.assertEqual(returned[20:], [1] * 40)
+        self.assertEqual(len(corrector.flush()), 5)
+
+    def test_ms1_scans_of_each_polarity(self):
+        # Positive MS1 scans, each followed by an MS2 scan and a negative MS1 scan
+        spectra = []
+        for spectrum in _chirped_run(400):
+            mzs, intensities = spectrum.get_peaks()
+            ms2 = oms.MSSpectrum()
+            ms2.setRT(spectrum.getRT() + 0.1)
+            ms2.setMSLevel(2)
+            ms2.set_peaks((np.array([150.1, 500.2]), np.array([10.0, intensities[1] / 5])))
+            negative = oms.MSSpectrum()
+            negative.setRT(spectrum.getRT() + 0.2)
+            negative.setMSLevel(1)
+            negative.set_peaks((np.array([600.3, 922.098]), np.array([5000 - intensities[1], 2000 - intensities[2]])))
+            for scan, polarity in ((spectrum, 1), (ms2, 1), (negative, 2)):
+                settings = scan.getInstrumentSettings()
+                settings.setPolarity(polarity)
+                scan.setInstrumentSettings(settings)
+                spectra.append(scan)
+
+        corrector = RealtimeCorrector(latency=5)
+        corrected = []
+        for spectrum in spectra:
+            corrected += corrector.push(oms.MSSpectrum(spectrum))
+        corrected += corrector.flush()
+
+        # Every scan comes back, in acquisition order
+        self.assertEqual([s.getRT() for s in corrected], [s.getRT() for s in spectra])
+        self.assertEqual(sorted(corrector.trackers), [1, 2])
+        self.assertTrue(all(tracker.locked for tracker in corrector.trackers.values()))
+        positive, ms2, negative = corrected[0::3], corrected[1::3], corrected[2::3]
+        self.assertLess(np.std(_intensities(positive, 500.2)[100:]), 0.15 * np.std(_intensities(spectra[0::3], 500.2)[100:]))
+        self.assertLess(np.std(_intensities(negative, 600.3)[100:]), 0.15 * np.std(_intensities(spectra[2::3], 600.3)[100:]))
+        for spectrum, original in zip(ms2, spectra[1::3]):
+            np.testing.assert_array_equal(spectrum.get_peaks()[1], original.get_peaks()[1])
+
+    def test_no_reference_passes_spectra_unchanged(self):
+        spectra = _chirped_run(150, reference=False)
+        corrected = list(correct_spectra_realtime(spectra, window_size=40))
+
+        self.assertEqual(len(corrected), len(spectra))
+        np.testing.assert_array_equal(_intensities(corrected, 500.2), _intensities(spectra, 500.2))
+
+    def test_correct_file_realtime(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            input_map = oms.MSExperiment()
+            for spectrum in _chirped_run(300):
+                input_map.addSpectrum(spectrum)
+            input_file = os.path.join(tmp_dir, "osc.mzML")
+            output_file = os.path.join(tmp_dir, "out.mzML")
+            oms.MzMLFile().store(input_file, input_map)
+
+            corrector = correct_file_realtime(input_file, output_file, latency=10)
+            output_map = oms.MSExperiment()
+            oms.MzMLFile().load(output_file, output_map)
+
+            self.assertEqual(output_map.getNrSpectra(), 300)
+            self.assertGreater(corrector.n_peaks_rewritten, 0)
+            self.assertEqual([s.getRT() for s in output_map], [s.getRT() for s in input_map])
+            self.assertLess(np.std(_intensities(output_map, 500.2)), 0.2 * np.std(_intensities(input_map, 500.2)))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()